@@ -5,33 +5,103 @@ Tailored for 2025 KIF (Korean Information and Communications Fund) GP Selection
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
 import hashlib
+import hmac
+import logging
+import math
 import os
-from datetime import datetime, date
-from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Any, Optional, Tuple, Callable
 import re
 from io import BytesIO
 import tempfile
 import shutil
+import threading
+import time
+import secrets
+import zlib
+from urllib.parse import quote, urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import zipfile
+from copy import copy
+from functools import lru_cache
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
 
 # Database imports
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Float
+from sqlalchemy import create_engine, event, select, literal, bindparam, case, tuple_, Column, Integer, String, Text, LargeBinary, DateTime, ForeignKey, Float, Index
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, Session
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, update
 
 # PDF and Excel handling
 import PyPDF2
+try:
+    import orjson  # optional: faster payload encode/decode
+except ImportError:
+    orjson = None
 from pdfplumber import PDF
 import openpyxl
 from openpyxl import load_workbook, Workbook
 from openpyxl.utils import get_column_letter
+from openpyxl.utils.cell import coordinate_to_tuple, range_boundaries
+from openpyxl.cell.cell import MergedCell
 from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 
+logger = logging.getLogger(__name__)
+
+# Database profile (override with environment variables)
+DATABASE_PROFILE = {
+    'url': os.environ.get('DATABASE_URL', 'sqlite:///vc_proposal_platform.db'),
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout_ms': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    'cache_size_kb': int(os.environ.get('SQLITE_CACHE_SIZE_KB', '65536')),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    # Streamlit runs each session's script in its own thread
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', '10')),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '20')),
+    'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', '30'))
+}
+
+def create_database_engine(profile: Dict[str, Any]) -> Engine:
+    """Create a pooled SQLite engine that applies the profile's pragmas to every new connection"""
+    db_engine = create_engine(
+        profile['url'],
+        echo=False,
+        poolclass=QueuePool,
+        pool_size=profile['pool_size'],
+        max_overflow=profile['max_overflow'],
+        pool_timeout=profile['pool_timeout'],
+        connect_args={'check_same_thread': False, 'timeout': profile['busy_timeout_ms'] / 1000}
+    )
+    
+    @event.listens_for(db_engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={profile['journal_mode']}")
+        cursor.execute(f"PRAGMA synchronous={profile['synchronous']}")
+        cursor.execute(f"PRAGMA busy_timeout={int(profile['busy_timeout_ms'])}")
+        cursor.execute(f"PRAGMA cache_size=-{int(profile['cache_size_kb'])}")
+        cursor.execute(f"PRAGMA mmap_size={int(profile['mmap_size'])}")
+        cursor.close()
+    
+    return db_engine
+
+@st.cache_resource
+def get_engine() -> Engine:
+    """One engine (and connection pool) per server process, shared across reruns and sessions"""
+    return create_database_engine(DATABASE_PROFILE)
+
 # Initialize database
 Base = declarative_base()
-engine = create_engine('sqlite:///vc_proposal_platform.db', echo=False)
+engine = get_engine()
 SessionLocal = sessionmaker(bind=engine)
 
 # Database Models
@@ -52,15 +122,237 @@ class ProposalData(Base):
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     sheet_id = Column(String(50), nullable=False)
-    data_json = Column(Text, nullable=False)
+    payload_hash = Column(String(64), ForeignKey('payload_blobs.hash'))  # content address of the payload
+    data_json = Column(Text, nullable=False, default='')  # legacy inline payload, moved to payload_blobs
+    data_format = Column(String(20), nullable=False, default='json')  # legacy inline payload format
+    data_blob = Column(LargeBinary)  # legacy inline binary payload
     version = Column(String(100), default='base')
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     user = relationship("User", back_populates="proposal_data")
+    
+    __table_args__ = (
+        Index('ux_proposal_data_user_sheet_version', 'user_id', 'sheet_id', 'version', unique=True),
+        Index('ix_proposal_data_user_version_updated', 'user_id', 'version', 'updated_at', 'id'),
+    )
+
+class PayloadBlob(Base):
+    __tablename__ = 'payload_blobs'
+    
+    hash = Column(String(64), primary_key=True)  # SHA-256 of the payload JSON text
+    data_format = Column(String(20), nullable=False, default='json')  # key of PAYLOAD_FORMATS
+    data_json = Column(Text, nullable=False, default='')  # JSON text ('' when the payload is in data_blob)
+    data_blob = Column(LargeBinary)  # encoded payload for binary formats
+    size = Column(Integer, nullable=False)  # length of the JSON text
+    refcount = Column(Integer, nullable=False, default=0)  # maintained by BLOB_REFCOUNT_TRIGGERS
+    created_at = Column(DateTime, default=func.now())
+    
+    __table_args__ = (
+        Index('ix_payload_blobs_refcount', 'refcount'),
+    )
+
+class ProposalField(Base):
+    __tablename__ = 'proposal_fields'
+    
+    record_id = Column(Integer, ForeignKey('proposal_data.id'), primary_key=True)
+    field_key = Column(String(200), primary_key=True)  # top-level key, or rows[i] for table sheets
+    value_type = Column(String(10), nullable=False)  # number, bool, text, null, json
+    num_value = Column(Float)
+    text_value = Column(Text)
+    value_json = Column(Text, nullable=False)
+    
+    __table_args__ = (
+        Index('ix_proposal_fields_key_num', 'field_key', 'num_value'),
+        Index('ix_proposal_fields_key_text', 'field_key', 'text_value'),
+    )
+
+class ProposalRevision(Base):
+    __tablename__ = 'proposal_revisions'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    sheet_id = Column(String(50), nullable=False)
+    version = Column(String(100), nullable=False)
+    revision = Column(Integer, nullable=False)
+    kind = Column(String(10), nullable=False)  # snapshot (full payload) or delta (changes since previous revision)
+    payload_json = Column(Text, nullable=False)  # delta JSON ('' for snapshots stored in payload_blobs)
+    payload_hash = Column(String(64), ForeignKey('payload_blobs.hash'))  # snapshot payload
+    created_at = Column(DateTime, default=func.now())
+    
+    __table_args__ = (
+        Index('ux_proposal_revisions_key', 'user_id', 'sheet_id', 'version', 'revision', unique=True),
+    )
+
+class TemplateRequirement(Base):
+    __tablename__ = 'template_requirements'
+    
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    template_id = Column(String(64), primary_key=True)  # template_fingerprint() of the parsed template
+    sheet_id = Column(String(50), primary_key=True)
+    required = Column(Integer, nullable=False)  # detected fields on the template sheet
+
+class SheetCompleteness(Base):
+    __tablename__ = 'sheet_completeness'
+    
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    template_id = Column(String(64), primary_key=True)  # '' for the template-independent row
+    sheet_id = Column(String(50), primary_key=True)
+    version = Column(String(100), primary_key=True)
+    filled = Column(Integer, nullable=False)  # non-empty top-level values
+    required = Column(Integer)  # from template_requirements (NULL when the template does not list the sheet)
+    updated_at = Column(DateTime, default=func.now())
+
+class ValidationViolation(Base):
+    __tablename__ = 'validation_violations'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    version = Column(String(100), nullable=False)
+    rule = Column(String(100), nullable=False)  # name in CROSS_SHEET_RULES
+    sheets = Column(Text, nullable=False)  # JSON list of the sheets the rule reads
+    message = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+    
+    __table_args__ = (
+        Index('ix_validation_violations_user_version_rule', 'user_id', 'version', 'rule'),
+    )
+
+class PortfolioSummary(Base):
+    __tablename__ = 'portfolio_summary'
+    
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    version = Column(String(100), primary_key=True)
+    sheets = Column(Integer, nullable=False)  # stored sheets
+    filled_sheets = Column(Integer, nullable=False)  # sheets with at least one filled value
+    filled_fields = Column(Integer, nullable=False)
+    completion = Column(Float, nullable=False)  # filled_sheets / len(SHEET_CONFIG)
+    records_with_errors = Column(Integer, nullable=False)
+    field_errors = Column(Integer, nullable=False)
+    cross_sheet_violations = Column(Integer, nullable=False)
+    last_updated = Column(DateTime)  # latest save of the version
+    computed_at = Column(DateTime, nullable=False)
+
+class GenerationJob(Base):
+    __tablename__ = 'generation_jobs'
+    
+    id = Column(String(64), primary_key=True)  # SHA-256 of job inputs (dedup key)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    status = Column(String(20), nullable=False, default='queued')  # queued, running, done, failed
+    total_sheets = Column(Integer, default=0)
+    completed_sheets = Column(Integer, default=0)
+    current_sheet = Column(String(100))
+    output_path = Column(Text)
+    artifact_token = Column(String(64))
+    error = Column(Text)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class VaultRevision(Base):
+    __tablename__ = 'vault_revisions'
+    
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    revision = Column(Integer, nullable=False, default=0)
+
+class Artifact(Base):
+    __tablename__ = 'artifacts'
+    
+    token = Column(String(64), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    path = Column(Text, nullable=False)
+    filename = Column(String(300), nullable=False)
+    size = Column(Integer, default=0)
+    created_at = Column(DateTime, default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+# Blob reference counts follow every row that points at a blob; unreferenced
+# blobs are deleted by collect_payload_blobs()
+BLOB_REFCOUNT_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS trg_proposal_data_blob_insert AFTER INSERT ON proposal_data "
+    "BEGIN UPDATE payload_blobs SET refcount = refcount + 1 WHERE hash = NEW.payload_hash; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_proposal_data_blob_update AFTER UPDATE OF payload_hash ON proposal_data "
+    "WHEN NEW.payload_hash IS NOT OLD.payload_hash "
+    "BEGIN UPDATE payload_blobs SET refcount = refcount + 1 WHERE hash = NEW.payload_hash; "
+    "UPDATE payload_blobs SET refcount = refcount - 1 WHERE hash = OLD.payload_hash; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_proposal_data_blob_delete AFTER DELETE ON proposal_data "
+    "BEGIN UPDATE payload_blobs SET refcount = refcount - 1 WHERE hash = OLD.payload_hash; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_proposal_revisions_blob_insert AFTER INSERT ON proposal_revisions "
+    "BEGIN UPDATE payload_blobs SET refcount = refcount + 1 WHERE hash = NEW.payload_hash; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_proposal_revisions_blob_update AFTER UPDATE OF payload_hash ON proposal_revisions "
+    "WHEN NEW.payload_hash IS NOT OLD.payload_hash "
+    "BEGIN UPDATE payload_blobs SET refcount = refcount + 1 WHERE hash = NEW.payload_hash; "
+    "UPDATE payload_blobs SET refcount = refcount - 1 WHERE hash = OLD.payload_hash; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_proposal_revisions_blob_delete AFTER DELETE ON proposal_revisions "
+    "BEGIN UPDATE payload_blobs SET refcount = refcount - 1 WHERE hash = OLD.payload_hash; END",
+]
 
-# Create tables
-Base.metadata.create_all(engine)
+@event.listens_for(Base.metadata, 'after_create')
+def create_blob_refcount_triggers(target, connection, **kw):
+    for ddl in BLOB_REFCOUNT_TRIGGERS:
+        connection.exec_driver_sql(ddl)
+
+def _ensure_columns(table_name: str, columns: Dict[str, str]):
+    """Add columns introduced after a table was first created (SQLite ALTER TABLE)"""
+    with engine.begin() as conn:
+        existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table_name})")}
+        for column_name, ddl in columns.items():
+            if column_name not in existing:
+                conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}")
+
+def _ensure_indexes(table, index_names: List[str]):
+    """Create indexes added to a model after its table was first created"""
+    for index in table.indexes:
+        if index.name in index_names:
+            index.create(engine, checkfirst=True)
+
+def migrate_proposal_data_index():
+    """Merge duplicate (user, sheet, version) rows, then add the unique index
+    
+    Databases created before the index existed can hold several rows per
+    key. Their payloads are merged oldest to newest into the newest row.
+    """
+    with engine.begin() as conn:
+        has_index = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_proposal_data_user_sheet_version'"
+        ).first()
+        if has_index:
+            return
+        
+        conn.exec_driver_sql("UPDATE proposal_data SET version = 'base' WHERE version IS NULL")
+        
+        duplicate_keys = conn.exec_driver_sql(
+            "SELECT user_id, sheet_id, version FROM proposal_data "
+            "GROUP BY user_id, sheet_id, version HAVING COUNT(*) > 1"
+        ).fetchall()
+        
+        for user_id, sheet_id, version in duplicate_keys:
+            rows = conn.exec_driver_sql(
+                "SELECT id, data_json FROM proposal_data WHERE user_id = ? AND sheet_id = ? AND version = ? "
+                "ORDER BY updated_at, id",
+                (user_id, sheet_id, version)
+            ).fetchall()
+            
+            merged = {}
+            for _, data_json in rows:
+                try:
+                    merged.update(json.loads(data_json))
+                except (json.JSONDecodeError, TypeError):
+                    continue
+            
+            keep_id = rows[-1][0]
+            conn.exec_driver_sql(
+                "UPDATE proposal_data SET data_json = ? WHERE id = ?",
+                (json.dumps(merged, ensure_ascii=False), keep_id)
+            )
+            conn.exec_driver_sql(
+                "DELETE FROM proposal_data WHERE user_id = ? AND sheet_id = ? AND version = ? AND id != ?",
+                (user_id, sheet_id, version, keep_id)
+            )
+        
+        conn.exec_driver_sql(
+            "CREATE UNIQUE INDEX ux_proposal_data_user_sheet_version "
+            "ON proposal_data (user_id, sheet_id, version)"
+        )
 
 # Sheet configurations for 2025 KIF (Real Template Structure)
 SHEET_CONFIG = {
@@ -85,6 +377,36 @@ SHEET_CONFIG = {
     "3-4.개별 투자실적3": {"reusability": "high", "category": "인력정보", "description": "Individual Investment Performance 3"}
 }
 
+# Row-heavy investment sheets whose payload is a table:
+# {'columns': [...], 'rows': [[...], ...]}. header_rows=None detects the
+# template's header block (last row holding label text).
+TABULAR_SHEETS = {
+    "2-1-1.청산펀드 세부1": {"header_rows": None},
+    "2-1-2.청산펀드 세부2": {"header_rows": None},
+    "2-2-1.운용펀드 세부1": {"header_rows": None},
+    "2-2-2.운용펀드 세부2": {"header_rows": None},
+    "2-4.본계정 투자내역": {"header_rows": None},
+    "3-2.개별 투자실적1": {"header_rows": None},
+    "3-3.개별 투자실적2": {"header_rows": None},
+    "3-4.개별 투자실적3": {"header_rows": None}
+}
+
+# Fixed cell positions used when the template does not expose the label
+STATIC_FIELD_CELLS = {
+    "1-2.재무실적": {
+        '유동자산': 'B8', '비유동자산': 'C8', '자산총계': 'D8',
+        '유동부채': 'B9', '비유동부채': 'C9', '부채총계': 'D9',
+        '자본금': 'B10', '자본잉여금': 'C10', '자본총계': 'D10',
+        '매출액': 'B11', '영업이익': 'C11', '당기순이익': 'D11'
+    }
+}
+
+# First-cell labels of total rows that close a table rather than extend its header
+TABLE_FOOTER_LABELS = {'합계', '소계', '총계', '계'}
+
+# Tables with at least this many rows bypass the in-memory cell model
+STREAMING_ROW_THRESHOLD = int(os.environ.get('STREAMING_ROW_THRESHOLD', '500'))
+
 # Utility Functions
 def hash_password(password: str) -> str:
     """Hash password using SHA-256"""
@@ -230,6 +552,89 @@ def parse_rfp_pdf(pdf_path: str) -> Dict[str, Any]:
     
     return rfp_info
 
+CELL_REF_PATTERN = re.compile(r'^[A-Z]+\d+$')
+
+@lru_cache(maxsize=65536)
+def _cell_ref_target(key: str) -> Optional[Tuple[int, int]]:
+    """(row, col) for keys that are literal cell references, else None"""
+    if CELL_REF_PATTERN.match(key):
+        return coordinate_to_tuple(key)
+    return None
+
+def compile_field_map(sheet_name: str, sheet_info: Dict) -> Dict[str, Any]:
+    """Compile stored field keys of one sheet into (row, col) targets
+    
+    Keys are derived from the detected labels:
+      '<label>'          -> cell to the right of the label
+      '<row>_<column>'   -> intersection of a row label and a column header
+                            above it (e.g. '유동자산_2021년')
+      '<column>_<n>'     -> n-th data row under a column header (e.g. '성명_0')
+    STATIC_FIELD_CELLS fills in keys the template labels do not cover.
+    Merged labels are stepped over, and cells covered by a merge (other
+    than its top-left cell) are never targets. Formula cells are listed
+    under 'protected' and never overwritten.
+    """
+    fields = sheet_info.get('fields', {})
+    max_row = min(sheet_info.get('max_row', 0), 150)
+    
+    # Top-left cell of each merged range -> its bottom-right cell
+    merged_ends = {}
+    covered = set()
+    for merged_range in sheet_info.get('merged_cells', []):
+        min_col, min_row, max_col, max_row_merged = range_boundaries(merged_range)
+        merged_ends[(min_row, min_col)] = (max_row_merged, max_col)
+        covered.update((row, col) for row in range(min_row, max_row_merged + 1)
+                       for col in range(min_col, max_col + 1) if (row, col) != (min_row, min_col))
+    
+    def right_of(pos: Tuple[int, int]) -> Tuple[int, int]:
+        return (pos[0], merged_ends.get(pos, pos)[1] + 1)
+    
+    def below(pos: Tuple[int, int]) -> Tuple[int, int]:
+        return (merged_ends.get(pos, pos)[0] + 1, pos[1])
+    
+    labels = {}
+    for field in fields.values():
+        labels.setdefault(field['label'], (field['row'], field['col']))
+    label_cells = {(field['row'], field['col']) for field in fields.values()}
+    
+    # Row labels have a free cell to their right; column headers a free cell below
+    row_labels = [(label, pos) for label, pos in labels.items() if right_of(pos) not in label_cells]
+    column_headers = [(label, pos) for label, pos in labels.items() if below(pos) not in label_cells]
+    
+    headers_by_row = {}
+    for label, (row, col) in column_headers:
+        headers_by_row.setdefault(row, []).append((label, col))
+    header_rows = sorted(headers_by_row)
+    
+    targets = {}
+    for label, (row, col) in row_labels:
+        targets[label] = right_of((row, col))
+        
+        # Nearest header row above that has headers to the right of this label
+        for header_row in reversed(header_rows):
+            if header_row >= row:
+                continue
+            matches = [(header, header_col) for header, header_col in headers_by_row[header_row] if header_col > col]
+            if matches:
+                for header, header_col in matches:
+                    targets.setdefault(f"{label}_{header}", (row, header_col))
+                break
+    
+    for label, (row, col) in column_headers:
+        first_row = below((row, col))[0]
+        for index in range(max(max_row - first_row + 1, 0)):
+            target = (first_row + index, col)
+            if target not in label_cells:
+                targets.setdefault(f"{label}_{index}", target)
+    
+    for key, cell_ref in STATIC_FIELD_CELLS.get(sheet_name, {}).items():
+        targets.setdefault(key, coordinate_to_tuple(cell_ref))
+    targets = {key: target for key, target in targets.items() if target not in covered}
+    
+    protected = [coordinate_to_tuple(cell_ref) for cell_ref in sheet_info.get('formulas', {})]
+    
+    return {'targets': targets, 'protected': protected}
+
 def parse_excel_template(excel_path: str) -> Dict[str, Dict]:
     """Load Excel template and extract structure with comprehensive field detection"""
     template_structure = {}
@@ -335,6 +740,7 @@ def parse_excel_template(excel_path: str) -> Dict[str, Dict]:
                 
                 sheet_info['matched_config'] = matched_config
                 sheet_info['sheet_category'] = SHEET_CONFIG.get(matched_config, {}).get('category', 'unknown')
+                sheet_info['field_map'] = compile_field_map(sheet_name, sheet_info)
                 
                 template_structure[sheet_name] = sheet_info
         
@@ -352,248 +758,3287 @@ def parse_excel_template(excel_path: str) -> Dict[str, Dict]:
         st.error(f"Excel 템플릿 파싱 오류: {str(e)}")
         st.exception(e)
     
-    return template_structure
+    return template_structure
+
+VAULT_CACHE_SIZE = int(os.environ.get('VAULT_CACHE_SIZE', '256'))
+
+@st.cache_resource
+def get_vault_cache() -> Dict[str, Any]:
+    """Decoded vault data per user, tagged with the revision it was read at"""
+    return {'entries': OrderedDict(), 'lock': threading.Lock()}
+
+def get_vault_revision(user_id: int) -> int:
+    """Current vault revision; every write bumps it"""
+    with SessionLocal() as session:
+        revision = session.query(VaultRevision.revision).filter_by(user_id=user_id).scalar()
+    return revision or 0
+
+def _bump_vault_revision(session: Session, user_id: int):
+    """Invalidate cached reads of the user's vault (call inside the write transaction)"""
+    stmt = sqlite_insert(VaultRevision).values(user_id=user_id, revision=1)
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={'revision': VaultRevision.revision + 1}
+    ))
+
+PAYLOAD_COMPRESS_THRESHOLD = int(os.environ.get('PAYLOAD_COMPRESS_THRESHOLD', '32768'))
+PAYLOAD_COMPRESS_LEVEL = int(os.environ.get('PAYLOAD_COMPRESS_LEVEL', '1'))
+
+PAYLOAD_FORMATS = {
+    # format tag -> (data_json, data_blob) to JSON text
+    'json': lambda data_json, data_blob: data_json,
+    'zlib-json': lambda data_json, data_blob: zlib.decompress(data_blob).decode('utf-8'),
+}
+
+def _finite(value: Any) -> Any:
+    """value with NaN/Infinity floats replaced by None, as orjson writes them"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+def dumps_payload(payload: Any, sort_keys: bool = False) -> str:
+    """JSON text of a payload (orjson when installed, stdlib json otherwise)
+    
+    Both paths write compact separators and store NaN and Infinity as null
+    (they are not JSON, and SQLite's JSON functions reject them). sort_keys
+    gives the canonical text that payload_hash() addresses. The encoders
+    still differ in exponent notation of very large or small floats (1e16
+    vs 1e+16).
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        try:
+            return orjson.dumps(payload, option=option).decode('utf-8')
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; let stdlib json decide
+    try:
+        return json.dumps(payload, ensure_ascii=False, sort_keys=sort_keys, separators=(',', ':'), allow_nan=False)
+    except ValueError as e:
+        if 'Out of range float' not in str(e):
+            raise
+        return json.dumps(_finite(payload), ensure_ascii=False, sort_keys=sort_keys, separators=(',', ':'))
+
+def loads_payload(text: str) -> Any:
+    """Parse payload JSON text (orjson when installed, stdlib json otherwise)"""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass  # NaN/Infinity written by stdlib json
+    return json.loads(text)
+
+def encode_payload(payload_json: str) -> Dict[str, Any]:
+    """Storage columns for a payload's JSON text
+    
+    Payloads of PAYLOAD_COMPRESS_THRESHOLD characters or more are stored
+    zlib-compressed in data_blob (0 disables compression); smaller ones as
+    plain JSON text, which the SQL JSON functions can read.
+    """
+    if 0 < PAYLOAD_COMPRESS_THRESHOLD <= len(payload_json):
+        blob = zlib.compress(payload_json.encode('utf-8'), PAYLOAD_COMPRESS_LEVEL)
+        return {'data_format': 'zlib-json', 'data_json': '', 'data_blob': blob}
+    return {'data_format': 'json', 'data_json': payload_json, 'data_blob': None}
+
+def stored_payload_json(data_format: Optional[str], data_json: str, data_blob: Optional[bytes]) -> str:
+    """JSON text of a stored row, whatever its format"""
+    return PAYLOAD_FORMATS[data_format or 'json'](data_json, data_blob)
+
+def decode_payload(data_format: Optional[str], data_json: str, data_blob: Optional[bytes]) -> Any:
+    return loads_payload(stored_payload_json(data_format, data_json, data_blob))
+
+def payload_hash(payload: Any) -> str:
+    """Content address of a payload: SHA-256 of its canonical JSON
+    
+    Keys are sorted and the text is compact, so equal content gets the same
+    address whichever path (update_data, patch_data's json_set, a migration)
+    produced the stored text.
+    """
+    return hashlib.sha256(dumps_payload(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+def _store_blobs(session: Session, blobs: Dict[str, str]):
+    """Insert {hash: JSON text} blobs that do not exist yet
+    
+    Call before pointing rows at them: the refcount triggers only count
+    references to blobs that already exist.
+    """
+    if not blobs:
+        return
+    stmt = sqlite_insert(PayloadBlob).on_conflict_do_nothing(index_elements=['hash'])
+    now = datetime.now()
+    session.execute(stmt, [
+        {'hash': blob_hash, **encode_payload(payload_json), 'size': len(payload_json),
+         'refcount': 0, 'created_at': now}
+        for blob_hash, payload_json in blobs.items()
+    ])
+
+def collect_payload_blobs(session: Session) -> int:
+    """Delete blobs no sheet or revision refers to; returns how many"""
+    return session.execute(
+        PayloadBlob.__table__.delete().where(PayloadBlob.refcount <= 0)
+    ).rowcount
+
+def _migrate_payload_formats(stale: List[Dict[str, Any]]):
+    """Re-encode blobs read in an outdated format (best effort, content unchanged)"""
+    table = PayloadBlob.__table__
+    try:
+        with engine.begin() as conn:
+            conn.execute(table.update().where(
+                (table.c.hash == bindparam('b_hash')) & (table.c.data_format == bindparam('b_data_format'))
+            ), stale)
+    except Exception:
+        pass  # e.g. database busy; the next read tries again
+
+def _json_path(key: str) -> str:
+    """SQLite JSON1 path selecting a top-level key"""
+    return '$."' + key + '"'
+
+def _decode_projected(value: Any, value_type: Optional[str]) -> Any:
+    """Turn a json_extract() result back into the stored Python value"""
+    if value_type in ('object', 'array'):
+        return json.loads(value)
+    if value_type == 'true':
+        return True
+    if value_type == 'false':
+        return False
+    if value_type == 'null':
+        return None
+    return value
+
+def _read_stored_data(user_id: int, sheets: Optional[Tuple[str, ...]] = None,
+                      versions: Optional[Tuple[str, ...]] = None,
+                      keys: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+    """Fetch and decode stored sheets, filtering and projecting in SQL"""
+    stored_data = {}
+    
+    # Keys that cannot be expressed as a JSON path are filtered in Python instead
+    push_down = keys is not None and not any('"' in key for key in keys)
+    
+    stale = []
+    
+    with SessionLocal() as session:
+        columns = [PayloadBlob.hash, ProposalData.sheet_id, ProposalData.version,
+                   PayloadBlob.data_format, PayloadBlob.data_blob]
+        if push_down:
+            # Only JSON text blobs can be projected in SQL; the rest are decoded below
+            is_text = PayloadBlob.data_format == 'json'
+            for key in keys:
+                columns.append(case((is_text, func.json_extract(PayloadBlob.data_json, _json_path(key)))))
+                columns.append(case((is_text, func.json_type(PayloadBlob.data_json, _json_path(key)))))
+        else:
+            columns.append(PayloadBlob.data_json)
+        
+        query = session.query(*columns).join(
+            PayloadBlob, PayloadBlob.hash == ProposalData.payload_hash
+        ).filter(ProposalData.user_id == user_id)
+        if sheets is not None:
+            query = query.filter(ProposalData.sheet_id.in_(sheets))
+        if versions is not None:
+            query = query.filter(ProposalData.version.in_(versions))
+        
+        for row in query:
+            blob_hash, sheet_id, version, data_format, data_blob = row[:5]
+            if sheet_id not in stored_data:
+                stored_data[sheet_id] = {}
+            
+            if push_down and data_format == 'json':
+                data = {}
+                for index, key in enumerate(keys):
+                    value, value_type = row[5 + 2 * index], row[6 + 2 * index]
+                    if value_type is not None:
+                        data[key] = _decode_projected(value, value_type)
+            else:
+                # Binary formats keep data_json empty, so it is not selected for projections
+                data_json = '' if push_down else row[5]
+                try:
+                    payload_json = stored_payload_json(data_format, data_json, data_blob)
+                    data = loads_payload(payload_json)
+                except (KeyError, zlib.error, json.JSONDecodeError):
+                    continue
+                
+                encoded = encode_payload(payload_json)
+                if encoded['data_format'] != data_format:
+                    stale.append({'b_hash': blob_hash, 'b_data_format': data_format, **encoded})
+                if keys is not None:
+                    data = {key: data[key] for key in keys if key in data}
+            
+            stored_data[sheet_id][version] = data
+    
+    if stale:
+        _migrate_payload_formats(stale)
+    
+    return stored_data
+
+def _cached_vault_read(user_id: int, cache_key: Tuple, loader: Callable[[], Dict]) -> Dict[str, Any]:
+    """Serve a vault read from the cache while the user's revision is unchanged"""
+    # Read the revision first: data loaded afterwards is at least this new
+    revision = get_vault_revision(user_id)
+    cache_key = (str(engine.url), user_id) + cache_key
+    cache = get_vault_cache()
+    
+    with cache['lock']:
+        cached = cache['entries'].get(cache_key)
+        if cached and cached[0] == revision:
+            cache['entries'].move_to_end(cache_key)
+            return cached[1]
+    
+    result = loader()
+    
+    with cache['lock']:
+        cache['entries'][cache_key] = (revision, result)
+        cache['entries'].move_to_end(cache_key)
+        while len(cache['entries']) > VAULT_CACHE_SIZE:
+            cache['entries'].popitem(last=False)
+    
+    return result
+
+def load_stored_data(user_id: int, sheets: Optional[List[str]] = None,
+                     versions: Optional[List[str]] = None,
+                     keys: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Fetch stored data from database, memoized per vault revision
+    
+    sheets and versions restrict which rows are read; keys projects each
+    payload down to those top-level keys (an empty list reads no payload,
+    only which sheet/version rows exist). Filtering happens in SQL, so
+    unneeded payloads are never transferred or decoded. The result is
+    shared between callers and reruns; treat it as read-only.
+    """
+    sheets = tuple(sorted(sheets)) if sheets is not None else None
+    versions = tuple(sorted(versions)) if versions is not None else None
+    keys = tuple(keys) if keys is not None else None
+    
+    return _cached_vault_read(
+        user_id,
+        ('data', sheets, versions, keys),
+        lambda: _read_stored_data(user_id, sheets, versions, keys)
+    )
+
+def preview_stored_data(user_id: int, version: str = 'base', limit: int = 5) -> Dict[str, Dict[str, Any]]:
+    """First few fields of each sheet in one version, selected with json_each()"""
+    def loader():
+        preview = {}
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql(
+                "SELECT sheet_id, key, value, type FROM ("
+                "  SELECT p.sheet_id, j.key, j.value, j.type,"
+                "         ROW_NUMBER() OVER (PARTITION BY p.id ORDER BY j.id) AS position"
+                "  FROM proposal_data p JOIN payload_blobs b ON b.hash = p.payload_hash, json_each(b.data_json) j"
+                "  WHERE p.user_id = ? AND p.version = ? AND b.data_format = 'json' AND json_valid(b.data_json)"
+                ") WHERE position <= ?",
+                (user_id, version, limit)
+            )
+            for sheet_id, key, value, value_type in rows:
+                preview.setdefault(sheet_id, {})[key] = _decode_projected(value, value_type)
+            
+            # Compressed payloads are decoded in Python
+            rows = conn.exec_driver_sql(
+                "SELECT p.sheet_id, b.data_format, b.data_blob "
+                "FROM proposal_data p JOIN payload_blobs b ON b.hash = p.payload_hash "
+                "WHERE p.user_id = ? AND p.version = ? AND b.data_format != 'json'",
+                (user_id, version)
+            )
+            for sheet_id, data_format, data_blob in rows:
+                payload = decode_payload(data_format, '', data_blob)
+                preview[sheet_id] = dict(list(payload.items())[:limit])
+        return preview
+    
+    return _cached_vault_read(user_id, ('preview', version, limit), loader)
+
+HISTORY_PAGE_SIZE = 20
+
+def get_version_summaries(user_id: int) -> List[Dict[str, Any]]:
+    """Sheet count and last modification per version, newest first (one GROUP BY)"""
+    def loader():
+        last_modified = func.max(ProposalData.updated_at)
+        with SessionLocal() as session:
+            rows = session.query(
+                ProposalData.version, func.count(ProposalData.id), last_modified
+            ).filter(ProposalData.user_id == user_id).group_by(
+                ProposalData.version
+            ).order_by(last_modified.desc(), ProposalData.version).all()
+        return [
+            {'version': version, 'sheet_count': sheet_count, 'updated_at': updated_at}
+            for version, sheet_count, updated_at in rows
+        ]
+    
+    return _cached_vault_read(user_id, ('versions',), loader)
+
+def list_version_sheets(user_id: int, version: str, after: Optional[Tuple[datetime, int]] = None,
+                        limit: int = HISTORY_PAGE_SIZE) -> Tuple[List[Dict[str, Any]], Optional[Tuple[datetime, int]]]:
+    """One page of a version's sheets, most recently modified first
+    
+    Keyset pagination on (updated_at, id): pass the returned cursor as
+    `after` to get the next page. The cursor is None on the last page.
+    """
+    with SessionLocal() as session:
+        query = session.query(ProposalData.id, ProposalData.sheet_id, ProposalData.updated_at).filter(
+            ProposalData.user_id == user_id,
+            ProposalData.version == version
+        )
+        if after is not None:
+            query = query.filter(tuple_(ProposalData.updated_at, ProposalData.id) < tuple_(*after))
+        rows = query.order_by(ProposalData.updated_at.desc(), ProposalData.id.desc()).limit(limit + 1).all()
+    
+    page = [{'sheet_id': sheet_id, 'updated_at': updated_at} for _, sheet_id, updated_at in rows[:limit]]
+    cursor = (rows[limit - 1][2], rows[limit - 1][0]) if len(rows) > limit else None
+    return page, cursor
+
+# RFP requirement matching: template field labels and stored field keys are
+# indexed by normalized token, and each requirement is resolved by lookups
+WORD_PATTERN = re.compile(r'[0-9A-Za-z]+|[가-힣]+')
+NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+YEARS_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*년?\s*$')
+
+@lru_cache(maxsize=65536)
+def _match_tokens(text: str) -> frozenset:
+    """Normalized tokens of a label or key
+    
+    Latin words are lowercased and Hangul words split into bigrams, so
+    '경력' finds '경력년수_0'. Digits and single syllables are dropped.
+    """
+    tokens = set()
+    for word in WORD_PATTERN.findall(str(text)):
+        if word.isdigit():
+            continue
+        if word.isascii():
+            tokens.add(word.lower())
+        elif len(word) >= 2:
+            tokens.update(word[i:i + 2] for i in range(len(word) - 1))
+    return frozenset(tokens)
+
+def _value_tokens(value: Any) -> frozenset:
+    if isinstance(value, (list, tuple)):
+        return frozenset().union(*(_value_tokens(item) for item in value)) if value else frozenset()
+    return _match_tokens(str(value)) if value not in (None, '') else frozenset()
+
+def build_field_index(template_structure: Dict[str, Dict], stored_base: Dict[str, Dict]) -> Dict[str, Any]:
+    """Inverted index over template field labels and stored (base) field keys
+    
+    Returns {'entries': [{'sheet_id', 'field', 'source', 'values'}],
+    'postings': {token: {entry positions}}}. Stored table sheets are indexed
+    per column, with the column's values.
+    """
+    entries = []
+    for sheet_id, info in template_structure.items():
+        labels = {field['label'] for field in info.get('fields', {}).values()}
+        entries += [{'sheet_id': sheet_id, 'field': label, 'source': 'template', 'values': []}
+                    for label in sorted(labels)]
+    
+    for sheet_id, payload in stored_base.items():
+        if not isinstance(payload, dict):
+            continue
+        if _is_table_payload(payload):
+            for position, column in enumerate(payload['columns']):
+                values = [row[position] for row in payload['rows']
+                          if isinstance(row, (list, tuple)) and position < len(row)]
+                entries.append({'sheet_id': sheet_id, 'field': str(column), 'source': 'vault', 'values': values})
+        else:
+            entries += [{'sheet_id': sheet_id, 'field': key, 'source': 'vault', 'values': [value]}
+                        for key, value in payload.items()]
+    
+    postings = {}
+    for position, entry in enumerate(entries):
+        for token in _match_tokens(entry['field']):
+            postings.setdefault(token, set()).add(position)
+    return {'entries': entries, 'postings': postings}
+
+def get_field_index(user_id: int, template_structure: Dict[str, Dict], template_id: str = '') -> Dict[str, Any]:
+    """build_field_index for the user's base version, memoized per vault revision and template"""
+    def loader():
+        stored = load_stored_data(user_id, versions=['base'])
+        return build_field_index(template_structure, {sheet: versions['base'] for sheet, versions in stored.items()})
+    return _cached_vault_read(user_id, ('field_index', template_id), loader)
+
+def _lookup_fields(index: Dict[str, Any], phrases: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """Entries whose field matches any phrase (all of the phrase's tokens)"""
+    found = set()
+    for phrase in phrases:
+        tokens = _match_tokens(phrase)
+        postings = [index['postings'].get(token, set()) for token in tokens]
+        if postings:
+            found |= set.intersection(*postings)
+    return [index['entries'][position] for position in sorted(found)]
+
+def _numbers(entries: List[Dict[str, Any]]) -> List[float]:
+    numbers = []
+    for entry in entries:
+        for value in entry['values']:
+            if isinstance(value, bool):
+                continue
+            if isinstance(value, (int, float)):
+                numbers.append(float(value))
+            elif isinstance(value, str) and NUMBER_PATTERN.search(value.replace(',', '')):
+                numbers.append(float(NUMBER_PATTERN.search(value.replace(',', '')).group()))
+    return numbers
+
+def _required_number(text: str) -> Optional[float]:
+    match = NUMBER_PATTERN.search(str(text or ''))
+    return float(match.group()) if match else None
+
+def _check_area(entries, area):
+    tokens = _match_tokens(area)
+    if any(tokens <= _value_tokens(value) for entry in entries for value in entry['values']):
+        return True, f"'{area}' 분야가 입력되어 있음"
+    return False, f"'{area}' 분야 투자 전략·실적 기재 필요"
+
+def _check_personnel_count(entries, required):
+    by_sheet = {}
+    for entry in entries:
+        by_sheet[entry['sheet_id']] = by_sheet.get(entry['sheet_id'], 0) + len([v for v in entry['values'] if v])
+    count = max(by_sheet.values())
+    return count >= required, f"핵심운용인력 {count}명 입력 (요건 {required:g}명 이상)"
+
+def _years(entries: List[Dict[str, Any]]) -> List[float]:
+    """Numbers of year-count values (12, 12.5, "12", "12년"); dates and period text are skipped"""
+    years = []
+    for entry in entries:
+        for value in entry['values']:
+            if isinstance(value, bool):
+                continue
+            if isinstance(value, (int, float)):
+                years.append(float(value))
+            elif isinstance(value, str) and YEARS_PATTERN.match(value):
+                years.append(float(YEARS_PATTERN.match(value).group(1)))
+    return years
+
+def _check_lead_experience(entries, required):
+    longest = max(_years(entries), default=0)
+    return longest >= required, f"최장 경력 {longest:g}년 (대표펀드매니저 요건 {required:g}년 이상)"
+
+def _check_other_experience(entries, required):
+    short = [n for n in _years(entries) if n < required]
+    if short:
+        return False, f"경력 {required:g}년 미만 인력 {len(short)}명"
+    return True, f"모든 인력 경력 {required:g}년 이상"
+
+def _check_lead_career(people, required):
+    lead = next(person for person in people if person['lead'])
+    return lead['years'] >= required, (f"대표펀드매니저 {lead['name']} 인정 경력 {lead['years']:g}년 "
+                                       f"(요건 {required:g}년 이상)")
+
+def _check_other_careers(people, required):
+    short = [person['name'] for person in people if not person['lead'] and person['years'] < required]
+    if short:
+        return False, f"인정 경력 {required:g}년 미만 인력: {', '.join(short)}"
+    return True, f"모든 인력 인정 경력 {required:g}년 이상"
+
+def _check_minimum_ratio(entries, required):
+    highest = max(_numbers(entries), default=0)
+    return highest >= required, f"입력값 {highest:g}% (요건 {required:g}% 이상)"
+
+def _check_duration(entries, required):
+    durations = _numbers(entries)
+    if durations and max(durations) > required:
+        return False, f"존속기간 {max(durations):g}년 (요건 {required:g}년 이내)"
+    return True, f"존속기간 요건 {required:g}년 이내"
+
+# Requirement kinds: rfp_info key -> (label, field phrases, check). Phrases
+# select the sheet fields holding the evidence; check(entries, expected)
+# returns (ok, message) over the stored values of those fields.
+RFP_REQUIREMENTS = {
+    'investment_areas': ("투자 분야", ('투자분야', '업종', '섹터'), _check_area),
+    'minimum_count': ("핵심운용인력 수", ('성명',), _check_personnel_count),
+    'lead_manager_experience': ("대표펀드매니저 경력", ('경력',), _check_lead_experience),
+    'other_experience': ("핵심운용인력 경력", ('경력',), _check_other_experience),
+    'mandatory_investment': ("의무투자 비율", ('의무투자', '주목적', '투자비율'), _check_minimum_ratio),
+    'gp_contribution': ("GP 출자비율", ('출자비율', 'GP출자'), _check_minimum_ratio),
+    'fund_duration': ("존속기간", ('존속기간',), _check_duration),
+}
+
+# Experience requirements checked against check_career_requirements()
+# people (merged 3-1 periods as of 공고일) when the vault has dated periods
+CAREER_REQUIREMENTS = {
+    'lead_manager_experience': _check_lead_career,
+    'other_experience': _check_other_careers,
+}
+
+def extract_rfp_requirements(rfp_info: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """(kind, expected value) pairs for the requirements an RFP states"""
+    requirements = [('investment_areas', area) for area in rfp_info.get('investment_areas') or []]
+    personnel = rfp_info.get('core_personnel_requirements') or {}
+    for kind, text in [
+        ('minimum_count', personnel.get('minimum_count')),
+        ('lead_manager_experience', personnel.get('lead_manager_experience')),
+        ('other_experience', personnel.get('other_experience')),
+        ('mandatory_investment', rfp_info.get('mandatory_investment')),
+        ('gp_contribution', rfp_info.get('gp_contribution')),
+        ('fund_duration', rfp_info.get('fund_duration')),
+    ]:
+        if _required_number(text) is not None:
+            requirements.append((kind, _required_number(text)))
+    return requirements
+
+def match_rfp_requirements(index: Dict[str, Any], rfp_info: Dict[str, Any],
+                           careers: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Resolve each RFP requirement against a field index into findings
+    
+    Each finding has 'requirement', 'label', 'status' ('ok', 'gap' when the
+    template asks for the field but the vault lacks a value or falls short,
+    'missing' when no sheet has such a field), 'sheet_id', 'field' and
+    'message'. Build the index once and reuse it across RFPs. careers is
+    check_career_requirements() for the same version: when it lists people,
+    the experience requirements are judged on their merged 3-1 periods
+    instead of typed year counts.
+    """
+    people = (careers or {}).get('people') or []
+    findings = []
+    for kind, expected in extract_rfp_requirements(rfp_info):
+        label, phrases, check = RFP_REQUIREMENTS[kind]
+        finding = {'requirement': kind, 'label': label, 'sheet_id': None, 'field': None}
+        if kind in CAREER_REQUIREMENTS and people:
+            ok, detail = CAREER_REQUIREMENTS[kind](people, expected)
+            finding.update(status='ok' if ok else 'gap', sheet_id=CAREER_SHEET,
+                           message=f"{label}: {detail} ('{CAREER_SHEET}', 공고일 {careers['as_of']} 기준)")
+            findings.append(finding)
+            continue
+        
+        entries = _lookup_fields(index, phrases)
+        filled = [entry for entry in entries if entry['source'] == 'vault' and any(entry['values'])]
+        
+        if not entries:
+            finding.update(status='missing', message=f"{label}: 관련 필드가 템플릿과 보관소에 없음")
+        elif not filled:
+            target = entries[0]
+            finding.update(status='gap', sheet_id=target['sheet_id'], field=target['field'],
+                           message=f"{label}: '{target['sheet_id']} › {target['field']}' 입력 필요")
+        else:
+            ok, detail = check(filled, expected)
+            finding.update(status='ok' if ok else 'gap', sheet_id=filled[0]['sheet_id'], field=filled[0]['field'],
+                           message=f"{label}: {detail} ('{filled[0]['sheet_id']} › {filled[0]['field']}')")
+        findings.append(finding)
+    return findings
+
+def compare_data(completeness: Dict, rfp_reqs: Dict, field_index: Optional[Dict[str, Any]] = None,
+                 careers: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Analyze data availability and suggest improvements
+    
+    completeness is get_completeness() for the base version and the
+    parsed template: filled and required field counts per sheet.
+    field_index (get_field_index()) resolves the RFP's requirements into
+    'findings'; unmet ones become suggestions. careers
+    (check_career_requirements() for base) decides experience requirements.
+    """
+    comparison = {
+        'available': [],
+        'partial': [],
+        'missing': [],
+        'findings': [],
+        'suggestions': []
+    }
+    
+    # Check each sheet
+    for sheet_name in SHEET_CONFIG.keys():
+        counts = completeness.get(sheet_name, {}).get('base')
+        if not counts:
+            comparison['missing'].append(sheet_name)
+        elif counts['required']:
+            # Check if data is complete
+            if counts['filled'] >= counts['required'] * 0.8:
+                comparison['available'].append(sheet_name)
+            elif counts['filled'] >= counts['required'] * 0.3:
+                comparison['partial'].append(sheet_name)
+            else:
+                comparison['missing'].append(sheet_name)
+        else:
+            comparison['available'].append(sheet_name)
+    
+    # Suggestions from the RFP requirements the vault does not meet yet
+    if field_index is not None and rfp_reqs:
+        comparison['findings'] = match_rfp_requirements(field_index, rfp_reqs, careers)
+        comparison['suggestions'] += [f['message'] for f in comparison['findings'] if f['status'] != 'ok']
+    
+    if len(comparison['missing']) > 5:
+        comparison['suggestions'].append("주요 데이터가 많이 누락됨. 기본 정보부터 순차적으로 입력 권장")
+    
+    return comparison
+
+# Career periods (3-1 핵심운용인력 경력기간)
+CAREER_SHEET = "3-1.핵심운용인력 경력기간"
+PERSONNEL_SHEET = "1-4.핵심운용인력 관리현황"
+# Column (or indexed form key) keywords of the 3-1 sheet; 'period' holds
+# "2015.03 ~ 2020.02" text when there are no separate start/end columns
+CAREER_FIELDS = {
+    'name': ('성명',),
+    'start': ('시작', '입사', '부터'),
+    'end': ('종료', '퇴사', '까지'),
+    'period': ('기간',),
+    'role': ('구분', '역할', '직위'),
+    'eligible': ('인정',),
+}
+# 2015.03, 2015-03-01, 2015/3/1, 2015년 3월 1일 (optionally with a time of day)
+CAREER_DATE = (r'(\d{4})\s*(?:[./-]|년)\s*(\d{1,2})(?:\s*월)?'
+               r'(?:(?:[./-]|\s*(?=\d{1,2}\s*일))(\d{1,2})(?:\s*일)?)?\.?(?:\s+\d{1,2}:\d{2}(?::\d{2})?)?')
+CAREER_DATE_PATTERN = rf'^\s*{CAREER_DATE}\s*$'
+# Start date, a ~ - – — separator, then the end text (a date, 현재, or blank)
+CAREER_PERIOD_PATTERN = rf'^\s*{CAREER_DATE}\s*[~\-–—]\s*(.*?)\s*$'
+CAREER_ONGOING = ('현재', '재직')
+CAREER_EXCLUDED = {'N', 'X', '아니오', '미인정', '불인정'}
+CAREER_DAYS_PER_YEAR = 365.25
+
+def _career_field(label: str) -> Optional[str]:
+    # Checked in CAREER_FIELDS order, so '근무기간(시작)' is a start column
+    for field, keywords in CAREER_FIELDS.items():
+        if any(keyword in str(label) for keyword in keywords):
+            return field
+    return None
+
+def _career_rows(payload: Dict) -> pd.DataFrame:
+    """One row per employment period of a 3-1 payload (table or indexed form keys)"""
+    if _is_table_payload(payload):
+        positions = {}
+        for position, column in enumerate(payload['columns']):
+            positions.setdefault(_career_field(column), position)
+        rows = [row for row in payload['rows'] if isinstance(row, (list, tuple))]
+        frame = pd.DataFrame({
+            field: [row[positions[field]] if field in positions and positions[field] < len(row) else None for row in rows]
+            for field in CAREER_FIELDS
+        })
+    else:
+        records = {}
+        for key, value in payload.items():
+            match = re.match(r'^(.*)_(\d+)$', str(key))
+            field = _career_field(match.group(1)) if match else None
+            if field:
+                records.setdefault(int(match.group(2)), {}).setdefault(field, value)
+        frame = pd.DataFrame([records[index] for index in sorted(records)], columns=list(CAREER_FIELDS))
+    frame['name'] = frame['name'].fillna('').astype(str).str.strip()
+    return frame[frame['name'] != '']
+
+def _career_dates(values: pd.Series, period_end: bool) -> pd.Series:
+    """Dates of cells holding exactly one date (NaT otherwise)"""
+    return _career_part_dates(values.fillna('').astype(str).str.extract(CAREER_DATE_PATTERN), period_end)
+
+def _career_part_dates(parts: pd.DataFrame, period_end: bool) -> pd.Series:
+    """Dates of extracted (year, month, day) text; a missing day is the first of the month, or the last for ends"""
+    parts = parts.astype(float)
+    columns = parts.columns
+    dates = pd.to_datetime(pd.DataFrame({'year': parts[columns[0]], 'month': parts[columns[1]],
+                                         'day': parts[columns[2]].fillna(1)}), errors='coerce')
+    if period_end:
+        dates = dates.where(parts[columns[2]].notna(), dates + pd.offsets.MonthEnd(0))
+    return dates
+
+def _career_periods(frame: pd.DataFrame) -> pd.DataFrame:
+    """start/end dates of _career_rows() plus 'invalid' flags (end NaT = still employed)
+    
+    Rows without start text take both dates from their period text. Only a
+    blank end, or one saying 현재/재직, means still employed; a row whose
+    start or non-blank end is not a date, or that ends before it starts,
+    is invalid.
+    """
+    def text(column: str) -> pd.Series:
+        return frame[column].fillna('').astype(str).str.strip()
+    
+    start_text, end_text = text('start'), text('end')
+    period = text('period').str.extract(CAREER_PERIOD_PATTERN)
+    from_period = (start_text == '') & (text('period') != '')
+    starts = _career_dates(start_text, False).where(~from_period, _career_part_dates(period[[0, 1, 2]], False))
+    end_text = end_text.where(~from_period, period[3].fillna(''))
+    
+    ends = _career_dates(end_text, True)
+    ongoing = (end_text == '') | end_text.str.contains('|'.join(CAREER_ONGOING))
+    invalid = starts.isna() | (ends.isna() & ~ongoing) | (ends < starts)
+    return pd.DataFrame({'start': starts, 'end': ends.where(~ongoing), 'invalid': invalid})
+
+def merge_career_periods(periods: pd.DataFrame, as_of: pd.Timestamp) -> pd.DataFrame:
+    """Merge overlapping or back-to-back periods per person with one sort-and-sweep pass
+    
+    periods has 'person', 'start' and 'end' (NaT = still employed); ends are
+    inclusive and clipped to as_of, periods starting after it are dropped.
+    Returns the merged ('person', 'start', 'end') intervals.
+    """
+    periods = periods.assign(end=periods['end'].fillna(as_of).clip(upper=as_of))
+    periods = periods[periods['start'].notna() & (periods['start'] <= periods['end'])]
+    periods = periods.sort_values(['person', 'start'], kind='stable')
+    # A period opens a new interval when it starts after the day following every earlier end of the person
+    reach = periods.groupby('person')['end'].cummax()
+    previous = reach.groupby(periods['person']).shift()
+    opens = previous.isna() | (periods['start'] > previous + pd.Timedelta(days=1))
+    return periods.assign(block=opens.cumsum()).groupby(['person', 'block'], as_index=False, sort=False).agg(
+        start=('start', 'min'), end=('end', 'max')
+    ).drop(columns='block')
+
+def career_experience(periods: pd.DataFrame, as_of: pd.Timestamp) -> pd.Series:
+    """Years of non-overlapping experience per person as of as_of"""
+    merged = merge_career_periods(periods, as_of)
+    days = (merged['end'] - merged['start']).dt.days + 1
+    return (days.groupby(merged['person']).sum() / CAREER_DAYS_PER_YEAR).reindex(
+        periods['person'].unique(), fill_value=0.0
+    )
+
+def check_career_requirements(user_id: int, rfp_info: Dict[str, Any],
+                              versions: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Qualifying experience of every 3-1 person against the RFP's core personnel requirements
+    
+    Experience is counted as of the announcement date (today when the RFP
+    has none) after merging each person's periods, for all people of all
+    requested versions in one pass. The lead manager is the person whose
+    3-1 role or 1-4 직위 contains '대표' (else the most experienced one).
+    Periods that cannot be read are not counted and are listed in
+    'invalid'. Returns {'as_of', 'people': [...], 'versions': {version:
+    {...}}, 'invalid': [...]}.
+    """
+    as_of = pd.to_datetime(rfp_info.get('announcement_date') or None, errors='coerce')
+    if pd.isna(as_of):
+        as_of = pd.Timestamp(date.today())
+    requirements = rfp_info.get('core_personnel_requirements') or {}
+    lead_years = _required_number(requirements.get('lead_manager_experience'))
+    other_years = _required_number(requirements.get('other_experience'))
+    minimum_count = _required_number(requirements.get('minimum_count'))
+    
+    stored = load_stored_data(user_id, sheets=[CAREER_SHEET, PERSONNEL_SHEET], versions=versions)
+    frames, titles = [], {}
+    for version, payload in stored.get(CAREER_SHEET, {}).items():
+        if isinstance(payload, dict):
+            frames.append(_career_rows(payload).assign(version=version))
+    for version, payload in stored.get(PERSONNEL_SHEET, {}).items():
+        for key, value in (payload.items() if isinstance(payload, dict) and not _is_table_payload(payload) else []):
+            match = re.match(r'^성명_(\d+)$', str(key))
+            if match and str(value or '').strip():
+                titles[(version, str(value).strip())] = str(payload.get(f"직위_{match.group(1)}") or '')
+    
+    result = {'as_of': as_of.strftime('%Y-%m-%d'), 'people': [], 'versions': {}, 'invalid': []}
+    if not frames:
+        return result
+    
+    frame = pd.concat(frames, ignore_index=True)
+    periods = _career_periods(frame)
+    eligible = ~frame['eligible'].fillna('').astype(str).str.strip().str.upper().isin(CAREER_EXCLUDED)
+    for row in frame[periods['invalid']].itertuples():
+        written = row.period if not str(row.start or '').strip() else f"{row.start} ~ {row.end or ''}"
+        result['invalid'].append({'version': row.version, 'name': row.name, 'period': str(written or '').strip()})
+    frame = frame.assign(person=list(zip(frame['version'], frame['name'])), start=periods['start'], end=periods['end'])
+    years = career_experience(frame[eligible & ~periods['invalid']], as_of).reindex(
+        frame['person'].unique(), fill_value=0.0
+    )
+    
+    roles = frame.assign(role=frame['role'].fillna('').astype(str)).groupby('person', sort=False)['role'].agg(' '.join)
+    people_by_version = {}
+    for person in years.index:
+        people_by_version.setdefault(person[0], []).append(person)
+    for version, people in people_by_version.items():
+        leads = [person for person in people if '대표' in roles[person] or '대표' in titles.get(person, '')]
+        if not leads:
+            leads = [max(people, key=lambda person: years[person])]
+        qualified = 0
+        for person in people:
+            lead = person in leads
+            required = lead_years if lead else other_years
+            ok = required is None or years[person] >= required
+            qualified += ok
+            result['people'].append({
+                'version': version, 'name': person[1], 'lead': lead, 'years': round(float(years[person]), 2),
+                'required': required, 'status': 'ok' if ok else 'gap'
+            })
+        result['versions'][version] = {
+            'people': len(people), 'qualified': qualified, 'minimum_count': minimum_count,
+            'status': 'ok' if minimum_count is None or qualified >= minimum_count else 'gap'
+        }
+    return result
+
+FIELD_INDEX_ENABLED = os.environ.get('FIELD_INDEX_ENABLED', '1') == '1'
+
+def _is_table_payload(payload: Dict) -> bool:
+    return isinstance(payload.get('columns'), list) and isinstance(payload.get('rows'), list)
+
+def _flatten_fields(payload: Dict) -> Dict[str, Any]:
+    """Split a sheet payload into indexed fields
+    
+    Form sheets index each top-level key. Table sheets index every row
+    separately (rows[0], rows[1], ...), so editing one investment only
+    touches that row's field.
+    """
+    if not _is_table_payload(payload):
+        return payload
+    
+    fields = {key: value for key, value in payload.items() if key != 'rows'}
+    for index, row in enumerate(payload['rows']):
+        fields[f"rows[{index}]"] = row
+    return fields
+
+def _typed_field(value: Any) -> Dict[str, Any]:
+    """Column values for one field; numbers and text get indexed columns"""
+    value_json = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    if isinstance(value, bool):
+        return {'value_type': 'bool', 'num_value': float(value), 'text_value': None, 'value_json': value_json}
+    if isinstance(value, (int, float)):
+        return {'value_type': 'number', 'num_value': float(value), 'text_value': None, 'value_json': value_json}
+    if isinstance(value, str):
+        return {'value_type': 'text', 'num_value': None, 'text_value': value, 'value_json': value_json}
+    if value is None:
+        return {'value_type': 'null', 'num_value': None, 'text_value': None, 'value_json': value_json}
+    return {'value_type': 'json', 'num_value': None, 'text_value': None, 'value_json': value_json}
+
+def _sync_fields(session: Session, payloads: Dict[int, Dict]) -> int:
+    """Bring proposal_fields in line with {record_id: payload} as a row-level diff
+    
+    Only added, changed and removed fields are written. Returns the number
+    of field rows touched.
+    """
+    if not payloads:
+        return 0
+    
+    existing = {}
+    for record_id, field_key, value_json in session.query(
+        ProposalField.record_id, ProposalField.field_key, ProposalField.value_json
+    ).filter(ProposalField.record_id.in_(list(payloads))):
+        existing.setdefault(record_id, {})[field_key] = value_json
+    
+    inserts, updates, deletes = [], [], []
+    for record_id, payload in payloads.items():
+        current = existing.get(record_id, {})
+        fields = _flatten_fields(payload)
+        
+        for field_key, value in fields.items():
+            typed = _typed_field(value)
+            if field_key not in current:
+                inserts.append({'record_id': record_id, 'field_key': field_key, **typed})
+            elif current[field_key] != typed['value_json']:
+                updates.append({'b_record_id': record_id, 'b_field_key': field_key, **typed})
+        
+        for field_key in current.keys() - fields.keys():
+            deletes.append({'b_record_id': record_id, 'b_field_key': field_key})
+    
+    table = ProposalField.__table__
+    match = (table.c.record_id == bindparam('b_record_id')) & (table.c.field_key == bindparam('b_field_key'))
+    if inserts:
+        session.execute(table.insert(), inserts)
+    if updates:
+        session.execute(table.update().where(match), updates)
+    if deletes:
+        session.execute(table.delete().where(match), deletes)
+    
+    return len(inserts) + len(updates) + len(deletes)
+
+def query_field_values(user_id: int, field_key: str, sheets: Optional[List[str]] = None,
+                       min_value: Optional[float] = None, max_value: Optional[float] = None) -> List[Dict[str, Any]]:
+    """One field across every sheet and version, via the proposal_fields index
+    
+    min_value/max_value filter numeric fields (e.g. every IRR above 10).
+    """
+    with SessionLocal() as session:
+        query = session.query(
+            ProposalData.sheet_id, ProposalData.version, ProposalData.updated_at, ProposalField.value_json
+        ).join(ProposalData, ProposalData.id == ProposalField.record_id).filter(
+            ProposalField.field_key == field_key,
+            ProposalData.user_id == user_id
+        )
+        if sheets is not None:
+            query = query.filter(ProposalData.sheet_id.in_(sheets))
+        if min_value is not None:
+            query = query.filter(ProposalField.num_value >= min_value)
+        if max_value is not None:
+            query = query.filter(ProposalField.num_value <= max_value)
+        
+        return [
+            {'sheet_id': sheet_id, 'version': version, 'updated_at': updated_at,
+             'value': json.loads(value_json)}
+            for sheet_id, version, updated_at, value_json
+            in query.order_by(ProposalData.sheet_id, ProposalData.version)
+        ]
+
+def migrate_inline_payloads():
+    """Move payloads stored inline in proposal_data and revision snapshots to payload_blobs"""
+    with SessionLocal() as session:
+        records = session.query(
+            ProposalData.id, ProposalData.data_format, ProposalData.data_json, ProposalData.data_blob
+        ).filter(ProposalData.payload_hash.is_(None)).all()
+        snapshots = session.query(ProposalRevision.id, ProposalRevision.payload_json).filter(
+            ProposalRevision.kind == 'snapshot',
+            ProposalRevision.payload_hash.is_(None)
+        ).all()
+        if not records and not snapshots:
+            return
+        
+        blobs, record_updates, snapshot_updates, failed = {}, [], [], []
+        for record_id, data_format, data_json, data_blob in records:
+            try:
+                payload = decode_payload(data_format, data_json, data_blob)
+            except (KeyError, zlib.error, UnicodeDecodeError, ValueError):
+                failed.append(f"proposal_data {record_id}")
+                continue
+            blob_hash = payload_hash(payload)
+            blobs[blob_hash] = dumps_payload(payload)
+            record_updates.append({'b_id': record_id, 'payload_hash': blob_hash, 'data_json': '',
+                                   'data_format': 'json', 'data_blob': None})
+        for revision_id, payload_json in snapshots:
+            try:
+                payload = loads_payload(payload_json)
+            except ValueError:
+                failed.append(f"proposal_revisions {revision_id}")
+                continue
+            blob_hash = payload_hash(payload)
+            blobs[blob_hash] = dumps_payload(payload)
+            snapshot_updates.append({'b_id': revision_id, 'payload_hash': blob_hash, 'payload_json': ''})
+        
+        if failed:
+            # Left inline with a NULL payload_hash: the blob joins of every read skip them
+            logger.warning("%d stored payloads could not be decoded and were not migrated (hidden from reads): %s",
+                           len(failed), ', '.join(failed))
+        
+        _store_blobs(session, blobs)
+        for table, updates in ((ProposalData.__table__, record_updates),
+                               (ProposalRevision.__table__, snapshot_updates)):
+            if updates:
+                session.execute(table.update().where(table.c.id == bindparam('b_id')), updates)
+        session.commit()
+
+def backfill_revision_log():
+    """Start the revision log of records saved before it existed with a snapshot"""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO proposal_revisions (user_id, sheet_id, version, revision, kind, payload_json, payload_hash, created_at) "
+            "SELECT p.user_id, p.sheet_id, p.version, 1, 'snapshot', '', p.payload_hash, COALESCE(p.updated_at, p.created_at) "
+            "FROM proposal_data p WHERE p.payload_hash IS NOT NULL AND NOT EXISTS ("
+            "  SELECT 1 FROM proposal_revisions r "
+            "  WHERE r.user_id = p.user_id AND r.sheet_id = p.sheet_id AND r.version = p.version"
+            ")"
+        )
+
+def backfill_proposal_fields(batch_size: int = 200):
+    """Index records saved before proposal_fields existed (runs at startup)"""
+    if not FIELD_INDEX_ENABLED:
+        return
+    
+    with SessionLocal() as session:
+        pending = session.query(
+            ProposalData.id, PayloadBlob.data_format, PayloadBlob.data_json, PayloadBlob.data_blob
+        ).join(PayloadBlob, PayloadBlob.hash == ProposalData.payload_hash).filter(
+            ~session.query(ProposalField.record_id).filter(
+                ProposalField.record_id == ProposalData.id
+            ).exists(),
+            PayloadBlob.size > 2
+        ).all()
+        
+        for start in range(0, len(pending), batch_size):
+            payloads = {}
+            for record_id, data_format, data_json, data_blob in pending[start:start + batch_size]:
+                try:
+                    payload = decode_payload(data_format, data_json, data_blob)
+                except (KeyError, zlib.error, json.JSONDecodeError):
+                    continue
+                if isinstance(payload, dict):
+                    payloads[record_id] = payload
+            _sync_fields(session, payloads)
+        session.commit()
+
+def _record_payloads(session: Session, user_id: int, written: Dict[Tuple[str, str], Dict]) -> Dict[int, Dict]:
+    """Map freshly upserted (sheet_id, version) payloads to their record ids"""
+    sheets = {sheet_id for sheet_id, _ in written}
+    records = session.query(ProposalData.id, ProposalData.sheet_id, ProposalData.version).filter(
+        ProposalData.user_id == user_id,
+        ProposalData.sheet_id.in_(sheets)
+    )
+    return {
+        record_id: written[(sheet_id, version)]
+        for record_id, sheet_id, version in records
+        if (sheet_id, version) in written
+    }
+
+def _filled_count(payload: Dict) -> int:
+    """Top-level values that count as filled in (truthy, as in compare_data)"""
+    return len([value for value in payload.values() if value])
+
+# The same truthiness test over json_each() rows, for payloads edited in SQL
+FILLED_JSON_EACH_SQL = (
+    "SELECT count(*) FROM json_each(?) WHERE type = 'true'"
+    " OR (type IN ('integer', 'real') AND value != 0)"
+    " OR (type = 'text' AND value != '')"
+    " OR (type = 'array' AND json_array_length(value) > 0)"
+    " OR (type = 'object' AND value != '{}')"
+)
+
+def template_fingerprint(structure: Dict[str, Dict]) -> str:
+    """Stable id of a parsed template: its sheets and field cells"""
+    fields = {sheet: sorted(info.get('fields', {})) for sheet, info in structure.items()}
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+def _completeness_upsert_statement(source=None):
+    stmt = sqlite_insert(SheetCompleteness.__table__)
+    if source is not None:
+        stmt = stmt.from_select(['user_id', 'template_id', 'sheet_id', 'version', 'filled', 'required', 'updated_at'],
+                                source)
+    return stmt.on_conflict_do_update(
+        index_elements=['user_id', 'template_id', 'sheet_id', 'version'],
+        set_={'filled': stmt.excluded.filled, 'required': stmt.excluded.required,
+              'updated_at': stmt.excluded.updated_at}
+    )
+
+def _update_completeness(session: Session, user_id: int, filled: Dict[Tuple[str, str], int], now: datetime):
+    """Store filled counts of saved (sheet_id, version) keys for every registered template
+    
+    The row with template_id '' records the count on its own; one row per
+    template the user has parsed adds that template's required count.
+    """
+    if not filled:
+        return
+    rows = [{'user_id': user_id, 'template_id': '', 'sheet_id': sheet_id, 'version': version,
+             'filled': count, 'required': None, 'updated_at': now}
+            for (sheet_id, version), count in filled.items()]
+    session.execute(_completeness_upsert_statement(), rows)
+    
+    requirements = TemplateRequirement.__table__
+    session.execute(_completeness_upsert_statement(select(
+        requirements.c.user_id, requirements.c.template_id, requirements.c.sheet_id,
+        bindparam('b_version'), bindparam('b_filled'), requirements.c.required, bindparam('b_now')
+    ).where(
+        (requirements.c.user_id == user_id) & (requirements.c.sheet_id == bindparam('b_sheet_id'))
+    )), [{'b_sheet_id': row['sheet_id'], 'b_version': row['version'], 'b_filled': row['filled'], 'b_now': now}
+         for row in rows])
+
+def register_template(user_id: int, structure: Dict[str, Dict]) -> str:
+    """Record a parsed template's required field counts and index the vault against it
+    
+    Completeness rows for the template are derived in SQL from the stored
+    filled counts, so no payload is read. A template already registered
+    with the same required counts is left alone (saves keep its rows
+    current), so cached vault reads stay valid. Returns the template id.
+    """
+    template_id = template_fingerprint(structure)
+    now = datetime.now()
+    requirements = [
+        {'user_id': user_id, 'template_id': template_id, 'sheet_id': sheet_id, 'required': len(info['fields'])}
+        for sheet_id, info in structure.items() if info.get('fields')
+    ]
+    
+    with SessionLocal() as session:
+        registered = dict(session.query(TemplateRequirement.sheet_id, TemplateRequirement.required).filter_by(
+            user_id=user_id, template_id=template_id
+        ).all())
+        if registered and registered == {row['sheet_id']: row['required'] for row in requirements}:
+            return template_id
+        
+        session.query(TemplateRequirement).filter_by(user_id=user_id, template_id=template_id).delete()
+        session.query(SheetCompleteness).filter_by(user_id=user_id, template_id=template_id).delete()
+        if requirements:
+            session.execute(TemplateRequirement.__table__.insert(), requirements)
+            
+            completeness = SheetCompleteness.__table__
+            requirement = TemplateRequirement.__table__
+            session.execute(_completeness_upsert_statement(select(
+                completeness.c.user_id, requirement.c.template_id, completeness.c.sheet_id,
+                completeness.c.version, completeness.c.filled, requirement.c.required, literal(now)
+            ).join(requirement, (requirement.c.user_id == completeness.c.user_id)
+                   & (requirement.c.sheet_id == completeness.c.sheet_id)).where(
+                (completeness.c.user_id == user_id) & (completeness.c.template_id == '')
+                & (requirement.c.template_id == template_id)
+            )))
+        _bump_vault_revision(session, user_id)
+        session.commit()
+    
+    return template_id
+
+def get_completeness(user_id: int, template_id: str = '', version: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """{sheet: {version: {'filled', 'required'}}} from the completeness index
+    
+    required is None for sheets the template does not list (or without a
+    template). One query on the (user_id, template_id) key prefix,
+    memoized per vault revision.
+    """
+    def loader():
+        completeness = {}
+        with SessionLocal() as session:
+            query = session.query(
+                SheetCompleteness.template_id, SheetCompleteness.sheet_id, SheetCompleteness.version,
+                SheetCompleteness.filled, SheetCompleteness.required
+            ).filter(
+                SheetCompleteness.user_id == user_id,
+                SheetCompleteness.template_id.in_({'', template_id})
+            )
+            if version is not None:
+                query = query.filter(SheetCompleteness.version == version)
+            # Template rows sort after the '' rows and override them
+            for _, sheet_id, row_version, filled, required in query.order_by(SheetCompleteness.template_id):
+                completeness.setdefault(sheet_id, {})[row_version] = {'filled': filled, 'required': required}
+        return completeness
+    return _cached_vault_read(user_id, ('completeness', template_id, version), loader)
+
+def backfill_sheet_completeness(batch_size: int = 200):
+    """Count filled fields of records saved before sheet_completeness existed (runs at startup)
+    
+    Records are read in keyset pages of batch_size. Payloads that cannot
+    be decoded or are not objects are recorded with 0 filled fields (reads
+    hide them), so they are not fetched again on the next start.
+    """
+    missing = ~select(SheetCompleteness.sheet_id).where(
+        SheetCompleteness.user_id == ProposalData.user_id,
+        SheetCompleteness.template_id == '',
+        SheetCompleteness.sheet_id == ProposalData.sheet_id,
+        SheetCompleteness.version == ProposalData.version
+    ).exists()
+    
+    unreadable = []
+    last_id = 0
+    with SessionLocal() as session:
+        while True:
+            page = session.query(
+                ProposalData.id, ProposalData.user_id, ProposalData.sheet_id, ProposalData.version,
+                PayloadBlob.data_format, PayloadBlob.data_json, PayloadBlob.data_blob
+            ).join(PayloadBlob, PayloadBlob.hash == ProposalData.payload_hash).filter(
+                ProposalData.id > last_id, missing
+            ).order_by(ProposalData.id).limit(batch_size).all()
+            if not page:
+                break
+            
+            now = datetime.now()
+            by_user = {}
+            for record_id, user_id, sheet_id, version, data_format, data_json, data_blob in page:
+                try:
+                    payload = decode_payload(data_format, data_json, data_blob)
+                except (KeyError, zlib.error, UnicodeDecodeError, ValueError):
+                    payload = None
+                if not isinstance(payload, dict):
+                    unreadable.append(record_id)
+                by_user.setdefault(user_id, {})[(sheet_id, version)] = (
+                    _filled_count(payload) if isinstance(payload, dict) else 0
+                )
+            for user_id, filled in by_user.items():
+                _update_completeness(session, user_id, filled, now)
+            session.commit()
+            last_id = page[-1][0]
+    
+    if unreadable:
+        logger.warning("%d stored payloads are not readable sheet objects and were counted as empty: %s",
+                       len(unreadable), ", ".join(map(str, unreadable)))
+
+@st.cache_resource
+def init_database():
+    """Create tables and run the schema migrations and backfills, once per process
+    
+    Streamlit re-executes this script on every rerun, so nothing here runs
+    at import; main() and the command-line tools call this instead.
+    """
+    Base.metadata.create_all(engine)
+    _ensure_columns('generation_jobs', {'artifact_token': 'VARCHAR(64)'})
+    _ensure_columns('proposal_data', {
+        'data_format': "VARCHAR(20) NOT NULL DEFAULT 'json'",
+        'data_blob': 'BLOB',
+        'payload_hash': 'VARCHAR(64)'
+    })
+    _ensure_columns('proposal_revisions', {'payload_hash': 'VARCHAR(64)'})
+    _ensure_indexes(ProposalData.__table__, ['ix_proposal_data_user_version_updated'])
+    migrate_proposal_data_index()
+    migrate_inline_payloads()
+    backfill_revision_log()
+    backfill_proposal_fields()
+    backfill_sheet_completeness()
+
+def _proposal_upsert_statement():
+    """INSERT ... ON CONFLICT DO UPDATE on the (user, sheet, version) key"""
+    stmt = sqlite_insert(ProposalData)
+    return stmt.on_conflict_do_update(
+        index_elements=['user_id', 'sheet_id', 'version'],
+        set_={'payload_hash': stmt.excluded.payload_hash, 'updated_at': stmt.excluded.updated_at}
+    )
+
+REVISION_SNAPSHOT_INTERVAL = int(os.environ.get('REVISION_SNAPSHOT_INTERVAL', '20'))
+REVISION_COMPACT_AFTER_DAYS = int(os.environ.get('REVISION_COMPACT_AFTER_DAYS', '90'))
+
+def _same_value(a: Any, b: Any) -> bool:
+    return type(a) is type(b) and a == b
+
+def _payload_delta(old: Dict, new: Dict) -> Dict[str, Any]:
+    """Changes turning one sheet payload into another
+    
+    {'set': {key: value}, 'unset': [key]} on top-level keys. When both
+    payloads are tables, changed rows are recorded individually under
+    'rows': {'set': {index: row}, 'length': row_count}.
+    """
+    delta = {'set': {}, 'unset': [key for key in old if key not in new]}
+    tables = _is_table_payload(old) and _is_table_payload(new)
+    
+    for key, value in new.items():
+        if key == 'rows' and tables:
+            old_rows = old['rows']
+            changed = {
+                str(index): row for index, row in enumerate(value)
+                if index >= len(old_rows) or not _same_value(old_rows[index], row)
+            }
+            if changed or len(value) != len(old_rows):
+                delta['rows'] = {'set': changed, 'length': len(value)}
+        elif key not in old or not _same_value(old[key], value):
+            delta['set'][key] = value
+    
+    return delta
+
+def _delta_is_empty(delta: Dict[str, Any]) -> bool:
+    return not delta['set'] and not delta['unset'] and 'rows' not in delta
+
+def _apply_delta(payload: Dict, delta: Dict[str, Any]) -> Dict:
+    payload = dict(payload)
+    for key in delta['unset']:
+        payload.pop(key, None)
+    payload.update(delta['set'])
+    
+    if 'rows' in delta:
+        length = delta['rows']['length']
+        rows = list(payload.get('rows', []))[:length]
+        rows += [None] * (length - len(rows))
+        for index, row in delta['rows']['set'].items():
+            rows[int(index)] = row
+        payload['rows'] = rows
+    
+    return payload
+
+def _append_revisions(session: Session, user_id: int,
+                      updates: Dict[Tuple[str, str], Tuple[Optional[Dict], int, str]], now: datetime):
+    """Log one revision per changed (sheet_id, version)
+    
+    updates maps each key to (delta, payload size, payload hash). A
+    snapshot, which refers to the payload blob, is logged for the first
+    revision, every REVISION_SNAPSHOT_INTERVAL revisions, when the delta
+    is None or not much smaller than the payload; otherwise only the delta
+    is stored. Saves that change nothing are not logged.
+    """
+    if not updates:
+        return
+    
+    sheets = {sheet_id for sheet_id, _ in updates}
+    heads = {
+        (sheet_id, version): (head, snapshot_at)
+        for sheet_id, version, head, snapshot_at in session.query(
+            ProposalRevision.sheet_id, ProposalRevision.version,
+            func.max(ProposalRevision.revision),
+            func.max(case((ProposalRevision.kind == 'snapshot', ProposalRevision.revision)))
+        ).filter(
+            ProposalRevision.user_id == user_id,
+            ProposalRevision.sheet_id.in_(sheets)
+        ).group_by(ProposalRevision.sheet_id, ProposalRevision.version)
+    }
+    
+    rows = []
+    for (sheet_id, version), (delta, payload_size, blob_hash) in updates.items():
+        head, snapshot_at = heads.get((sheet_id, version), (0, None))
+        if head and delta is not None and _delta_is_empty(delta):
+            continue
+        
+        delta_json = json.dumps(delta, ensure_ascii=False) if delta is not None else None
+        snapshot = (
+            delta is None or not head or snapshot_at is None
+            or head + 1 - snapshot_at >= REVISION_SNAPSHOT_INTERVAL
+            or len(delta_json) * 2 >= payload_size
+        )
+        rows.append({
+            'user_id': user_id,
+            'sheet_id': sheet_id,
+            'version': version,
+            'revision': head + 1,
+            'kind': 'snapshot' if snapshot else 'delta',
+            'payload_json': '' if snapshot else delta_json,
+            'payload_hash': blob_hash if snapshot else None,
+            'created_at': now
+        })
+    
+    if rows:
+        session.execute(ProposalRevision.__table__.insert(), rows)
+
+def _previous_payloads(session: Session, user_id: int,
+                       new_hashes: Dict[Tuple[str, str], str]) -> Dict[Tuple[str, str], Tuple[str, Optional[Dict]]]:
+    """Stored (payload hash, payload) for the given (sheet_id, version) keys
+    
+    Payloads are only decoded where the stored hash differs from the one
+    about to be written; unchanged sheets come back as (hash, None).
+    """
+    previous = {}
+    for sheet_id, version, blob_hash, data_format, data_json, data_blob in session.query(
+        ProposalData.sheet_id, ProposalData.version, PayloadBlob.hash,
+        PayloadBlob.data_format, PayloadBlob.data_json, PayloadBlob.data_blob
+    ).join(PayloadBlob, PayloadBlob.hash == ProposalData.payload_hash).filter(
+        ProposalData.user_id == user_id,
+        ProposalData.sheet_id.in_({sheet_id for sheet_id, _ in new_hashes})
+    ):
+        key = (sheet_id, version)
+        if key not in new_hashes:
+            continue
+        payload = None
+        if blob_hash != new_hashes[key]:
+            try:
+                payload = decode_payload(data_format, data_json, data_blob)
+            except (KeyError, zlib.error, json.JSONDecodeError):
+                pass
+        previous[key] = (blob_hash, payload)
+    return previous
+
+def bulk_update_data(user_id: int, entries: List[Tuple[str, str, Dict]]) -> List[Dict[str, Any]]:
+    """Save many (sheet_id, version, payload) entries in one transaction
+    
+    Payloads go to payload_blobs under their content hash, so identical
+    sheets are stored once. Valid entries are written with a single
+    executemany upsert and one commit; for sheets whose content changed,
+    proposal_fields is updated with only the fields that changed and the
+    change is appended to the revision log. Returns one result per entry,
+    in order, with 'status' set to 'saved' or 'error'.
+    """
+    now = datetime.now()
+    results = []
+    rows = []
+    written = {}
+    
+    for sheet_id, version, payload in entries:
+        result = {'sheet_id': sheet_id, 'version': version, 'status': 'saved', 'error': None}
+        results.append(result)
+        
+        if not sheet_id or not version:
+            result.update(status='error', error="시트와 버전은 필수입니다")
+            continue
+        if not isinstance(payload, dict):
+            result.update(status='error', error="시트 데이터는 JSON 객체여야 합니다")
+            continue
+        try:
+            data_json = dumps_payload(payload)
+        except (TypeError, ValueError) as e:
+            result.update(status='error', error=f"직렬화 오류: {str(e)}")
+            continue
+        
+        blob_hash = payload_hash(payload)
+        written[(sheet_id, version)] = (payload, data_json, blob_hash)
+        rows.append({
+            'user_id': user_id,
+            'sheet_id': sheet_id,
+            'version': version,
+            'payload_hash': blob_hash,
+            'created_at': now,
+            'updated_at': now
+        })
+    
+    if rows:
+        with SessionLocal() as session:
+            try:
+                previous = _previous_payloads(
+                    session, user_id, {key: blob_hash for key, (_, _, blob_hash) in written.items()}
+                )
+                _store_blobs(session, {blob_hash: data_json for _, data_json, blob_hash in written.values()})
+                session.execute(_proposal_upsert_statement(), rows)
+                
+                changed = {
+                    key: entry for key, entry in written.items()
+                    if key not in previous or previous[key][0] != entry[2]
+                }
+                if FIELD_INDEX_ENABLED and changed:
+                    payloads = {key: payload for key, (payload, _, _) in changed.items()}
+                    _sync_fields(session, _record_payloads(session, user_id, payloads))
+                _append_revisions(session, user_id, {
+                    key: (
+                        _payload_delta(previous[key][1], payload) if previous.get(key, (None, None))[1] is not None else None,
+                        len(data_json),
+                        blob_hash
+                    )
+                    for key, (payload, data_json, blob_hash) in changed.items()
+                }, now)
+                _update_completeness(session, user_id, {
+                    key: _filled_count(payload) for key, (payload, _, _) in changed.items()
+                }, now)
+                _refresh_violations(session, user_id, changed, {key: payload for key, (payload, _, _) in changed.items()})
+                
+                collect_payload_blobs(session)
+                _bump_vault_revision(session, user_id)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                for result in results:
+                    if result['status'] == 'saved':
+                        result.update(status='error', error=f"저장 실패: {str(e)}")
+    
+    return results
+
+def update_data(user_id: int, sheet_id: str, new_data: Dict, version: str = 'base'):
+    """Save or update data in database (single-statement upsert)"""
+    result = bulk_update_data(user_id, [(sheet_id, version, new_data)])[0]
+    if result['status'] != 'saved':
+        raise ValueError(result['error'])
+
+def _rewrite_patched(user_id: int, sheet_id: str, changes: Dict[str, Any], removed: List[str], version: str) -> int:
+    """patch_data by reading, merging and saving the whole sheet"""
+    stored = _read_stored_data(user_id, (sheet_id,), (version,)).get(sheet_id, {}).get(version, {})
+    merged = {key: value for key, value in stored.items() if key not in removed}
+    merged.update(changes)
+    update_data(user_id, sheet_id, merged, version)
+    return len(changes) + len(removed)
+
+JSON_SET_MAX_PAIRS = 60
+
+def patch_data(user_id: int, sheet_id: str, changes: Dict[str, Any], removed: Optional[List[str]] = None,
+               version: str = 'base') -> int:
+    """Change individual top-level fields of a stored sheet
+    
+    The new JSON is produced in SQL with json_set()/json_remove() instead
+    of re-serializing the sheet in Python (it is parsed once for its
+    content address), only the touched proposal_fields rows are written,
+    and the changes are logged as one revision. Returns the number of
+    fields changed.
+    """
+    removed = [key for key in (removed or []) if key not in changes]
+    if not changes and not removed:
+        return 0
+    
+    try:
+        encoded = {key: dumps_payload(value) for key, value in changes.items()}
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"직렬화 오류: {str(e)}")
+    
+    keys = list(changes) + removed
+    if 'rows' in keys or any('"' in key for key in keys):
+        # Table rows are diffed row by row, and some keys are not expressible
+        # as a JSON path; rewrite the sheet instead
+        return _rewrite_patched(user_id, sheet_id, changes, removed, version)
+    
+    # SQLite caps function arguments at 127, so large patches chain several calls
+    data_json = PayloadBlob.data_json
+    pairs = list(encoded.items())
+    for start in range(0, len(pairs), JSON_SET_MAX_PAIRS):
+        arguments = []
+        for key, value in pairs[start:start + JSON_SET_MAX_PAIRS]:
+            arguments += [_json_path(key), func.json(value)]
+        data_json = func.json_set(data_json, *arguments)
+    for start in range(0, len(removed), 2 * JSON_SET_MAX_PAIRS):
+        paths = [_json_path(key) for key in removed[start:start + 2 * JSON_SET_MAX_PAIRS]]
+        data_json = func.json_remove(data_json, *paths)
+    
+    now = datetime.now()
+    with SessionLocal() as session:
+        record = session.query(ProposalData.id, ProposalData.payload_hash, data_json).join(
+            PayloadBlob, PayloadBlob.hash == ProposalData.payload_hash
+        ).filter(
+            ProposalData.user_id == user_id,
+            ProposalData.sheet_id == sheet_id,
+            ProposalData.version == version,
+            PayloadBlob.data_format == 'json'
+        ).first()
+        
+        if record is None:
+            # New sheet, or a compressed payload the JSON functions cannot edit
+            session.rollback()
+            return _rewrite_patched(user_id, sheet_id, changes, removed, version)
+        
+        record_id, old_hash, new_json = record
+        blob_hash = payload_hash(loads_payload(new_json))
+        if blob_hash == old_hash:
+            return 0
+        
+        # Blobs are shared between versions, so the edit becomes a new blob
+        _store_blobs(session, {blob_hash: new_json})
+        session.execute(
+            update(ProposalData).where(ProposalData.id == record_id).values(payload_hash=blob_hash, updated_at=now)
+        )
+        
+        if FIELD_INDEX_ENABLED:
+            table = ProposalField.__table__
+            if changes:
+                stmt = sqlite_insert(table)
+                session.execute(stmt.on_conflict_do_update(
+                    index_elements=['record_id', 'field_key'],
+                    set_={column: stmt.excluded[column]
+                          for column in ('value_type', 'num_value', 'text_value', 'value_json')}
+                ), [{'record_id': record_id, 'field_key': key, **_typed_field(value)}
+                    for key, value in changes.items()])
+            if removed:
+                session.execute(table.delete().where(
+                    table.c.record_id == record_id, table.c.field_key.in_(removed)
+                ))
+        
+        _append_revisions(session, user_id, {
+            (sheet_id, version): ({'set': changes, 'unset': removed}, len(new_json), blob_hash)
+        }, now)
+        filled = session.connection().exec_driver_sql(FILLED_JSON_EACH_SQL, (new_json,)).scalar()
+        _update_completeness(session, user_id, {(sheet_id, version): filled}, now)
+        _refresh_violations(session, user_id, [(sheet_id, version)])
+        collect_payload_blobs(session)
+        _bump_vault_revision(session, user_id)
+        session.commit()
+    
+    return len(changes) + len(removed)
+
+def copy_version(user_id: int, source_version: str, target_version: str) -> List[Dict[str, Any]]:
+    """Copy every sheet of one version into another in a single transaction
+    
+    Only blob references are copied: no payload is decoded or written, and
+    both versions share storage until one of them changes.
+    """
+    now = datetime.now()
+    
+    with SessionLocal() as session:
+        sources = session.query(ProposalData.id, ProposalData.sheet_id, ProposalData.payload_hash).filter_by(
+            user_id=user_id, version=source_version
+        ).all()
+        targets = dict(session.query(ProposalData.sheet_id, ProposalData.payload_hash).filter_by(
+            user_id=user_id, version=target_version
+        ).all())
+        results = [
+            {'sheet_id': sheet_id, 'version': target_version, 'status': 'saved', 'error': None}
+            for _, sheet_id, _ in sources
+        ]
+        if not sources:
+            return results
+        
+        try:
+            session.execute(_proposal_upsert_statement(), [
+                {'user_id': user_id, 'sheet_id': sheet_id, 'version': target_version,
+                 'payload_hash': blob_hash, 'created_at': now, 'updated_at': now}
+                for _, sheet_id, blob_hash in sources
+            ])
+            
+            changed = [(record_id, sheet_id, blob_hash) for record_id, sheet_id, blob_hash in sources
+                       if targets.get(sheet_id) != blob_hash]
+            if FIELD_INDEX_ENABLED and changed:
+                # Field rows are copied in SQL from the source records
+                target_ids = dict(session.query(ProposalData.sheet_id, ProposalData.id).filter(
+                    ProposalData.user_id == user_id,
+                    ProposalData.version == target_version,
+                    ProposalData.sheet_id.in_([sheet_id for _, sheet_id, _ in changed])
+                ).all())
+                table = ProposalField.__table__
+                columns = ['field_key', 'value_type', 'num_value', 'text_value', 'value_json']
+                session.execute(table.delete().where(table.c.record_id == bindparam('b_target')), [
+                    {'b_target': target_ids[sheet_id]} for _, sheet_id, _ in changed
+                ])
+                session.execute(table.insert().from_select(
+                    ['record_id'] + columns,
+                    select(bindparam('b_target'), *[table.c[column] for column in columns]).where(
+                        table.c.record_id == bindparam('b_source')
+                    )
+                ), [{'b_target': target_ids[sheet_id], 'b_source': record_id} for record_id, sheet_id, _ in changed])
+            
+            _append_revisions(session, user_id, {
+                (sheet_id, target_version): (None, 0, blob_hash) for _, sheet_id, blob_hash in changed
+            }, now)
+            if changed:
+                completeness = SheetCompleteness.__table__
+                session.execute(_completeness_upsert_statement(select(
+                    completeness.c.user_id, completeness.c.template_id, completeness.c.sheet_id,
+                    literal(target_version), completeness.c.filled, completeness.c.required, literal(now)
+                ).where(
+                    (completeness.c.user_id == user_id) & (completeness.c.version == source_version)
+                    & completeness.c.sheet_id.in_([sheet_id for _, sheet_id, _ in changed])
+                )))
+            _refresh_violations(session, user_id, [(sheet_id, target_version) for _, sheet_id, _ in changed])
+            collect_payload_blobs(session)
+            _bump_vault_revision(session, user_id)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            for result in results:
+                result.update(status='error', error=f"저장 실패: {str(e)}")
+    
+    return results
+
+def import_vault_data(user_id: int, imported: Dict, version: str = 'base') -> List[Dict[str, Any]]:
+    """Import {sheet_id: payload} (the sample data format) into one version"""
+    if not isinstance(imported, dict):
+        return [{'sheet_id': None, 'version': version, 'status': 'error',
+                 'error': "JSON 최상위는 {시트명: 데이터} 객체여야 합니다"}]
+    return bulk_update_data(user_id, [(sheet_id, version, payload) for sheet_id, payload in imported.items()])
+
+def list_revisions(user_id: int, sheet_id: str, version: str = 'base', before: Optional[int] = None,
+                   limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Logged revisions of one sheet version, newest first
+    
+    before/limit page through long histories by revision number.
+    """
+    with SessionLocal() as session:
+        query = session.query(
+            ProposalRevision.revision, ProposalRevision.kind, ProposalRevision.created_at,
+            func.coalesce(PayloadBlob.size, func.length(ProposalRevision.payload_json))
+        ).outerjoin(PayloadBlob, PayloadBlob.hash == ProposalRevision.payload_hash).filter(
+            ProposalRevision.user_id == user_id,
+            ProposalRevision.sheet_id == sheet_id,
+            ProposalRevision.version == version
+        )
+        if before is not None:
+            query = query.filter(ProposalRevision.revision < before)
+        query = query.order_by(ProposalRevision.revision.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        rows = query.all()
+    
+    return [
+        {'revision': revision, 'kind': kind, 'created_at': created_at, 'size': size}
+        for revision, kind, created_at, size in rows
+    ]
+
+def _revision_rows(session: Session, *criteria):
+    """(id, revision, kind, created_at, payload_json, blob format, blob json, blob bytes) in order"""
+    return session.query(
+        ProposalRevision.id, ProposalRevision.revision, ProposalRevision.kind, ProposalRevision.created_at,
+        ProposalRevision.payload_json, PayloadBlob.data_format, PayloadBlob.data_json, PayloadBlob.data_blob
+    ).outerjoin(PayloadBlob, PayloadBlob.hash == ProposalRevision.payload_hash).filter(
+        *criteria
+    ).order_by(ProposalRevision.revision).all()
+
+def _replay_revisions(rows) -> Dict:
+    """Rebuild a payload from a snapshot followed by its deltas"""
+    payload = {}
+    for _, _, kind, _, payload_json, data_format, data_json, data_blob in rows:
+        if kind == 'snapshot':
+            payload = decode_payload(data_format, data_json, data_blob) if data_format else json.loads(payload_json)
+        else:
+            payload = _apply_delta(payload, json.loads(payload_json))
+    return payload
+
+def get_revision_payload(user_id: int, sheet_id: str, version: str, revision: int) -> Optional[Dict]:
+    """Sheet payload as of a revision
+    
+    Reads the nearest snapshot at or before the revision plus the deltas
+    after it, so at most REVISION_SNAPSHOT_INTERVAL rows are replayed.
+    Returns None when the revision is not logged, including revisions
+    compact_revisions() merged into a later one.
+    """
+    with SessionLocal() as session:
+        key = (
+            (ProposalRevision.user_id == user_id)
+            & (ProposalRevision.sheet_id == sheet_id)
+            & (ProposalRevision.version == version)
+        )
+        snapshot_at = session.query(func.max(ProposalRevision.revision)).filter(
+            key, ProposalRevision.kind == 'snapshot', ProposalRevision.revision <= revision
+        ).scalar()
+        if snapshot_at is None:
+            return None
+        
+        rows = _revision_rows(session, key, ProposalRevision.revision >= snapshot_at,
+                              ProposalRevision.revision <= revision)
+    
+    if rows[-1][1] != revision:
+        return None
+    return _replay_revisions(rows)
+
+def restore_revision(user_id: int, sheet_id: str, version: str, revision: int):
+    """Make an earlier revision current again (logged as a new revision)"""
+    payload = get_revision_payload(user_id, sheet_id, version, revision)
+    if payload is None:
+        raise ValueError(f"리비전을 찾을 수 없습니다: {sheet_id} ({version}) #{revision}")
+    update_data(user_id, sheet_id, payload, version)
+
+def compact_revisions(older_than: Optional[datetime] = None, user_id: Optional[int] = None) -> int:
+    """Merge old deltas so history thins out with age
+    
+    Within each snapshot run, deltas created before the cutoff are merged
+    into the last of them: the state at every snapshot and at the end of
+    each run stays reconstructable, the edits in between do not. Returns
+    the number of revisions removed.
+    """
+    if older_than is None:
+        older_than = datetime.now() - timedelta(days=REVISION_COMPACT_AFTER_DAYS)
+    removed = 0
+    table = ProposalRevision.__table__
+    
+    with SessionLocal() as session:
+        query = session.query(
+            ProposalRevision.user_id, ProposalRevision.sheet_id, ProposalRevision.version
+        ).filter(
+            ProposalRevision.kind == 'delta', ProposalRevision.created_at < older_than
+        )
+        if user_id is not None:
+            query = query.filter(ProposalRevision.user_id == user_id)
+        keys = query.group_by(
+            ProposalRevision.user_id, ProposalRevision.sheet_id, ProposalRevision.version
+        ).having(func.count() > 1).all()
+        
+        for key_user_id, sheet_id, version in keys:
+            revisions = _revision_rows(
+                session,
+                ProposalRevision.user_id == key_user_id,
+                ProposalRevision.sheet_id == sheet_id,
+                ProposalRevision.version == version
+            )
+            
+            runs = []
+            for revision in revisions:
+                if revision[2] == 'snapshot' or not runs:
+                    runs.append([revision])
+                else:
+                    runs[-1].append(revision)
+            
+            for run in runs:
+                old_deltas = [r for r in run[1:] if r[3] < older_than]
+                if len(old_deltas) < 2 or run[0][2] != 'snapshot':
+                    continue
+                
+                start = _replay_revisions(run[:1])
+                end = _replay_revisions([run[0]] + old_deltas)
+                session.execute(table.update().where(table.c.id == old_deltas[-1][0]).values(
+                    payload_json=json.dumps(_payload_delta(start, end), ensure_ascii=False)
+                ))
+                session.execute(table.delete().where(table.c.id.in_([r[0] for r in old_deltas[:-1]])))
+                removed += len(old_deltas) - 1
+            
+            session.commit()
+    
+    return removed
+
+def resolve_sheet_data(sheet_data: Dict, version: Optional[str] = None) -> Dict:
+    """Merge a sheet's versions into the values to write
+    
+    Later versions override base data. With no version given, the
+    '2025 KIF Version' overlay is applied when present.
+    """
+    data_to_fill = dict(sheet_data.get('base', {}))
+    overlay = version if version else '2025 KIF Version'
+    if overlay != 'base' and overlay in sheet_data:
+        data_to_fill.update(sheet_data[overlay])
+    return data_to_fill
+
+def _detect_header_rows(ws) -> int:
+    """Last row of the template's column header block
+    
+    The header is the row (within the top block) with the most label cells,
+    extended over the label rows directly below it (multi-row headers).
+    Titles above it and 합계 rows or notes further down are not counted.
+    """
+    labels = {}
+    formulas = set()
+    for row in ws.iter_rows(min_row=1, max_row=min(ws.max_row, 50)):
+        for cell in row:
+            if isinstance(cell.value, str) and cell.value.startswith('='):
+                formulas.add(cell.row)
+            elif isinstance(cell.value, str) and cell.value.strip():
+                labels.setdefault(cell.row, []).append(re.sub(r'\s+', '', cell.value))
+    if not labels:
+        return 0
+    
+    header_rows = max(labels, key=lambda row: (len(labels[row]), -row))
+    while (header_rows + 1 in labels and header_rows + 1 not in formulas
+           and not TABLE_FOOTER_LABELS.intersection(labels[header_rows + 1])):
+        header_rows += 1
+    return header_rows
+
+def _has_rows_below(ws, header_rows: int) -> bool:
+    """Whether any template row below the header holds a value (합계 rows, formulas, notes)"""
+    for row in ws.iter_rows(min_row=header_rows + 1, max_row=max(ws.max_row, header_rows + 1)):
+        if any(cell.value is not None and cell.value != '' for cell in row):
+            return True
+    return False
+
+def select_sheet_writer(sheet_name: str, row_count: int) -> str:
+    """Pick the write strategy for a sheet: 'stream' for large tables, else 'cell'"""
+    if sheet_name in TABULAR_SHEETS and row_count >= STREAMING_ROW_THRESHOLD:
+        return 'stream'
+    return 'cell'
+
+def _table_row_styles(ws, data_row: int, column_count: int) -> List[Any]:
+    """Template style of each table column, taken from the first data row or the column default"""
+    styles = []
+    for col in range(1, column_count + 1):
+        cell = ws._cells.get((data_row, col))
+        if cell is not None and cell.has_style:
+            styles.append(cell)
+        else:
+            dimension = ws.column_dimensions.get(get_column_letter(col))
+            styles.append(dimension if dimension is not None and dimension.has_style else None)
+    return styles
+
+def _write_table_cells(ws, rows: List[List[Any]], header_rows: int):
+    """Cell strategy: write table rows through the workbook model"""
+    column_count = max((len(row) for row in rows), default=0)
+    styles = _table_row_styles(ws, header_rows + 1, column_count)
+    
+    for row_offset, row in enumerate(rows, start=1):
+        for col, value in enumerate(row, start=1):
+            cell = ws.cell(row=header_rows + row_offset, column=col)
+            if isinstance(cell.value, str) and cell.value.startswith('='):
+                continue
+            cell.value = value
+            source = styles[col - 1]
+            if source is not None and row_offset > 1:
+                cell._style = copy(source._style)
+
+def _prepare_streamed_table(wb: Workbook, ws, rows: List[List[Any]], header_rows: int) -> Dict[str, Any]:
+    """Stream strategy: keep only the header block in memory and defer the rows to save time"""
+    column_count = max((len(row) for row in rows), default=0)
+    style_ids = [
+        source.style_id if source is not None else 0
+        for source in _table_row_styles(ws, header_rows + 1, column_count)
+    ]
+    
+    # Template rows below the header (formatting only, see _has_rows_below)
+    # would collide with the streamed rows
+    if ws.max_row > header_rows:
+        ws.delete_rows(header_rows + 1, ws.max_row - header_rows)
+    for merged_range in list(ws.merged_cells.ranges):
+        if merged_range.max_row > header_rows:
+            ws.merged_cells.remove(merged_range)
+    
+    return {
+        'path': f"xl/worksheets/sheet{wb.worksheets.index(ws) + 1}.xml",
+        'rows': rows,
+        'start_row': header_rows + 1,
+        'style_ids': style_ids,
+        'column_count': column_count
+    }
+
+def _stream_cell_xml(ref: str, value: Any, style_id: int) -> str:
+    """Serialize one cell for a streamed sheet"""
+    style = f' s="{style_id}"' if style_id else ''
+    if value is None or value == '':
+        return f'<c r="{ref}"{style}/>' if style_id else ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{style} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        if value != value or value in (float('inf'), float('-inf')):
+            return ''
+        return f'<c r="{ref}"{style}><v>{value!r}</v></c>'
+    text = str(value)
+    if text.startswith('='):
+        return f'<c r="{ref}"{style}><f>{escape(text[1:])}</f></c>'
+    space = ' xml:space="preserve"' if text != text.strip() else ''
+    return f'<c r="{ref}"{style} t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+def _write_streamed_sheet(source_xml: str, out, table: Dict[str, Any]):
+    """Copy the saved header XML and append table rows one at a time"""
+    column_letters = [get_column_letter(col) for col in range(1, table['column_count'] + 1)]
+    last_row = table['start_row'] + len(table['rows']) - 1
+    
+    if column_letters and table['rows']:
+        source_xml = re.sub(r'<dimension ref="[^"]*"\s*/>',
+                            f'<dimension ref="A1:{column_letters[-1]}{last_row}"/>', source_xml, count=1)
+    
+    if '<sheetData/>' in source_xml:
+        head, tail = source_xml.split('<sheetData/>', 1)
+        head += '<sheetData>'
+        tail = '</sheetData>' + tail
+    else:
+        head, tail = source_xml.split('</sheetData>', 1)
+        tail = '</sheetData>' + tail
+    
+    out.write(head.encode('utf-8'))
+    for row_number, row in enumerate(table['rows'], start=table['start_row']):
+        cells = ''.join(
+            _stream_cell_xml(f"{column_letters[index]}{row_number}", value, table['style_ids'][index])
+            for index, value in enumerate(row)
+        )
+        out.write(f'<row r="{row_number}">{cells}</row>'.encode('utf-8'))
+    out.write(tail.encode('utf-8'))
+
+def save_filled_workbook(wb: Workbook, output, streamed_tables: List[Dict[str, Any]]):
+    """Save a filled workbook, splicing streamed table rows into their sheet XML
+    
+    output may be a path or a binary file object.
+    """
+    if not streamed_tables:
+        wb.save(output)
+        return
+    
+    by_path = {table['path']: table for table in streamed_tables}
+    with tempfile.TemporaryFile() as staged:
+        wb.save(staged)
+        staged.seek(0)
+        
+        with zipfile.ZipFile(staged) as source, \
+                zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as target:
+            for item in source.infolist():
+                if item.filename in by_path:
+                    with target.open(item.filename, 'w', force_zip64=True) as out:
+                        _write_streamed_sheet(source.read(item).decode('utf-8'), out, by_path[item.filename])
+                else:
+                    target.writestr(item, source.read(item))
+
+def fill_workbook(wb: Workbook, stored_data: Dict, version: Optional[str] = None,
+                  overrides: Optional[Dict[str, Dict]] = None,
+                  progress_callback: Optional[Callable[[str, int, int], None]] = None,
+                  field_maps: Optional[Dict[str, Dict]] = None):
+    """Write stored data into an already loaded template workbook
+    
+    overrides maps sheet names to values applied on top of the resolved
+    version data. field_maps holds each sheet's compile_field_map() result
+    (cached on the parsed template); without one, only literal cell
+    references and STATIC_FIELD_CELLS are written. Table payloads on
+    TABULAR_SHEETS are written by the strategy select_sheet_writer() picks;
+    streamed tables are returned for save_filled_workbook() to splice in.
+    """
+    streamed_tables = []
+    static_targets = {}
+    
+    # Fill each sheet
+    sheet_names = list(stored_data.keys()) + [name for name in (overrides or {}) if name not in stored_data]
+    sheets_to_fill = [name for name in sheet_names if name in wb.sheetnames]
+    for sheet_index, sheet_name in enumerate(sheets_to_fill, start=1):
+        sheet_data = stored_data.get(sheet_name, {})
+        ws = wb[sheet_name]
+        
+        # Get the requested version data
+        data_to_fill = resolve_sheet_data(sheet_data, version)
+        if overrides and sheet_name in overrides:
+            data_to_fill.update(overrides[sheet_name])
+        
+        # Table-shaped sheets
+        rows = data_to_fill.get('rows')
+        if sheet_name in TABULAR_SHEETS and isinstance(rows, list) and rows:
+            header_rows = TABULAR_SHEETS[sheet_name]['header_rows'] or _detect_header_rows(ws)
+            # Streaming replaces everything below the header, so templates with
+            # rows there (합계, formulas, notes) keep the cell writer
+            if select_sheet_writer(sheet_name, len(rows)) == 'stream' and not _has_rows_below(ws, header_rows):
+                streamed_tables.append(_prepare_streamed_table(wb, ws, rows, header_rows))
+            else:
+                _write_table_cells(ws, rows, header_rows)
+        
+        # Fill cells through the compiled field map
+        compiled = (field_maps or {}).get(sheet_name)
+        if compiled:
+            targets = compiled['targets']
+            protected = set(compiled['protected'])
+        else:
+            targets = static_targets.setdefault(sheet_name, compile_field_map(sheet_name, {})['targets'])
+            protected = set()
+        
+        for key, value in data_to_fill.items():
+            if value is None:
+                continue
+            target = targets.get(key) or _cell_ref_target(key)
+            if target is None:
+                continue
+            
+            cell = ws.cell(row=target[0], column=target[1])
+            # Preserve formulas: the parsed template only lists those inside
+            # its scan window, so cells outside it are checked directly.
+            # Cells inside a merged range (other than its top-left) are read-only
+            if (target in protected or isinstance(cell, MergedCell)
+                    or (isinstance(cell.value, str) and cell.value.startswith('='))):
+                continue
+            
+            cell.value = value if isinstance(value, (int, float, str)) else str(value)
+        
+        if progress_callback:
+            progress_callback(sheet_name, sheet_index, len(sheets_to_fill))
+    
+    return streamed_tables
+
+def generate_filled_excel(template_path: str, stored_data: Dict,
+                          progress_callback: Optional[Callable[[str, int, int], None]] = None,
+                          version: Optional[str] = None,
+                          field_maps: Optional[Dict[str, Dict]] = None) -> str:
+    """Fill Excel template with stored data
+    
+    progress_callback, if given, is called as (sheet_name, completed, total)
+    after each sheet is filled.
+    """
+    output_path = None
+    
+    try:
+        # Create temp file for output
+        temp_dir = tempfile.mkdtemp()
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_path = os.path.join(temp_dir, f"filled_proposal_{timestamp}.xlsx")
+        
+        # Copy template to output
+        shutil.copy2(template_path, output_path)
+        
+        # Load workbook
+        wb = load_workbook(output_path)
+        
+        streamed_tables = fill_workbook(wb, stored_data, version=version,
+                                        progress_callback=progress_callback, field_maps=field_maps)
+        
+        # Save workbook
+        save_filled_workbook(wb, output_path, streamed_tables)
+        wb.close()
+        
+        return output_path
+        
+    except Exception as e:
+        st.error(f"Excel 생성 오류: {str(e)}")
+        if output_path and os.path.exists(output_path):
+            os.remove(output_path)
+        return None
+
+# Batch generation
+_BATCH_TEMPLATES: Dict[str, Dict[str, Any]] = {}
+
+def _init_batch_worker(templates: Dict[str, Dict[str, Any]]):
+    """Process pool initializer: ship template bytes and field maps to each worker once
+    
+    Importing app in a worker (spawn start method) has no database side
+    effects; init_database() only runs from main() and the CLI tools.
+    """
+    global _BATCH_TEMPLATES
+    _BATCH_TEMPLATES = templates
+
+def _variant_data(stored_data: Dict, sheet_names: List[str], version: Optional[str]) -> Dict:
+    """The part of the vault one variant writes: its template's sheets, base and the overlay version"""
+    versions = {'base', version or '2025 KIF Version'}
+    return {
+        sheet: {name: data for name, data in stored_data[sheet].items() if name in versions}
+        for sheet in sheet_names if sheet in stored_data
+    }
+
+def _generate_batch_variant(name: str, template: str, version: Optional[str],
+                            overrides: Dict[str, Dict], stored_data: Dict) -> Dict[str, Any]:
+    """Fill one variant in memory and return the workbook bytes"""
+    started = time.perf_counter()
+    try:
+        cached = _BATCH_TEMPLATES[template]
+        wb = load_workbook(BytesIO(cached['data']))
+        streamed_tables = fill_workbook(wb, stored_data, version=version, overrides=overrides,
+                                        field_maps=cached['field_maps'])
+        output = BytesIO()
+        save_filled_workbook(wb, output, streamed_tables)
+        wb.close()
+        return {'name': name, 'data': output.getvalue(), 'error': None,
+                'seconds': time.perf_counter() - started}
+    except Exception as e:
+        return {'name': name, 'data': None, 'error': str(e),
+                'seconds': time.perf_counter() - started}
+
+def generate_batch(jobs: List[Dict[str, Any]], stored_data: Dict, zip_path: str,
+                   max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Generate several template/version/override variants into one zip
+    
+    Each job is a dict with 'template' (path), optional 'version', optional
+    'overrides' ({sheet: {key: value}}) and optional 'name'. Each template
+    is read and parsed once, and its bytes and compiled field maps are
+    handed to every worker process up front. Each task carries only the
+    vault sheets and versions its variant writes; finished workbooks are
+    appended to the zip as they complete.
+    """
+    templates = {}
+    sheet_names = {}
+    variants = []
+    used_names = set()
+    
+    for index, job in enumerate(jobs, start=1):
+        template = job['template']
+        if template not in templates:
+            with open(template, 'rb') as f:
+                data = f.read()
+            structure = parse_excel_template(template)
+            templates[template] = {
+                'data': data,
+                'field_maps': {sheet: info['field_map'] for sheet, info in structure.items()}
+            }
+            sheet_names[template] = load_workbook(BytesIO(data), read_only=True).sheetnames
+        
+        version = job.get('version')
+        name = job.get('name') or f"{os.path.splitext(os.path.basename(template))[0]}_{version or 'latest'}"
+        if name in used_names:
+            name = f"{name}_{index}"
+        used_names.add(name)
+        variants.append((name, template, version, job.get('overrides') or {}))
+    
+    results = []
+    workers = min(max_workers or os.cpu_count() or 1, max(len(variants), 1))
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                             initargs=(templates,)) as executor:
+        futures = [
+            executor.submit(_generate_batch_variant, name, template, version, overrides,
+                            _variant_data(stored_data, sheet_names[template], version))
+            for name, template, version, overrides in variants
+        ]
+        
+        # xlsx files are already deflated, so store them as-is
+        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_STORED) as zf:
+            for future in as_completed(futures):
+                result = future.result()
+                if result['data'] is not None:
+                    zf.writestr(f"{result['name']}.xlsx", result['data'])
+                results.append({
+                    'name': result['name'],
+                    'ok': result['error'] is None,
+                    'error': result['error'],
+                    'seconds': round(result['seconds'], 3)
+                })
+    
+    order = {name: position for position, (name, _, _, _) in enumerate(variants)}
+    results.sort(key=lambda r: order[r['name']])
+    return results
+
+# Artifact store: generated files live on disk. They are downloaded through
+# Streamlit, or through signed, expiring links when ARTIFACT_BASE_URL names a
+# proxy in front of the artifact server
+ARTIFACT_DIR = os.environ.get('ARTIFACT_DIR', os.path.join(tempfile.gettempdir(), 'vc_proposal_artifacts'))
+ARTIFACT_TTL_SECONDS = int(os.environ.get('ARTIFACT_TTL_SECONDS', str(24 * 60 * 60)))
+ARTIFACT_SERVER_HOST = os.environ.get('ARTIFACT_SERVER_HOST', '127.0.0.1')
+ARTIFACT_SERVER_PORT = int(os.environ.get('ARTIFACT_SERVER_PORT', '8601'))
+ARTIFACT_BASE_URL = os.environ.get('ARTIFACT_BASE_URL', '')
+ARTIFACT_CHUNK_SIZE = 64 * 1024
+ARTIFACT_SIGNING_KEY = os.environ.get('ARTIFACT_SIGNING_KEY', '')
+ARTIFACT_PURGE_INTERVAL_SECONDS = 600
+
+@lru_cache(maxsize=1)
+def _artifact_signing_key() -> bytes:
+    """ARTIFACT_SIGNING_KEY, or a random key kept in ARTIFACT_DIR and shared by every app process"""
+    if ARTIFACT_SIGNING_KEY:
+        return ARTIFACT_SIGNING_KEY.encode('utf-8')
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    path = os.path.join(ARTIFACT_DIR, '.signing_key')
+    if not os.path.exists(path):
+        fd, staged = tempfile.mkstemp(dir=ARTIFACT_DIR)
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(staged, path)  # fails if another process created the key first
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(staged)
+    with open(path, encoding='utf-8') as f:
+        return f.read().strip().encode('utf-8')
+
+def _artifact_signature(token: str, expires: int) -> str:
+    return hmac.new(_artifact_signing_key(), f"{token}:{expires}".encode('utf-8'), hashlib.sha256).hexdigest()
+
+def store_artifact(user_id: int, source_path: str, filename: str) -> str:
+    """Move a generated file into the artifact store and return its download token"""
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    token = secrets.token_urlsafe(32)
+    path = os.path.join(ARTIFACT_DIR, f"{token}{os.path.splitext(filename)[1]}")
+    shutil.move(source_path, path)
+    
+    # generate_filled_excel writes into its own temp directory
+    source_dir = os.path.dirname(source_path)
+    if source_dir != ARTIFACT_DIR and not os.listdir(source_dir):
+        os.rmdir(source_dir)
+    
+    now = datetime.now()
+    with SessionLocal() as session:
+        session.add(Artifact(
+            token=token,
+            user_id=user_id,
+            path=path,
+            filename=filename,
+            size=os.path.getsize(path),
+            created_at=now,
+            expires_at=now + timedelta(seconds=ARTIFACT_TTL_SECONDS)
+        ))
+        session.commit()
+    
+    return token
+
+def get_artifact(token: str) -> Optional[Dict[str, Any]]:
+    """Artifact metadata, or None once it has expired or its file is gone
+    
+    'url' is a signed download link, or None unless ARTIFACT_BASE_URL is set.
+    """
+    with SessionLocal() as session:
+        artifact = session.get(Artifact, token)
+        if not artifact or artifact.expires_at <= datetime.now() or not os.path.exists(artifact.path):
+            return None
+        expires = int(artifact.expires_at.timestamp())
+        return {
+            'token': artifact.token,
+            'path': artifact.path,
+            'filename': artifact.filename,
+            'size': artifact.size,
+            'expires_at': artifact.expires_at,
+            'url': f"{ARTIFACT_BASE_URL}/artifacts/{artifact.token}"
+                   f"?expires={expires}&signature={_artifact_signature(artifact.token, expires)}"
+                   if ARTIFACT_BASE_URL else None
+        }
+
+def resolve_artifact_request(path: str) -> Optional[Dict[str, Any]]:
+    """Artifact for a download request path, or None unless its link is signed and unexpired"""
+    parts = urlsplit(path)
+    prefix = '/artifacts/'
+    if not parts.path.startswith(prefix):
+        return None
+    token = parts.path[len(prefix):]
+    query = parse_qs(parts.query)
+    try:
+        expires = int(query['expires'][0])
+        signature = query['signature'][0]
+    except (KeyError, ValueError):
+        return None
+    if expires <= time.time() or not hmac.compare_digest(signature, _artifact_signature(token, expires)):
+        return None
+    return get_artifact(token)
+
+def purge_expired_artifacts() -> int:
+    """Delete expired artifacts from disk and the store"""
+    with SessionLocal() as session:
+        expired = session.query(Artifact).filter(Artifact.expires_at <= datetime.now()).all()
+        for artifact in expired:
+            try:
+                os.remove(artifact.path)
+            except FileNotFoundError:
+                pass  # already purged by another app process
+            session.delete(artifact)
+        session.commit()
+        return len(expired)
+
+class ArtifactRequestHandler(BaseHTTPRequestHandler):
+    """GET /artifacts/<token>?expires=...&signature=... streams the file in fixed-size chunks"""
+    
+    def do_GET(self):
+        artifact = resolve_artifact_request(self.path)
+        
+        if not artifact:
+            self.send_error(404, "Artifact not found or expired")
+            return
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        self.send_header('Content-Length', str(os.path.getsize(artifact['path'])))
+        self.send_header('Content-Disposition', f"attachment; filename*=UTF-8''{quote(artifact['filename'])}")
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        
+        with open(artifact['path'], 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, ARTIFACT_CHUNK_SIZE)
+    
+    def log_message(self, format, *args):
+        pass
+
+@st.cache_resource
+def start_artifact_server() -> Optional[ThreadingHTTPServer]:
+    """Serve artifact downloads from a background thread (only when ARTIFACT_BASE_URL is set)"""
+    if not ARTIFACT_BASE_URL:
+        return None
+    try:
+        server = ThreadingHTTPServer((ARTIFACT_SERVER_HOST, ARTIFACT_SERVER_PORT), ArtifactRequestHandler)
+    except OSError:
+        # Another app process already serves the shared artifact store
+        return None
+    
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='artifact-server', daemon=True).start()
+    return server
+
+@st.cache_resource
+def start_artifact_purge() -> threading.Thread:
+    """Purge expired artifacts from a background thread, whether or not this process serves downloads"""
+    def purge_loop():
+        while True:
+            try:
+                purge_expired_artifacts()
+            except Exception:
+                logger.exception("Purging expired artifacts failed")
+            time.sleep(ARTIFACT_PURGE_INTERVAL_SECONDS)
+    
+    thread = threading.Thread(target=purge_loop, name='artifact-purge', daemon=True)
+    thread.start()
+    return thread
+
+# Background generation jobs
+GENERATION_WORKERS = int(os.environ.get('GENERATION_WORKERS', '2'))
+
+@st.cache_resource
+def get_generation_queue() -> Dict[str, Any]:
+    """Process-wide worker pool and in-flight job registry, shared across reruns and sessions"""
+    return {
+        'executor': ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix='generation'),
+        'active': set(),
+        'lock': threading.Lock()
+    }
+
+def compute_job_key(user_id: int, template_path: str, stored_data: Dict,
+                    version: Optional[str] = None) -> str:
+    """Hash generation inputs so identical submissions map to the same job"""
+    digest = hashlib.sha256()
+    digest.update(f"{user_id}:{version or ''}".encode())
+    with open(template_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    digest.update(json.dumps(stored_data, ensure_ascii=False, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+def _update_job(job_id: str, **fields):
+    """Persist job state changes"""
+    with SessionLocal() as session:
+        job = session.get(GenerationJob, job_id)
+        if job:
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated_at = datetime.now()
+            session.commit()
+
+def _run_generation_job(job_id: str, user_id: int, template_path: str, stored_data: Dict,
+                        version: Optional[str], field_maps: Optional[Dict[str, Dict]]):
+    """Worker body: generate the workbook, record per-sheet progress and publish it as an artifact"""
+    queue = get_generation_queue()
+    try:
+        _update_job(job_id, status='running', completed_sheets=0, error=None)
+        
+        def report_progress(sheet_name: str, completed: int, total: int):
+            _update_job(job_id, current_sheet=sheet_name, completed_sheets=completed, total_sheets=total)
+        
+        output_path = generate_filled_excel(template_path, stored_data,
+                                            progress_callback=report_progress, version=version,
+                                            field_maps=field_maps)
+        
+        if output_path and os.path.exists(output_path):
+            with SessionLocal() as session:
+                firm_name = session.get(User, user_id).firm_name
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            token = store_artifact(user_id, output_path, f"KIF_제안서_{firm_name}_{timestamp}.xlsx")
+            _update_job(job_id, status='done', artifact_token=token, current_sheet=None)
+        else:
+            _update_job(job_id, status='failed', error="제안서 생성 실패. 데이터를 확인해주세요.")
+    except Exception as e:
+        _update_job(job_id, status='failed', error=str(e))
+    finally:
+        with queue['lock']:
+            queue['active'].discard(job_id)
+
+def submit_generation_job(user_id: int, template_path: str, stored_data: Dict,
+                          version: Optional[str] = None,
+                          field_maps: Optional[Dict[str, Dict]] = None) -> str:
+    """Queue a generation job, reusing an identical queued, running or finished job"""
+    job_id = compute_job_key(user_id, template_path, stored_data, version)
+    queue = get_generation_queue()
+    
+    with queue['lock']:
+        with SessionLocal() as session:
+            job = session.get(GenerationJob, job_id)
+            
+            if job:
+                if job.status in ('queued', 'running') and job_id in queue['active']:
+                    return job_id
+                if job.status == 'done' and job.artifact_token and get_artifact(job.artifact_token):
+                    return job_id
+                # Failed, or orphaned by a server restart: run it again
+                job.status = 'queued'
+                job.completed_sheets = 0
+                job.current_sheet = None
+                job.output_path = None
+                job.artifact_token = None
+                job.error = None
+                job.updated_at = datetime.now()
+            else:
+                job = GenerationJob(
+                    id=job_id,
+                    user_id=user_id,
+                    status='queued',
+                    total_sheets=len(stored_data)
+                )
+                session.add(job)
+            session.commit()
+        
+        queue['active'].add(job_id)
+    
+    queue['executor'].submit(_run_generation_job, job_id, user_id, template_path, stored_data, version, field_maps)
+    return job_id
+
+def get_generation_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Fetch job state as a plain dict"""
+    with SessionLocal() as session:
+        job = session.get(GenerationJob, job_id)
+        if not job:
+            return None
+        return {
+            'id': job.id,
+            'status': job.status,
+            'total_sheets': job.total_sheets or 0,
+            'completed_sheets': job.completed_sheets or 0,
+            'current_sheet': job.current_sheet,
+            'artifact_token': job.artifact_token,
+            'error': job.error,
+            'updated_at': job.updated_at
+        }
+
+def get_latest_generation_job(user_id: int) -> Optional[Dict[str, Any]]:
+    """Most recently submitted job for the user, so progress survives new sessions"""
+    with SessionLocal() as session:
+        job = session.query(GenerationJob).filter_by(user_id=user_id).order_by(
+            GenerationJob.updated_at.desc()
+        ).first()
+        job_id = job.id if job else None
+    
+    return get_generation_job(job_id) if job_id else None
+
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+# Plain decimal numbers; float() would also take 'nan', 'inf', '1_000' and non-ASCII digits
+NUMBER_TEXT_PATTERN = re.compile(r'^\s*[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?\s*$')
+A4_CHAR_BUDGET = 10000
+
+def _parse_number_text(text: str) -> Optional[float]:
+    """float of a plain decimal number, else None (same values _column_number accepts)"""
+    return float(text) if NUMBER_TEXT_PATTERN.match(text) else None
+
+def _check_not_empty(value: Any) -> Optional[str]:
+    if value is None or str(value).strip() == "":
+        return "빈 셀 불허 (0 또는 해당 데이터 입력 필수)"
+    return None
+
+def _check_date(value: Any) -> Optional[str]:
+    if value and not DATE_PATTERN.match(str(value)):
+        return "KIF 날짜 형식은 YYYY-MM-DD"
+    return None
+
+def _check_percent(value: Any) -> Optional[str]:
+    if value:
+        float_val = _parse_number_text(str(value).replace('%', ''))
+        if float_val is None:
+            return "유효한 퍼센트 값이 아님"
+        if abs(float_val - round(float_val, 1)) > 0.01:
+            return "퍼센트는 소수점 첫째 자리까지만 입력"
+    return None
+
+def _check_amount(value: Any) -> Optional[str]:
+    if value and value != 0:
+        if _parse_number_text(str(value).replace(',', '')) is None:
+            return "유효한 금액이 아님"
+    return None
+
+def _check_name(value: Any) -> Optional[str]:
+    if value and len(str(value)) < 2:
+        return "정식 명칭 입력 필요"
+    return None
+
+# KIF field rules: (name, key keywords, check). A rule applies to every field
+# whose key contains one of its keywords (None: every field); checks return
+# an error message or None. Rules run in this order.
+FIELD_RULES = [
+    ('required', None, _check_not_empty),
+    ('date', ('일자', '날짜', '기간', '년도'), _check_date),
+    ('percent', ('비율', '%', 'IRR'), _check_percent),
+    ('amount', ('금액', '규모', '자산', '자본', '매출', '투자'), _check_amount),
+    ('name', ('회사명', '펀드명', '법인명'), _check_name),
+]
+
+def _compile_keywords(keywords: Optional[Tuple[str, ...]]) -> Optional[re.Pattern]:
+    """One regex matching any of the keywords (None matches every key)"""
+    return re.compile('|'.join(map(re.escape, keywords))) if keywords else None
+
+_COMPILED_FIELD_RULES = [(name, _compile_keywords(keywords), check) for name, keywords, check in FIELD_RULES]
+
+@lru_cache(maxsize=65536)
+def _field_rules(field: str) -> Tuple[Callable[[Any], Optional[str]], ...]:
+    """Checks that apply to a field key, in FIELD_RULES order"""
+    return tuple(
+        check for _, pattern, check in _COMPILED_FIELD_RULES
+        if pattern is None or pattern.search(field)
+    )
+
+def _missing_keys(data: Dict, required: List[str], message: str) -> List[str]:
+    # Keys joined once, so each lookup is a single substring search
+    keys = '\n'.join(map(str, data))
+    return [message.format(req) for req in required if req not in keys]
+
+def _validate_financials(data: Dict) -> List[str]:
+    return _missing_keys(data, ['자산', '부채', '자본', '매출'], "재무실적: {} 데이터 필수")
+
+def _validate_personnel(data: Dict) -> List[str]:
+    errors = []
+    if not any('대표' in str(value) or 'CEO' in str(value) for value in data.values()):
+        errors.append("핵심운용인력: 대표이사/CEO 정보 필수")
+    
+    # Career length validation
+    for key, value in data.items():
+        if '경력' in key and value:
+            try:
+                career_years = float(value)
+            except (TypeError, ValueError):
+                continue
+            if career_years < 0 or career_years > 50:
+                errors.append(f"{key}: 경력년수는 0-50년 범위")
+    return errors
+
+def _validate_fund_performance(data: Dict) -> List[str]:
+    return _missing_keys(data, ['수익률', 'IRR', 'TVPI'], "KIF 펀드 실적: {} 데이터 필수")
+
+def _validate_compliance(data: Dict) -> List[str]:
+    keys = '\n'.join(map(str, data))
+    if '리스크' not in keys and '컴플라이언스' not in keys:
+        return ["준법성: 리스크 관리 체계 정보 필수"]
+    return []
+
+def _remaining_print_budget(value: Any, budget: int) -> int:
+    """Remaining budget after a rough printed length of value (negative once exceeded)
+    
+    Walks the payload instead of building str(value), and stops as soon as
+    the budget is used up.
+    """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            budget = _remaining_print_budget(item, budget - len(str(key)) - 4)
+            if budget < 0:
+                break
+        return budget
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            budget = _remaining_print_budget(item, budget - 2)
+            if budget < 0:
+                break
+        return budget
+    return budget - (len(value) + 2 if isinstance(value, str) else len(str(value)))
 
-def load_stored_data(user_id: int) -> Dict[str, Any]:
-    """Fetch stored data from database"""
-    stored_data = {}
+def _check_print_size(data: Dict) -> List[str]:
+    # A4 print requirement warning
+    if _remaining_print_budget(data, A4_CHAR_BUDGET) < 0:
+        return ["주의: 데이터가 A4 인쇄 크기를 초과할 수 있음"]
+    return []
+
+# Sheet-level KIF rules: sheet -> [(name, depends_on, check)]. depends_on
+# lists the key keywords whose fields the check reads (None: every field);
+# on incremental validation a check only re-runs when such a field changed.
+# COMMON_SHEET_RULES run after the sheet's own rules on every sheet.
+SHEET_RULES = {
+    "1-2.재무실적": [('financials_required', ('자산', '부채', '자본', '매출'), _validate_financials)],
+    "1-4.핵심운용인력 관리현황": [('personnel', None, _validate_personnel)],
+    "2-3.KIF 펀드 운용실적": [('fund_metrics_required', ('수익률', 'IRR', 'TVPI'), _validate_fund_performance)],
+    "1-3.준법성": [('compliance_required', ('리스크', '컴플라이언스'), _validate_compliance)],
+}
+COMMON_SHEET_RULES = [('print_size', None, _check_print_size)]
+
+_COMPILED_SHEET_DEPENDENCIES = {
+    name: _compile_keywords(depends_on)
+    for rules in list(SHEET_RULES.values()) + [COMMON_SHEET_RULES]
+    for name, depends_on, _ in rules
+}
+
+VALIDATION_CACHE_SIZE = int(os.environ.get('VALIDATION_CACHE_SIZE', '65536'))
+
+def _value_key(value: Any) -> Tuple[str, Any]:
+    """Hashable stand-in for a field value (type-sensitive, like _same_value)
     
-    with SessionLocal() as session:
-        data_records = session.query(ProposalData).filter_by(user_id=user_id).all()
+    A float NaN is stored as null (dumps_payload) and is blank to the table
+    checks, so it is validated as None.
+    """
+    if isinstance(value, float) and math.isnan(value):
+        return ('NoneType', None)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return (type(value).__name__, value)
+    return ('json', json.dumps(value, ensure_ascii=False, sort_keys=True, default=str))
+
+@lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+def _cached_field_errors(sheet_id: str, field: str, value_key: Tuple[str, Any]) -> Tuple[str, ...]:
+    """Field rule messages for one (sheet, field, value)"""
+    kind, value = value_key
+    if kind == 'json':
+        value = json.loads(value)
+    errors = []
+    for check in _field_rules(field):
+        message = check(value)
+        if message:
+            errors.append(f"{field}: {message}")
+    return tuple(errors)
+
+def _column_not_empty(strings: pd.Series, missing: pd.Series, truthy: pd.Series) -> List[Tuple[pd.Series, str]]:
+    return [(missing | strings.str.strip().eq(''), "빈 셀 불허 (0 또는 해당 데이터 입력 필수)")]
+
+def _column_date(strings: pd.Series, missing: pd.Series, truthy: pd.Series) -> List[Tuple[pd.Series, str]]:
+    return [(truthy & ~strings.str.match(DATE_PATTERN.pattern), "KIF 날짜 형식은 YYYY-MM-DD")]
+
+def _column_number(strings: pd.Series) -> pd.Series:
+    """Column form of _parse_number_text: NaN where the text is not a plain decimal number"""
+    return pd.to_numeric(strings.where(strings.str.match(NUMBER_TEXT_PATTERN.pattern)), errors='coerce')
+
+def _column_percent(strings: pd.Series, missing: pd.Series, truthy: pd.Series) -> List[Tuple[pd.Series, str]]:
+    numbers = _column_number(strings.str.replace('%', '', regex=False))
+    return [
+        (truthy & numbers.isna(), "유효한 퍼센트 값이 아님"),
+        (truthy & ((numbers - numbers.round(1)).abs() > 0.01), "퍼센트는 소수점 첫째 자리까지만 입력"),
+    ]
+
+def _column_amount(strings: pd.Series, missing: pd.Series, truthy: pd.Series) -> List[Tuple[pd.Series, str]]:
+    numbers = _column_number(strings.str.replace(',', '', regex=False))
+    return [(truthy & numbers.isna(), "유효한 금액이 아님")]
+
+def _column_name(strings: pd.Series, missing: pd.Series, truthy: pd.Series) -> List[Tuple[pd.Series, str]]:
+    return [(truthy & strings.str.len().lt(2), "정식 명칭 입력 필요")]
+
+# Whole-column equivalents of the FIELD_RULES checks, used for table sheets
+COLUMN_CHECKS = {
+    _check_not_empty: _column_not_empty,
+    _check_date: _column_date,
+    _check_percent: _column_percent,
+    _check_amount: _column_amount,
+    _check_name: _column_name,
+}
+
+def validate_table(payload: Dict, sheet_id: str, rows: Optional[List[int]] = None) -> Dict[str, Any]:
+    """Columnar validation of a table payload ({'columns': [...], 'rows': [[...]]})
+    
+    Rows are loaded into a DataFrame and every FIELD_RULES check that
+    applies to a column header runs on the whole column at once. rows
+    limits the check to those row indices. Returns {'mask': DataFrame of
+    booleans (True where a cell has an error, one column per header,
+    indexed by row), 'row_errors': {row index: [messages]}}.
+    """
+    columns = [str(column) for column in payload['columns']]
+    selected = payload['rows'] if rows is None else [payload['rows'][row] for row in rows]
+    frame = pd.DataFrame(selected, dtype=object, index=rows).reindex(columns=range(len(columns)))
+    mask = pd.DataFrame(False, index=frame.index, columns=range(len(columns)))
+    found = []
+    
+    for position, column in enumerate(columns):
+        checks = [COLUMN_CHECKS[check] for check in _field_rules(column)]
+        if not checks:
+            continue
+        values = frame[position]
+        missing = values.isna()
+        strings = values.astype(str)
+        # Python truthiness: None, '', 0, 0.0 and False are falsy
+        truthy = ~(missing | strings.eq('') | values.isin([0]))
         
-        for record in data_records:
-            if record.sheet_id not in stored_data:
-                stored_data[record.sheet_id] = {}
-            
-            try:
-                data = json.loads(record.data_json)
-                stored_data[record.sheet_id][record.version] = data
-            except json.JSONDecodeError:
-                continue
+        for column_check in checks:
+            for invalid, message in column_check(strings, missing, truthy):
+                invalid = invalid.fillna(False).astype(bool)
+                if invalid.any():
+                    mask[position] |= invalid
+                    found.extend((frame.index[row], position, message) for row in np.flatnonzero(invalid.to_numpy()))
     
-    return stored_data
+    row_errors = {}
+    for row, position, message in sorted(found, key=lambda error: error[:2]):
+        row_errors.setdefault(int(row), []).append(f"{row + 1}행 {columns[position]}: {message}")
+    mask.columns = columns
+    return {'mask': mask, 'row_errors': row_errors}
 
-def compare_data(stored: Dict, rfp_reqs: Dict, template: Dict) -> Dict[str, Any]:
-    """Analyze data availability and suggest improvements"""
-    comparison = {
-        'available': [],
-        'partial': [],
-        'missing': [],
-        'suggestions': []
-    }
+@lru_cache(maxsize=65536)
+def _dependent_sheet_rules(field: str) -> frozenset:
+    """Names of sheet rules whose declared dependencies include a field key"""
+    return frozenset(
+        name for name, pattern in _COMPILED_SHEET_DEPENDENCIES.items()
+        if pattern is None or pattern.search(field)
+    )
+
+def validate_sheet(data: Dict, sheet_id: str, previous: Optional[Dict] = None,
+                   previous_result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Validate a sheet payload, re-running only what changed
     
-    # Check each sheet
-    for sheet_name in SHEET_CONFIG.keys():
-        if sheet_name in stored and stored[sheet_name]:
-            # Check if data is complete
-            if template.get(sheet_name, {}).get('fields'):
-                required_fields = len(template[sheet_name]['fields'])
-                if stored[sheet_name].get('base'):
-                    filled_fields = len([v for v in stored[sheet_name]['base'].values() if v])
-                    if filled_fields >= required_fields * 0.8:
-                        comparison['available'].append(sheet_name)
-                    elif filled_fields >= required_fields * 0.3:
-                        comparison['partial'].append(sheet_name)
-                    else:
-                        comparison['missing'].append(sheet_name)
-                else:
-                    comparison['missing'].append(sheet_name)
-            else:
-                comparison['available'].append(sheet_name)
+    Field rule results are memoized per (sheet, field, value). Given the
+    previously validated payload and its result, unchanged fields reuse
+    their errors and a sheet rule only re-runs when a field it depends on
+    changed. Returns {'errors': [...], 'field_errors': {field: [...]},
+    'sheet_errors': {rule: [...]}}; 'errors' lists field errors in payload
+    order followed by sheet errors, as validate_input does. Table payloads
+    are checked with validate_table and their errors keyed rows[i]; with
+    unchanged columns only added or edited rows are checked again.
+    """
+    rules = SHEET_RULES.get(sheet_id, []) + COMMON_SHEET_RULES
+    incremental = previous is not None and previous_result is not None
+    if incremental:
+        changed = {field for field, value in data.items()
+                   if field not in previous or not _same_value(previous[field], value)}
+        changed.update(field for field in previous if field not in data)
+        rerun = set()
+        for field in changed:
+            rerun |= _dependent_sheet_rules(field)
+    
+    # Table sheets: rows are validated column by column, errors keyed rows[i]
+    table = _is_table_payload(data)
+    
+    field_errors = {}
+    for field, value in data.items():
+        if table and field in ('columns', 'rows'):
+            continue
+        if incremental and field not in changed:
+            messages = previous_result['field_errors'].get(field)
         else:
-            comparison['missing'].append(sheet_name)
+            messages = _cached_field_errors(sheet_id, field, _value_key(value))
+        if messages:
+            field_errors[field] = list(messages)
     
-    # Generate suggestions based on RFP requirements
-    if rfp_reqs.get('mandatory_investment'):
-        if 'AI' in rfp_reqs['mandatory_investment'] or '인공지능' in rfp_reqs['mandatory_investment']:
-            comparison['suggestions'].append("AI/인공지능 투자 전략을 '2-4.투자전략 및 계획'에 추가 필요")
+    if table:
+        if incremental and 'columns' not in changed and _is_table_payload(previous):
+            previous_rows = previous['rows']
+            edited = [row for row, values in enumerate(data['rows'])
+                      if row >= len(previous_rows) or not _same_value(previous_rows[row], values)]
+            row_errors = {
+                int(field[5:-1]): messages for field, messages in previous_result['field_errors'].items()
+                if field.startswith('rows[') and int(field[5:-1]) < len(data['rows'])
+            }
+            for row in edited:
+                row_errors.pop(row, None)
+            if edited:
+                row_errors.update(validate_table(data, sheet_id, rows=edited)['row_errors'])
+        else:
+            row_errors = validate_table(data, sheet_id)['row_errors']
+        field_errors.update((f"rows[{row}]", list(row_errors[row])) for row in sorted(row_errors))
     
-    if rfp_reqs.get('sectors'):
-        for sector in rfp_reqs['sectors'][:3]:
-            comparison['suggestions'].append(f"{sector} 분야 투자 실적을 '2-3.주요펀드 운용 실적'에 강조")
+    sheet_errors = {}
+    for name, _, check in rules:
+        if incremental and name not in rerun and name in previous_result['sheet_errors']:
+            messages = previous_result['sheet_errors'][name]
+        else:
+            messages = check(data)
+        sheet_errors[name] = list(messages)
     
-    if len(comparison['missing']) > 5:
-        comparison['suggestions'].append("주요 데이터가 많이 누락됨. 기본 정보부터 순차적으로 입력 권장")
+    errors = [message for messages in field_errors.values() for message in messages]
+    errors += [message for messages in sheet_errors.values() for message in messages]
+    return {'errors': errors, 'field_errors': field_errors, 'sheet_errors': sheet_errors}
+
+def validate_input(data: Dict, sheet_id: str) -> List[str]:
+    """Validate input data based on 2025 KIF requirements
     
-    return comparison
+    Field rules are looked up per distinct key (see FIELD_RULES) and sheet
+    rules are dispatched from SHEET_RULES.
+    """
+    return validate_sheet(data, sheet_id)['errors']
 
-def update_data(user_id: int, sheet_id: str, new_data: Dict, version: str = 'base'):
-    """Save or update data in database"""
+CROSS_SHEET_TOLERANCE = 0.5  # amounts are in 백만원; allow rounding differences
+
+def _to_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(str(value).replace(',', ''))
+    except ValueError:
+        return None
+
+def _sheet_values(payload: Dict, keywords: Tuple[str, ...]) -> List[Any]:
+    """Values under the first table column, or every form key, matching a keyword"""
+    if _is_table_payload(payload):
+        for position, column in enumerate(payload['columns']):
+            if any(keyword in str(column) for keyword in keywords):
+                return [row[position] for row in payload['rows']
+                        if isinstance(row, (list, tuple)) and position < len(row)]
+        return []
+    return [value for key, value in payload.items() if any(keyword in key for keyword in keywords)]
+
+def _totals_match(summary_sheet: str, detail_sheets: Tuple[str, ...], keywords: Tuple[str, ...],
+                  label: str) -> Callable[[Dict[str, Dict]], List[str]]:
+    """Rule: an amount on a summary sheet equals the sum over its detail sheets"""
+    def check(payloads: Dict[str, Dict]) -> List[str]:
+        details = [payloads[sheet] for sheet in detail_sheets if sheet in payloads]
+        if summary_sheet not in payloads or not details:
+            return []
+        totals = [n for n in map(_to_number, _sheet_values(payloads[summary_sheet], keywords)) if n is not None]
+        if not totals:
+            return []
+        detail_sum = sum(n for payload in details
+                         for n in map(_to_number, _sheet_values(payload, keywords)) if n is not None)
+        if abs(sum(totals) - detail_sum) > CROSS_SHEET_TOLERANCE:
+            return [f"{label}: {summary_sheet} {sum(totals):,.1f} ≠ 세부 합계 {detail_sum:,.1f}"]
+        return []
+    return check
+
+def _personnel_match_careers(payloads: Dict[str, Dict]) -> List[str]:
+    personnel, careers = payloads.get("1-4.핵심운용인력 관리현황"), payloads.get("3-1.핵심운용인력 경력기간")
+    if not personnel or not careers:
+        return []
+    names = {str(name).strip() for name in _sheet_values(personnel, ('성명',)) if str(name or '').strip()}
+    listed = {str(name).strip() for name in _sheet_values(careers, ('성명',)) if str(name or '').strip()}
+    errors = []
+    if names - listed:
+        errors.append(f"3-1 경력기간에 없는 핵심운용인력: {', '.join(sorted(names - listed))}")
+    if listed - names:
+        errors.append(f"1-4 관리현황에 없는 경력기간 인력: {', '.join(sorted(listed - names))}")
+    return errors
+
+# Cross-sheet KIF rules: (name, sheets, check). check gets {sheet: payload}
+# for the declared sheets that are stored (others are absent) and returns
+# messages. Saving a sheet re-evaluates only the rules that declare it.
+CROSS_SHEET_RULES = [
+    ('active_fund_totals', ("2-2.운용중인 펀드 총괄", "2-2-1.운용펀드 세부1", "2-2-2.운용펀드 세부2"),
+     _totals_match("2-2.운용중인 펀드 총괄", ("2-2-1.운용펀드 세부1", "2-2-2.운용펀드 세부2"),
+                   ('결성총액', '약정총액', '결성금액'), "운용펀드 결성총액")),
+    ('liquidated_fund_totals', ("2-1.청산펀드 총괄", "2-1-1.청산펀드 세부1", "2-1-2.청산펀드 세부2"),
+     _totals_match("2-1.청산펀드 총괄", ("2-1-1.청산펀드 세부1", "2-1-2.청산펀드 세부2"),
+                   ('결성총액', '약정총액', '결성금액'), "청산펀드 결성총액")),
+    ('personnel_careers', ("1-4.핵심운용인력 관리현황", "3-1.핵심운용인력 경력기간"), _personnel_match_careers),
+]
+
+_CROSS_SHEET_RULES_BY_SHEET: Dict[str, List[Tuple]] = {}
+for _rule in CROSS_SHEET_RULES:
+    for _sheet in _rule[1]:
+        _CROSS_SHEET_RULES_BY_SHEET.setdefault(_sheet, []).append(_rule)
+
+def _evaluate_cross_sheet_rules(rules: List[Tuple], payloads: Dict[str, Dict]) -> List[Tuple[str, str]]:
+    """(rule name, message) for every violation"""
+    violations = []
+    for name, sheets, check in rules:
+        for message in check({sheet: payloads[sheet] for sheet in sheets if sheet in payloads}):
+            violations.append((name, message))
+    return violations
+
+def _materialize_violations(session: Session, user_id: int, version: str, rules: List[Tuple],
+                            violations: List[Tuple[str, str]], now: datetime):
+    """Replace the stored violations of the given rules in one version"""
+    rules_by_name = {rule[0]: rule for rule in rules}
+    session.query(ValidationViolation).filter(
+        ValidationViolation.user_id == user_id,
+        ValidationViolation.version == version,
+        ValidationViolation.rule.in_(rules_by_name)
+    ).delete(synchronize_session=False)
+    if violations:
+        session.execute(ValidationViolation.__table__.insert(), [
+            {'user_id': user_id, 'version': version, 'rule': name,
+             'sheets': json.dumps(list(rules_by_name[name][1]), ensure_ascii=False),
+             'message': message, 'created_at': now}
+            for name, message in violations
+        ])
+
+def _session_payloads(session: Session, user_id: int, version: str, sheets) -> Dict[str, Dict]:
+    """Decoded payloads of some sheets of one version, read through a session"""
+    if not sheets:
+        return {}
+    payloads = {}
+    for sheet_id, data_format, data_json, data_blob in session.query(
+        ProposalData.sheet_id, PayloadBlob.data_format, PayloadBlob.data_json, PayloadBlob.data_blob
+    ).join(PayloadBlob, PayloadBlob.hash == ProposalData.payload_hash).filter(
+        ProposalData.user_id == user_id,
+        ProposalData.version == version,
+        ProposalData.sheet_id.in_(sheets)
+    ):
+        try:
+            payloads[sheet_id] = decode_payload(data_format, data_json, data_blob)
+        except (KeyError, zlib.error, json.JSONDecodeError):
+            continue
+    return payloads
+
+def _refresh_violations(session: Session, user_id: int, keys, known: Optional[Dict[Tuple[str, str], Dict]] = None):
+    """Re-evaluate cross-sheet rules touching the saved (sheet_id, version) keys
+    
+    Runs inside the write transaction, so violations commit together with
+    the data. known supplies payloads already in memory; the other sheets
+    the rules need are read from the session.
+    """
+    by_version = {}
+    for sheet_id, version in keys:
+        by_version.setdefault(version, set()).add(sheet_id)
+    now = datetime.now()
+    
+    for version, saved in by_version.items():
+        rules = list({rule[0]: rule for sheet in saved
+                      for rule in _CROSS_SHEET_RULES_BY_SHEET.get(sheet, [])}.values())
+        if not rules:
+            continue
+        needed = {sheet for rule in rules for sheet in rule[1]}
+        payloads = {sheet: payload for (sheet, key_version), payload in (known or {}).items()
+                    if key_version == version and sheet in needed}
+        payloads.update(_session_payloads(session, user_id, version, needed - set(payloads)))
+        _materialize_violations(session, user_id, version, rules, _evaluate_cross_sheet_rules(rules, payloads), now)
+
+def check_vault(user_id: int, versions: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Evaluate every cross-sheet rule over the stored vault (pre-submission check)
+    
+    Reads the vault once, re-materializes all violations of the checked
+    versions and returns them.
+    """
+    stored = _read_stored_data(user_id, versions=tuple(versions) if versions is not None else None)
+    by_version = {}
+    for sheet_id, payloads in stored.items():
+        for version, payload in payloads.items():
+            by_version.setdefault(version, {})[sheet_id] = payload
+    
+    now = datetime.now()
     with SessionLocal() as session:
-        # Check if record exists
-        existing = session.query(ProposalData).filter_by(
-            user_id=user_id, 
-            sheet_id=sheet_id,
-            version=version
-        ).first()
-        
-        data_json = json.dumps(new_data, ensure_ascii=False)
-        
-        if existing:
-            existing.data_json = data_json
-            existing.updated_at = datetime.now()
-        else:
-            new_record = ProposalData(
-                user_id=user_id,
-                sheet_id=sheet_id,
-                data_json=data_json,
-                version=version
-            )
-            session.add(new_record)
-        
+        for version in set(by_version) | set(versions or []):
+            violations = _evaluate_cross_sheet_rules(CROSS_SHEET_RULES, by_version.get(version, {}))
+            _materialize_violations(session, user_id, version, CROSS_SHEET_RULES, violations, now)
+        _bump_vault_revision(session, user_id)
         session.commit()
+    
+    return get_violations(user_id)
 
-def generate_filled_excel(template_path: str, stored_data: Dict) -> str:
-    """Fill Excel template with stored data"""
-    output_path = None
+def get_violations(user_id: int, version: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Materialized cross-sheet violations, memoized per vault revision"""
+    def loader():
+        with SessionLocal() as session:
+            query = session.query(ValidationViolation).filter(ValidationViolation.user_id == user_id)
+            if version is not None:
+                query = query.filter(ValidationViolation.version == version)
+            return [
+                {'version': v.version, 'rule': v.rule, 'sheets': json.loads(v.sheets),
+                 'message': v.message, 'created_at': v.created_at}
+                for v in query.order_by(ValidationViolation.version, ValidationViolation.rule, ValidationViolation.id)
+            ]
+    return _cached_vault_read(user_id, ('violations', version), loader)
+
+VALIDATION_BATCH_SIZE = int(os.environ.get('VALIDATION_BATCH_SIZE', '100'))
+
+def _code_fingerprint(code, seen: set) -> Tuple:
+    """Bytecode of code plus the module-level helpers and constants it refers to
     
-    try:
-        # Create temp file for output
-        temp_dir = tempfile.mkdtemp()
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_path = os.path.join(temp_dir, f"filled_proposal_{timestamp}.xlsx")
-        
-        # Copy template to output
-        shutil.copy2(template_path, output_path)
+    Helpers are fingerprinted once per run (seen), so shared ones such as
+    _missing_keys count wherever they are first reached.
+    """
+    consts = tuple(_code_fingerprint(c, seen) if hasattr(c, 'co_code') else repr(c) for c in code.co_consts)
+    referenced = []
+    for name in code.co_names:
+        value = globals().get(name)
+        if hasattr(value, '__code__') and getattr(value, '__module__', None) == __name__:
+            if name not in seen:
+                seen.add(name)
+                referenced.append((name, _function_fingerprint(value, seen)))
+        elif isinstance(value, re.Pattern):
+            referenced.append((name, value.pattern))
+        elif isinstance(value, (int, float, str, tuple, frozenset)):
+            referenced.append((name, repr(value)))
+    return (code.co_code, consts, code.co_names, tuple(referenced))
+
+def _function_fingerprint(function: Callable, seen: set) -> Tuple:
+    """Code and closure values of a check (closures carry _totals_match() arguments)"""
+    closure = tuple(
+        _function_fingerprint(cell.cell_contents, seen) if hasattr(cell.cell_contents, '__code__')
+        else repr(cell.cell_contents)
+        for cell in function.__closure__ or ()
+    )
+    return (_code_fingerprint(function.__code__, seen), closure)
+
+def validation_rules_fingerprint() -> str:
+    """Hash of the rule definitions and their code; changes when any rule does
+    
+    Covers field, sheet, column and cross-sheet rules together with the
+    helpers and constants (CROSS_SHEET_TOLERANCE, DATE_PATTERN, ...) their
+    checks use, so validate_vaults() re-runs everything when one changes.
+    """
+    checks = [(name, keywords, check) for name, keywords, check in FIELD_RULES]
+    for rules in list(SHEET_RULES.items()) + [('*', COMMON_SHEET_RULES)]:
+        checks += [(rules[0] + name, depends_on, check) for name, depends_on, check in rules[1]]
+    checks += [(check.__name__, None, column_check) for check, column_check in COLUMN_CHECKS.items()]
+    checks += [(name, sheets, check) for name, sheets, check in CROSS_SHEET_RULES]
+    seen = set()
+    parts = [(name, keywords, _function_fingerprint(check, seen)) for name, keywords, check in checks]
+    parts.append((DATE_PATTERN.pattern, A4_CHAR_BUDGET))
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()[:16]
+
+def _validate_record_batch(batch: List[Tuple[str, str, str, str, Optional[bytes]]]) -> List[Tuple[str, str, List[str], float]]:
+    """Worker: validate (sheet_id, payload hash, format, JSON text, blob) records"""
+    results = []
+    for sheet_id, blob_hash, data_format, data_json, data_blob in batch:
+        started = time.perf_counter()
+        try:
+            payload = decode_payload(data_format, data_json, data_blob)
+            if isinstance(payload, dict):
+                errors = validate_sheet(payload, sheet_id)['errors']
+            else:
+                errors = ["시트 데이터는 JSON 객체여야 합니다"]
+        except Exception as e:
+            errors = [f"검증 실패: {str(e)}"]
+        results.append((sheet_id, blob_hash, errors, time.perf_counter() - started))
+    return results
+
+def validate_vaults(user_ids: Optional[List[int]] = None, cache: Optional[Dict[str, Any]] = None,
+                    max_workers: Optional[int] = None, batch_size: int = VALIDATION_BATCH_SIZE) -> Dict[str, Any]:
+    """Validate every stored sheet of the given users (default: all) across a process pool
+    
+    Records are listed from proposal_data and their payloads streamed from
+    payload_blobs in batches of batch_size, at most two per worker in
+    flight, so each distinct (sheet, payload) is decoded and validated
+    once without holding the whole vault in memory. cache is the 'cache' of an
+    earlier report: results for unchanged payloads are reused as long as
+    the rules are unchanged. Cross-sheet rules are re-run (check_vault) for
+    users with a changed record. Returns a JSON-serializable report.
+    """
+    started = time.perf_counter()
+    fingerprint = validation_rules_fingerprint()
+    cached = cache['results'] if cache and cache.get('rules') == fingerprint else {}
+    
+    with SessionLocal() as session:
+        users = session.query(User.id, User.username)
+        if user_ids is not None:
+            users = users.filter(User.id.in_(user_ids))
+        usernames = dict(users.order_by(User.id).all())
         
-        # Load workbook
-        wb = load_workbook(output_path)
+        query = session.query(
+            ProposalData.user_id, ProposalData.sheet_id, ProposalData.version, ProposalData.payload_hash
+        ).filter(ProposalData.user_id.in_(usernames), ProposalData.payload_hash.isnot(None)).order_by(
+            ProposalData.user_id, ProposalData.sheet_id, ProposalData.version
+        )
+        records = [tuple(record) for record in query.yield_per(1000)]
+    
+    def result_key(sheet_id: str, blob_hash: str) -> str:
+        return f"{sheet_id}\t{blob_hash}"
+    
+    results = {}
+    pending = {}
+    for _, sheet_id, _, blob_hash in records:
+        key = result_key(sheet_id, blob_hash)
+        if key in cached:
+            results[key] = dict(cached[key], skipped=True)
+        else:
+            pending.setdefault(blob_hash, set()).add(sheet_id)
+    
+    if pending:
+        hashes = list(pending)
+        workers = min(max_workers or os.cpu_count() or 1, max(len(hashes) // batch_size + 1, 1))
         
-        # Fill each sheet
-        for sheet_name, sheet_data in stored_data.items():
-            if sheet_name in wb.sheetnames:
-                ws = wb[sheet_name]
-                
-                # Get the latest version data
-                data_to_fill = sheet_data.get('base', {})
-                if '2025 KIF Version' in sheet_data:
-                    data_to_fill.update(sheet_data['2025 KIF Version'])
-                
-                # Fill cells based on stored data
-                for cell_ref, value in data_to_fill.items():
-                    if re.match(r'^[A-Z]+\d+$', cell_ref):  # Valid cell reference
-                        try:
-                            cell = ws[cell_ref]
-                            # Preserve formulas
-                            if not (isinstance(cell.value, str) and cell.value.startswith('=')):
-                                # Handle different data types
-                                if isinstance(value, (int, float)):
-                                    cell.value = value
-                                elif isinstance(value, str):
-                                    # Handle date format
-                                    if re.match(r'\d{4}\.\d{2}\.\d{2}', value):
-                                        cell.value = value
-                                    else:
-                                        cell.value = value
-                                elif value is not None:
-                                    cell.value = str(value)
-                        except Exception as e:
-                            continue
-                
-                # Special handling for specific sheets
-                if sheet_name == "1-2.재무실적":
-                    # Fill financial data with proper formatting
-                    financial_fields = {
-                        'B8': '유동자산', 'C8': '비유동자산', 'D8': '자산총계',
-                        'B9': '유동부채', 'C9': '비유동부채', 'D9': '부채총계',
-                        'B10': '자본금', 'C10': '자본잉여금', 'D10': '자본총계',
-                        'B11': '매출액', 'C11': '영업이익', 'D11': '당기순이익'
+        def collect(done):
+            for future in done:
+                for sheet_id, blob_hash, errors, seconds in future.result():
+                    results[result_key(sheet_id, blob_hash)] = {
+                        'errors': errors, 'seconds': round(seconds, 4), 'skipped': False
                     }
-                    
-                    for cell_ref, field_name in financial_fields.items():
-                        if field_name in data_to_fill:
-                            ws[cell_ref] = data_to_fill[field_name]
-        
-        # Save workbook
-        wb.save(output_path)
-        wb.close()
         
-        return output_path
-        
-    except Exception as e:
-        st.error(f"Excel 생성 오류: {str(e)}")
-        if output_path and os.path.exists(output_path):
-            os.remove(output_path)
-        return None
+        # At most two batches per worker are read and in flight, so payloads stream through
+        with ProcessPoolExecutor(max_workers=workers) as executor, SessionLocal() as session:
+            in_flight = set()
+            for start in range(0, len(hashes), batch_size):
+                if len(in_flight) >= 2 * workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                batch = []
+                for blob_hash, data_format, data_json, data_blob in session.query(
+                    PayloadBlob.hash, PayloadBlob.data_format, PayloadBlob.data_json, PayloadBlob.data_blob
+                ).filter(PayloadBlob.hash.in_(hashes[start:start + batch_size])):
+                    batch += [(sheet_id, blob_hash, data_format, data_json, data_blob)
+                              for sheet_id in sorted(pending[blob_hash])]
+                in_flight.add(executor.submit(_validate_record_batch, batch))
+            collect(wait(in_flight).done)
+    
+    changed_users = {user_id for user_id, sheet_id, _, blob_hash in records
+                     if not results[result_key(sheet_id, blob_hash)]['skipped']}
+    records_by_user = {}
+    for user_id, sheet_id, version, blob_hash in records:
+        records_by_user.setdefault(user_id, []).append(
+            {'sheet_id': sheet_id, 'version': version, **results[result_key(sheet_id, blob_hash)]}
+        )
+    report_users = []
+    for user_id, username in usernames.items():
+        sheets = records_by_user.get(user_id, [])
+        violations = check_vault(user_id) if user_id in changed_users else get_violations(user_id)
+        report_users.append({
+            'user_id': user_id,
+            'username': username,
+            'records': sheets,
+            'cross_sheet': [
+                {'version': v['version'], 'rule': v['rule'], 'sheets': v['sheets'], 'message': v['message']}
+                for v in violations
+            ]
+        })
+    
+    checked = [r for user in report_users for r in user['records']]
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'rules': fingerprint,
+        'seconds': round(time.perf_counter() - started, 3),
+        'summary': {
+            'users': len(report_users),
+            'records': len(checked),
+            'validated': len([r for r in checked if not r['skipped']]),
+            'skipped': len([r for r in checked if r['skipped']]),
+            'records_with_errors': len([r for r in checked if r['errors']]),
+            'cross_sheet_violations': sum(len(user['cross_sheet']) for user in report_users)
+        },
+        'users': report_users,
+        'cache': {
+            'rules': fingerprint,
+            'results': {key: {'errors': value['errors'], 'seconds': value['seconds']} for key, value in results.items()}
+        }
+    }
 
-def validate_input(data: Dict, sheet_id: str) -> List[str]:
-    """Validate input data based on 2025 KIF requirements"""
-    errors = []
+# Fund performance metrics (2-x sheets)
+FUND_METRIC_SHEETS = ("2-1.청산펀드 총괄", "2-2.운용중인 펀드 총괄", "2-3.KIF 펀드 운용실적")
+FUND_FLOW_COLUMNS = ('펀드명', '일자', '출자금액', '분배금액', '잔존가치')
+FUND_METRIC_COLUMNS = ('펀드명', '납입금액', '분배금액', '잔존가치', 'IRR', 'TVPI', 'DPI')
+FUND_TOTAL_LABEL = '합계'
+FUND_METRIC_KEY = re.compile(r'^(?:' + '|'.join(FUND_METRIC_COLUMNS) + r')_(\d+)$')
+
+def solve_irr(cash_flows: np.ndarray, years: np.ndarray, tol: float = 1e-10, max_iter: int = 100) -> np.ndarray:
+    """Annual IRR of every row of cash_flows at once (NaN where there is no root)
     
-    # KIF-specific validation rules
-    for field, value in data.items():
-        # No empty cells rule (KIF requirement)
-        if value is None or str(value).strip() == "":
-            errors.append(f"{field}: 빈 셀 불허 (0 또는 해당 데이터 입력 필수)")
-        
-        # Date format validation (YYYY-MM-DD for KIF)
-        if any(keyword in field for keyword in ['일자', '날짜', '기간', '년도']):
-            if value and not re.match(r'^\d{4}-\d{2}-\d{2}$', str(value)):
-                errors.append(f"{field}: KIF 날짜 형식은 YYYY-MM-DD")
-        
-        # Percentage validation (첫째 자리까지)
-        if '비율' in field or '%' in field or 'IRR' in field:
-            if value:
-                try:
-                    float_val = float(str(value).replace('%', ''))
-                    if abs(float_val - round(float_val, 1)) > 0.01:
-                        errors.append(f"{field}: 퍼센트는 소수점 첫째 자리까지만 입력")
-                except ValueError:
-                    errors.append(f"{field}: 유효한 퍼센트 값이 아님")
-        
-        # Amount validation (정확한 금액 필요)
-        if any(keyword in field for keyword in ['금액', '규모', '자산', '자본', '매출', '투자']):
-            if value and value != 0:
-                try:
-                    float(str(value).replace(',', ''))
-                except ValueError:
-                    errors.append(f"{field}: 유효한 금액이 아님")
-        
-        # Company/Fund name validation (정식 명칭)
-        if any(keyword in field for keyword in ['회사명', '펀드명', '법인명']):
-            if value and len(str(value)) < 2:
-                errors.append(f"{field}: 정식 명칭 입력 필요")
-    
-    # Sheet-specific KIF validations
-    if sheet_id == "1-2.재무실적":
-        # Financial data completeness check
-        required_financial = ['자산', '부채', '자본', '매출']
-        for req_field in required_financial:
-            if not any(req_field in key for key in data.keys()):
-                errors.append(f"재무실적: {req_field} 데이터 필수")
-    
-    elif sheet_id == "1-4.핵심운용인력 관리현황":
-        # Core personnel requirements
-        if not any('대표' in str(value) or 'CEO' in str(value) for value in data.values()):
-            errors.append("핵심운용인력: 대표이사/CEO 정보 필수")
-        
-        # Career length validation
-        for key, value in data.items():
-            if '경력' in key and value:
-                try:
-                    career_years = float(value)
-                    if career_years < 0 or career_years > 50:
-                        errors.append(f"{key}: 경력년수는 0-50년 범위")
-                except ValueError:
-                    pass
-    
-    elif sheet_id == "2-3.KIF 펀드 운용실적":
-        # KIF fund performance requirements
-        required_metrics = ['수익률', 'IRR', 'TVPI']
-        for metric in required_metrics:
-            if not any(metric in key for key in data.keys()):
-                errors.append(f"KIF 펀드 실적: {metric} 데이터 필수")
-    
-    elif sheet_id == "1-3.준법성":
-        # Compliance requirements
-        if not any('리스크' in key or '컴플라이언스' in key for key in data.keys()):
-            errors.append("준법성: 리스크 관리 체계 정보 필수")
+    years holds the time of each flow in years since the row's first flow;
+    padding cells are zero flows. Newton steps are taken while they stay
+    inside a per-row bracket that shrinks every iteration, and bisection is
+    used otherwise, so rows with awkward flows still converge.
+    """
+    cash_flows = np.asarray(cash_flows, dtype=float)
+    years = np.asarray(years, dtype=float)
     
-    # A4 print requirement warning
-    if len(str(data)) > 10000:  # Rough estimate
-        errors.append("주의: 데이터가 A4 인쇄 크기를 초과할 수 있음")
+    def npv(rate: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        values = cash_flows * np.exp(-years * np.log1p(rate)[:, None])
+        return values.sum(axis=1), -(years * values).sum(axis=1) / (1.0 + rate)
     
-    return errors
+    low = np.full(len(cash_flows), -0.9999)
+    high = np.full(len(cash_flows), 10.0)
+    with np.errstate(all='ignore'):
+        low_sign = np.sign(npv(low)[0])
+        solvable = low_sign * np.sign(npv(high)[0]) < 0
+        rate = np.where(solvable, 0.1, np.nan)
+        for _ in range(max_iter):
+            value, slope = npv(rate)
+            below = np.sign(value) == low_sign
+            low = np.where(below, rate, low)
+            high = np.where(below, high, rate)
+            newton = rate - value / slope
+            inside = np.isfinite(newton) & (newton > low) & (newton < high)
+            step = np.where(value == 0, rate, np.where(inside, newton, (low + high) / 2))
+            converged = ~solvable | (np.abs(step - rate) < tol)
+            rate = step
+            if converged.all():
+                break
+    return np.where(solvable, rate, np.nan)
+
+def compute_fund_metrics(flows: pd.DataFrame) -> pd.DataFrame:
+    """IRR (%), TVPI and DPI per fund from dated cash flows, plus a pooled total row
+    
+    flows has FUND_FLOW_COLUMNS: paid-in capital (출자금액), distributions
+    (분배금액) and the residual value (잔존가치, entered on the valuation
+    date row). Every fund's flows go into one padded matrix, so all IRRs
+    are solved together; the last row (FUND_TOTAL_LABEL) pools every fund.
+    Input rows already labelled FUND_TOTAL_LABEL are sheet totals and are
+    dropped rather than pooled a second time.
+    """
+    missing = [column for column in FUND_FLOW_COLUMNS if column not in flows.columns]
+    if missing:
+        raise ValueError(f"현금흐름 컬럼 누락: {', '.join(missing)}")
+    
+    frame = pd.DataFrame({
+        'fund': flows['펀드명'].astype(str).str.strip(),
+        'date': pd.to_datetime(flows['일자'], errors='coerce'),
+        **{column: pd.to_numeric(flows[column].astype(str).str.replace(',', ''), errors='coerce').fillna(0.0)
+           for column in FUND_FLOW_COLUMNS[2:]}
+    })
+    invalid = frame['date'].isna() | (frame['fund'] == '')
+    if invalid.any():
+        raise ValueError(f"펀드명 또는 일자가 올바르지 않은 행: {', '.join(str(i + 1) for i in np.flatnonzero(invalid)[:10])}")
+    frame = frame[frame['fund'].str.replace(r'\s+', '', regex=True) != FUND_TOTAL_LABEL]
+    if frame.empty:
+        return pd.DataFrame(columns=list(FUND_METRIC_COLUMNS))
+    
+    # Flows on the same day are summed, which keeps the pooled series as short as the longest fund.
+    # The pooled series is keyed by '', which no fund can have (blank names are rejected above)
+    frame = pd.concat([frame, frame.assign(fund='')], ignore_index=True)
+    frame = frame.groupby(['fund', 'date'], sort=False, as_index=False)[list(FUND_FLOW_COLUMNS[2:])].sum()
+    frame['net'] = frame['분배금액'] - frame['출자금액'] + frame['잔존가치']
+    frame['years'] = (frame['date'] - frame.groupby('fund')['date'].transform('min')).dt.days / 365.0
+    codes, funds = pd.factorize(frame['fund'])
+    positions = frame.groupby(codes).cumcount().to_numpy()
+    
+    cash_flows = np.zeros((len(funds), positions.max() + 1))
+    years = np.zeros_like(cash_flows)
+    cash_flows[codes, positions] = frame['net'].to_numpy()
+    years[codes, positions] = frame['years'].to_numpy()
+    
+    totals = frame.groupby(codes)[['출자금액', '분배금액', '잔존가치']].sum()
+    paid_in = totals['출자금액'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tvpi = np.where(paid_in > 0, (totals['분배금액'].to_numpy() + totals['잔존가치'].to_numpy()) / paid_in, np.nan)
+        dpi = np.where(paid_in > 0, totals['분배금액'].to_numpy() / paid_in, np.nan)
+    
+    return pd.DataFrame({
+        '펀드명': funds.where(funds != '', FUND_TOTAL_LABEL),
+        '납입금액': paid_in,
+        '분배금액': totals['분배금액'].to_numpy(),
+        '잔존가치': totals['잔존가치'].to_numpy(),
+        'IRR': np.round(solve_irr(cash_flows, years) * 100, 1),
+        'TVPI': np.round(tvpi, 2),
+        'DPI': np.round(dpi, 2)
+    })
+
+def save_fund_metrics(user_id: int, sheet_id: str, metrics: pd.DataFrame, version: str = 'base') -> int:
+    """Write compute_fund_metrics() results into a 2-x sheet; returns the number of fields changed
+    
+    Each fund becomes indexed keys (펀드명_0, IRR_0, ...) and the pooled row
+    the sheet-level IRR/TVPI/DPI. Indexed keys of funds no longer listed
+    are removed; other fields of the sheet are left alone.
+    """
+    if sheet_id not in FUND_METRIC_SHEETS:
+        raise ValueError(f"성과 지표를 저장할 수 없는 시트: {sheet_id}")
+    
+    def plain(value: Any) -> Any:
+        return None if isinstance(value, float) and np.isnan(value) else value
+    
+    records = metrics.to_dict('records')
+    funds = [record for record in records if record['펀드명'] != FUND_TOTAL_LABEL]
+    changes = {f"{column}_{i}": plain(record[column]) for i, record in enumerate(funds) for column in FUND_METRIC_COLUMNS}
+    for record in records:
+        if record['펀드명'] == FUND_TOTAL_LABEL:
+            changes.update({column: plain(record[column]) for column in ('IRR', 'TVPI', 'DPI')})
+    
+    stored = load_stored_data(user_id, sheets=[sheet_id], versions=[version]).get(sheet_id, {}).get(version, {})
+    indexed = {key: FUND_METRIC_KEY.match(str(key)) for key in stored}
+    removed = [key for key, match in indexed.items() if match and int(match.group(1)) >= len(funds)]
+    return patch_data(user_id, sheet_id, changes, removed, version)
+
+# Portfolio analytics (admin view)
+ADMIN_USERNAMES = {name.strip() for name in os.environ.get('ADMIN_USERNAMES', '').split(',') if name.strip()}
+PORTFOLIO_CHUNK_SIZE = int(os.environ.get('PORTFOLIO_CHUNK_SIZE', '5000'))
+
+def is_admin(username: Optional[str]) -> bool:
+    return bool(username) and username in ADMIN_USERNAMES
+
+def _portfolio_chunk_metrics(session: Session, chunk: pd.DataFrame, error_counts: Dict[Tuple[str, str], int]) -> pd.DataFrame:
+    """Per (user_id, version) sums of one chunk of proposal_data records
+    
+    Payloads not seen in an earlier chunk are decoded and validated here,
+    one chunk at a time; only their error counts are kept.
+    """
+    keys = chunk[['sheet_id', 'payload_hash']].drop_duplicates()
+    unseen = [key for key in keys.itertuples(index=False, name=None) if key not in error_counts]
+    if unseen:
+        sheets_by_hash = {}
+        for sheet_id, blob_hash in unseen:
+            sheets_by_hash.setdefault(blob_hash, []).append(sheet_id)
+        batch = [
+            (sheet_id, blob_hash, data_format, data_json, data_blob)
+            for blob_hash, data_format, data_json, data_blob in session.query(
+                PayloadBlob.hash, PayloadBlob.data_format, PayloadBlob.data_json, PayloadBlob.data_blob
+            ).filter(PayloadBlob.hash.in_(sheets_by_hash))
+            for sheet_id in sheets_by_hash[blob_hash]
+        ]
+        for sheet_id, blob_hash, errors, _ in _validate_record_batch(batch):
+            error_counts[(sheet_id, blob_hash)] = len(errors)
+    
+    lookup = pd.Series({key: error_counts.get(key, 0) for key in keys.itertuples(index=False, name=None)}, dtype='int64')
+    field_errors = lookup.reindex(pd.MultiIndex.from_frame(chunk[['sheet_id', 'payload_hash']])).to_numpy()
+    chunk = chunk.assign(
+        filled_sheet=chunk['filled'] > 0,
+        field_errors=field_errors,
+        has_errors=field_errors > 0
+    )
+    return chunk.groupby(['user_id', 'version']).agg(
+        sheets=('sheet_id', 'size'),
+        filled_sheets=('filled_sheet', 'sum'),
+        filled_fields=('filled', 'sum'),
+        records_with_errors=('has_errors', 'sum'),
+        field_errors=('field_errors', 'sum'),
+        last_updated=('updated_at', 'max')
+    )
+
+def compute_portfolio_summary(chunk_size: int = PORTFOLIO_CHUNK_SIZE) -> int:
+    """Rebuild portfolio_summary from every vault; returns the number of (user, version) rows
+    
+    proposal_data is read in keyset chunks of chunk_size records joined to
+    their template-independent sheet_completeness row, so filled counts come
+    from the index and only the payloads of a chunk are held at once (each
+    distinct (sheet, payload) is validated once per run). Chunk metrics are
+    aggregated with pandas and the summary is replaced in one transaction.
+    """
+    columns = ['id', 'user_id', 'sheet_id', 'version', 'payload_hash', 'updated_at', 'filled']
+    error_counts = {}
+    partials = []
+    with SessionLocal() as session:
+        last_id = 0
+        while True:
+            rows = session.query(
+                ProposalData.id, ProposalData.user_id, ProposalData.sheet_id, ProposalData.version,
+                ProposalData.payload_hash, ProposalData.updated_at, func.coalesce(SheetCompleteness.filled, 0)
+            ).outerjoin(SheetCompleteness, (SheetCompleteness.user_id == ProposalData.user_id) &
+                        (SheetCompleteness.template_id == '') &
+                        (SheetCompleteness.sheet_id == ProposalData.sheet_id) &
+                        (SheetCompleteness.version == ProposalData.version)).filter(
+                ProposalData.id > last_id, ProposalData.payload_hash.isnot(None)
+            ).order_by(ProposalData.id).limit(chunk_size).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            partials.append(_portfolio_chunk_metrics(session, pd.DataFrame(rows, columns=columns), error_counts))
+        
+        violations = pd.DataFrame(
+            session.query(
+                ValidationViolation.user_id, ValidationViolation.version, func.count(ValidationViolation.id)
+            ).group_by(ValidationViolation.user_id, ValidationViolation.version).all(),
+            columns=['user_id', 'version', 'cross_sheet_violations']
+        ).set_index(['user_id', 'version'])
+        
+        if partials:
+            # A (user, version) can span chunks: sums add up, last_updated takes the max
+            summary = pd.concat(partials).groupby(level=['user_id', 'version']).agg({
+                'sheets': 'sum', 'filled_sheets': 'sum', 'filled_fields': 'sum',
+                'records_with_errors': 'sum', 'field_errors': 'sum', 'last_updated': 'max'
+            })
+            summary['completion'] = (summary['filled_sheets'] / len(SHEET_CONFIG)).round(4)
+            summary['cross_sheet_violations'] = violations['cross_sheet_violations'].reindex(summary.index, fill_value=0)
+            summary['computed_at'] = datetime.now()
+            records = summary.reset_index().to_dict('records')
+        else:
+            records = []
+        
+        session.query(PortfolioSummary).delete()
+        if records:
+            session.execute(PortfolioSummary.__table__.insert(), records)
+        session.commit()
+    return len(records)
+
+def get_portfolio_summary() -> pd.DataFrame:
+    """Rows of portfolio_summary with the owner's username and firm, least complete first"""
+    with SessionLocal() as session:
+        rows = session.query(
+            User.username, User.firm_name, PortfolioSummary.version, PortfolioSummary.sheets,
+            PortfolioSummary.filled_sheets, PortfolioSummary.filled_fields, PortfolioSummary.completion,
+            PortfolioSummary.records_with_errors, PortfolioSummary.field_errors,
+            PortfolioSummary.cross_sheet_violations, PortfolioSummary.last_updated, PortfolioSummary.computed_at
+        ).join(User, User.id == PortfolioSummary.user_id).order_by(
+            PortfolioSummary.completion, User.username, PortfolioSummary.version
+        ).all()
+    return pd.DataFrame(rows, columns=[
+        'username', 'firm_name', 'version', 'sheets', 'filled_sheets', 'filled_fields', 'completion',
+        'records_with_errors', 'field_errors', 'cross_sheet_violations', 'last_updated', 'computed_at'
+    ])
 
 # Streamlit UI Components
 def init_session_state():
@@ -614,6 +4059,10 @@ def init_session_state():
         st.session_state.rfp_info = {}
     if 'template_structure' not in st.session_state:
         st.session_state.template_structure = {}
+    if 'template_id' not in st.session_state:
+        st.session_state.template_id = ''
+    if 'validation_results' not in st.session_state:
+        st.session_state.validation_results = {}
 
 def login_page():
     """Display login page"""
@@ -697,12 +4146,20 @@ def sidebar_menu():
             key="template_uploader"
         )
         
+        # The uploader keeps its file across reruns; parse and register only a new upload
         if template_file:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-                tmp_file.write(template_file.read())
-                st.session_state.uploaded_template = tmp_file.name
-                st.session_state.template_structure = parse_excel_template(tmp_file.name)
-                st.success("템플릿 파싱 완료")
+            content = template_file.getvalue()
+            upload_hash = hashlib.sha256(content).hexdigest()
+            if st.session_state.get('template_upload_hash') != upload_hash:
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
+                    tmp_file.write(content)
+                    st.session_state.uploaded_template = tmp_file.name
+                    st.session_state.template_structure = parse_excel_template(tmp_file.name)
+                    st.session_state.template_id = register_template(
+                        st.session_state.user_id, st.session_state.template_structure
+                    )
+                st.session_state.template_upload_hash = upload_hash
+            st.success("템플릿 파싱 완료")
         
         st.divider()
         
@@ -715,8 +4172,8 @@ def data_vault_tab():
     """Display data vault dashboard"""
     st.header("📊 데이터 보관소")
     
-    # Load stored data
-    stored_data = load_stored_data(st.session_state.user_id)
+    # Precomputed filled counts (no payloads are read)
+    completeness = get_completeness(st.session_state.user_id)
     
     # Create status overview
     col1, col2, col3 = st.columns(3)
@@ -726,8 +4183,8 @@ def data_vault_tab():
     missing_sheets = []
     
     for sheet_name in SHEET_CONFIG.keys():
-        if sheet_name in stored_data and stored_data[sheet_name]:
-            if any(stored_data[sheet_name].values()):
+        if completeness.get(sheet_name):
+            if any(counts['filled'] for counts in completeness[sheet_name].values()):
                 available_sheets.append(sheet_name)
             else:
                 partial_sheets.append(sheet_name)
@@ -770,6 +4227,58 @@ def data_vault_tab():
                 with col3:
                     if st.button("편집", key=f"edit_{sheet}"):
                         st.session_state.editing_sheet = sheet
+    
+    # Bulk import
+    with st.expander("📥 데이터 가져오기 (JSON)", expanded=False):
+        st.caption('형식: {"시트명": {"필드": 값, ...}, ...}')
+        import_file = st.file_uploader("JSON 파일", type=['json'], key="vault_import_file")
+        import_version = st.text_input("저장할 버전", value="base", key="vault_import_version")
+        
+        if import_file and st.button("가져오기", key="vault_import_btn"):
+            try:
+                imported = json.loads(import_file.getvalue().decode('utf-8'))
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                st.error(f"JSON 파싱 오류: {str(e)}")
+            else:
+                show_bulk_results(import_vault_data(st.session_state.user_id, imported, import_version))
+    
+    # Field search across sheets and versions
+    with st.expander("🔎 필드 검색", expanded=False):
+        field_key = st.text_input("필드명", placeholder="예: IRR, 매출액_2023년", key="vault_field_key")
+        if field_key:
+            matches = query_field_values(st.session_state.user_id, field_key)
+            if matches:
+                st.dataframe(pd.DataFrame([
+                    {'시트': m['sheet_id'], '버전': m['version'], '값': str(m['value']), '수정일': m['updated_at']}
+                    for m in matches
+                ]), use_container_width=True)
+            else:
+                st.info("해당 필드가 저장된 시트가 없습니다")
+    
+    # Cross-sheet consistency (kept up to date on every save)
+    with st.expander("🧩 시트 간 정합성", expanded=False):
+        if st.button("전체 검사", key="vault_check_btn"):
+            started = time.perf_counter()
+            violations = check_vault(st.session_state.user_id)
+            st.caption(f"{len(CROSS_SHEET_RULES)}개 규칙 검사 완료 ({time.perf_counter() - started:.2f}초)")
+        else:
+            violations = get_violations(st.session_state.user_id)
+        
+        if violations:
+            for violation in violations:
+                st.warning(f"[{violation['version']}] {violation['message']}")
+        else:
+            st.success("시트 간 불일치가 없습니다")
+
+def show_bulk_results(results: List[Dict[str, Any]]):
+    """Summarize per-entry results of a bulk write"""
+    saved = [r for r in results if r['status'] == 'saved']
+    failed = [r for r in results if r['status'] != 'saved']
+    
+    if saved:
+        st.success(f"{len(saved)}개 시트 저장 완료")
+    for result in failed:
+        st.error(f"{result['sheet_id']} ({result['version']}): {result['error']}")
 
 def input_forms_tab():
     """Display input forms for data entry"""
@@ -785,8 +4294,8 @@ def input_forms_tab():
     if sheet_to_edit:
         st.subheader(f"📝 {sheet_to_edit}")
         
-        # Load existing data
-        stored_data = load_stored_data(st.session_state.user_id)
+        # Load existing data (only this sheet's base version)
+        stored_data = load_stored_data(st.session_state.user_id, sheets=[sheet_to_edit], versions=['base'])
         existing_data = stored_data.get(sheet_to_edit, {}).get('base', {})
         
         # Create dynamic form based on sheet type
@@ -904,17 +4413,57 @@ def input_forms_tab():
             submitted = st.form_submit_button("💾 저장", use_container_width=True)
             
             if submitted:
-                # Validate input
-                errors = validate_input(form_data, sheet_to_edit)
+                # Validate input (only fields changed since the last validation are re-checked)
+                previous = st.session_state.validation_results.get(sheet_to_edit)
+                result = validate_sheet(form_data, sheet_to_edit, *(previous or (None, None)))
+                st.session_state.validation_results[sheet_to_edit] = (form_data, result)
                 
-                if errors:
-                    for error in errors:
-                        st.error(error)
+                if result['errors']:
+                    for messages in result['field_errors'].values():
+                        st.error("\n\n".join(messages))
+                    for messages in result['sheet_errors'].values():
+                        for message in messages:
+                            st.error(message)
                 else:
-                    # Save to database
-                    update_data(st.session_state.user_id, sheet_to_edit, form_data, version)
+                    # Save to database (only changed fields when editing the loaded base data)
+                    if version == 'base':
+                        changes = {
+                            key: value for key, value in form_data.items()
+                            if key not in existing_data or existing_data[key] != value
+                        }
+                        removed = [key for key in existing_data if key not in form_data]
+                        patch_data(st.session_state.user_id, sheet_to_edit, changes, removed, version)
+                    else:
+                        update_data(st.session_state.user_id, sheet_to_edit, form_data, version)
                     st.success(f"{sheet_to_edit} 데이터 저장 완료!")
                     st.balloons()
+        
+        if sheet_to_edit in FUND_METRIC_SHEETS:
+            fund_metrics_panel(sheet_to_edit)
+
+def fund_metrics_panel(sheet_id: str):
+    """Compute IRR/TVPI/DPI from an uploaded cash-flow file and save them to a 2-x sheet"""
+    with st.expander("📈 IRR / TVPI / DPI 계산", expanded=False):
+        st.caption(f"컬럼: {', '.join(FUND_FLOW_COLUMNS)} (잔존가치는 평가기준일 행에 한 번 입력)")
+        flow_file = st.file_uploader("펀드별 현금흐름 (CSV/Excel)", type=['csv', 'xlsx'], key=f"fund_flows_{sheet_id}")
+        if not flow_file:
+            return
+        
+        try:
+            flows = pd.read_csv(flow_file) if flow_file.name.endswith('.csv') else pd.read_excel(flow_file)
+            metrics = compute_fund_metrics(flows)
+        except ValueError as e:
+            st.error(str(e))
+            return
+        
+        st.dataframe(metrics, use_container_width=True, hide_index=True)
+        unsolved = metrics.loc[metrics['IRR'].isna(), '펀드명'].tolist()
+        if unsolved:
+            st.warning(f"IRR을 계산할 수 없는 펀드 (납입/분배 부호 변화 없음): {', '.join(unsolved)}")
+        
+        if st.button("💾 성과 지표 저장 (base)", key=f"save_fund_metrics_{sheet_id}"):
+            changed = save_fund_metrics(st.session_state.user_id, sheet_id, metrics)
+            st.success(f"{sheet_id}: {changed}개 항목 저장 완료")
 
 def analysis_tab():
     """Display analysis and suggestions"""
@@ -924,12 +4473,17 @@ def analysis_tab():
         st.warning("먼저 RFP PDF와 Excel 템플릿을 업로드해주세요.")
         return
     
-    # Load and analyze data
-    stored_data = load_stored_data(st.session_state.user_id)
+    # 3-1 career periods decide the experience requirements in both sections below
+    careers = None
+    if st.session_state.rfp_info and st.session_state.rfp_info.get('core_personnel_requirements'):
+        careers = check_career_requirements(st.session_state.user_id, st.session_state.rfp_info, versions=['base'])
+    
+    # Analyze precomputed completeness of the base version against the template
     comparison = compare_data(
-        stored_data, 
+        get_completeness(st.session_state.user_id, st.session_state.template_id, version='base'),
         st.session_state.rfp_info,
-        st.session_state.template_structure
+        get_field_index(st.session_state.user_id, st.session_state.template_structure, st.session_state.template_id),
+        careers
     )
     
     # Display RFP requirements
@@ -1021,6 +4575,33 @@ def analysis_tab():
     
     st.divider()
     
+    # RFP requirements resolved against template and vault fields
+    if comparison['findings']:
+        st.subheader("🧭 RFP 요건 대응 현황")
+        status_icons = {'ok': "✅", 'gap': "⚠️", 'missing': "❌"}
+        st.dataframe(pd.DataFrame([
+            {'상태': status_icons[f['status']], '요건': f['label'], '시트': f['sheet_id'] or '-',
+             '필드': f['field'] or '-', '내용': f['message']}
+            for f in comparison['findings']
+        ]), use_container_width=True)
+    
+    # Dated 3-1 career periods against the core personnel requirements
+    if careers is not None:
+        if careers['people']:
+            st.subheader(f"👥 핵심운용인력 경력기간 (공고일 {careers['as_of']} 기준)")
+            summary = careers['versions']['base']
+            if summary['minimum_count'] is not None:
+                message = f"요건 충족 인력 {summary['qualified']}명 / 최소 {summary['minimum_count']:g}명"
+                (st.success if summary['status'] == 'ok' else st.error)(message)
+            for invalid in careers['invalid']:
+                st.warning(f"읽을 수 없는 경력기간 (미반영): {invalid['name']} '{invalid['period']}'")
+            st.dataframe(pd.DataFrame([
+                {'상태': "✅" if p['status'] == 'ok' else "⚠️", '성명': p['name'],
+                 '구분': "대표펀드매니저" if p['lead'] else "핵심운용인력", '인정 경력(년)': p['years'],
+                 '요건(년)': p['required']}
+                for p in careers['people']
+            ]), use_container_width=True, hide_index=True)
+    
     # Display suggestions
     if comparison['suggestions']:
         st.subheader("💡 개선 제안")
@@ -1048,14 +4629,14 @@ def generation_tab():
         st.warning("먼저 Excel 템플릿을 업로드해주세요.")
         return
     
-    # Load stored data
-    stored_data = load_stored_data(st.session_state.user_id)
+    # Which sheets exist (no payloads are read until generation is requested)
+    stored_sheets = load_stored_data(st.session_state.user_id, keys=[])
     
     # Data summary
     st.subheader("📊 데이터 요약")
     
     total_sheets = len(SHEET_CONFIG)
-    filled_sheets = len([s for s in stored_data.keys() if s in SHEET_CONFIG])
+    filled_sheets = len([s for s in stored_sheets.keys() if s in SHEET_CONFIG])
     
     col1, col2, col3 = st.columns(3)
     
@@ -1086,12 +4667,12 @@ def generation_tab():
     
     # Preview section
     with st.expander("👁️ 데이터 미리보기", expanded=False):
+        preview = preview_stored_data(st.session_state.user_id, 'base', limit=5)  # Show first 5 items
         for sheet_name in SHEET_CONFIG.keys():
-            if sheet_name in stored_data:
+            if sheet_name in stored_sheets:
                 st.markdown(f"**{sheet_name}**")
-                sheet_data = stored_data[sheet_name].get('base', {})
-                if sheet_data:
-                    preview_data = dict(list(sheet_data.items())[:5])  # Show first 5 items
+                preview_data = preview.get(sheet_name, {})
+                if preview_data:
                     for key, value in preview_data.items():
                         st.text(f"  {key}: {value}")
                 else:
@@ -1101,74 +4682,200 @@ def generation_tab():
     
     # Generate button
     if st.button("🚀 Excel 제안서 생성", type="primary", use_container_width=True):
-        with st.spinner("제안서 생성 중..."):
-            # Generate Excel
-            output_path = generate_filled_excel(
-                st.session_state.uploaded_template,
-                stored_data
-            )
-            
-            if output_path and os.path.exists(output_path):
-                # Read file for download
-                with open(output_path, 'rb') as f:
-                    file_data = f.read()
-                
-                # Create download button
+        st.session_state.generation_job_id = submit_generation_job(
+            st.session_state.user_id,
+            st.session_state.uploaded_template,
+            load_stored_data(st.session_state.user_id),
+            version=None if version_to_use == "최신 버전 자동 선택" else version_to_use,
+            field_maps={
+                sheet: info['field_map']
+                for sheet, info in st.session_state.template_structure.items()
+                if 'field_map' in info
+            }
+        )
+    
+    # Job progress (state lives in the database, so it survives reruns)
+    job_id = st.session_state.get('generation_job_id')
+    job = get_generation_job(job_id) if job_id else get_latest_generation_job(st.session_state.user_id)
+    
+    if job:
+        if job['status'] in ('queued', 'running'):
+            total = max(job['total_sheets'], 1)
+            progress_text = f"제안서 생성 중... ({job['completed_sheets']}/{job['total_sheets']} 시트)"
+            if job['current_sheet']:
+                progress_text += f" - {job['current_sheet']}"
+            st.progress(min(job['completed_sheets'] / total, 1.0), text=progress_text)
+            st.button("🔄 진행 상황 새로고침", key="refresh_generation_job")
+        
+        elif job['status'] == 'done':
+            # The session only keeps the job id; the file is read from the artifact store
+            artifact = get_artifact(job['artifact_token']) if job['artifact_token'] else None
+            if artifact:
                 st.success("✅ 제안서 생성 완료!")
-                
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                st.download_button(
-                    label="📥 다운로드",
-                    data=file_data,
-                    file_name=f"KIF_제안서_{st.session_state.firm_name}_{timestamp}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-                
-                # Clean up temp file
-                os.remove(output_path)
-                
-                # Show completion message
-                st.balloons()
+                if artifact['url']:
+                    st.link_button("📥 다운로드", artifact['url'])
+                else:
+                    with open(artifact['path'], 'rb') as f:
+                        st.download_button(
+                            label="📥 다운로드",
+                            data=f.read(),
+                            file_name=artifact['filename'],
+                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                        )
+                st.caption(f"{artifact['filename']} · {artifact['size'] / 1024:.0f} KB · "
+                           f"{artifact['expires_at'].strftime('%Y-%m-%d %H:%M')}까지 다운로드 가능")
                 st.info("생성된 파일을 다운로드하여 최종 검토 후 제출하세요.")
             else:
-                st.error("제안서 생성 실패. 데이터를 확인해주세요.")
+                st.warning("다운로드 기간이 만료되었습니다. 제안서를 다시 생성해주세요.")
+        
+        elif job['status'] == 'failed':
+            st.error(job['error'] or "제안서 생성 실패. 데이터를 확인해주세요.")
+
+def admin_tab():
+    """Portfolio-wide completeness and validation metrics (ADMIN_USERNAMES only)"""
+    st.header("🛡️ 포트폴리오 현황")
+    
+    if st.button("🔄 지표 재계산", key="portfolio_refresh_btn"):
+        with st.spinner("전체 보관소 지표 계산 중..."):
+            started = time.perf_counter()
+            count = compute_portfolio_summary()
+        st.success(f"{count}개 버전 집계 완료 ({time.perf_counter() - started:.1f}초)")
+    
+    summary = get_portfolio_summary()
+    if summary.empty:
+        st.info("집계된 지표가 없습니다. '지표 재계산'을 실행하거나 portfolio_analytics.py를 예약 실행하세요.")
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("운용사", summary['username'].nunique())
+    col2.metric("버전", len(summary))
+    col3.metric("평균 작성률", f"{summary['completion'].mean():.0%}")
+    col4.metric("오류 있는 시트", int(summary['records_with_errors'].sum()))
+    st.caption(f"마지막 집계: {summary['computed_at'].max():%Y-%m-%d %H:%M}")
+    
+    st.dataframe(
+        summary.drop(columns=['computed_at']).assign(completion=summary['completion'] * 100).rename(columns={
+            'username': '사용자', 'firm_name': '운용사', 'version': '버전', 'sheets': '시트',
+            'filled_sheets': '작성 시트', 'filled_fields': '작성 항목', 'completion': '작성률',
+            'records_with_errors': '오류 시트', 'field_errors': '항목 오류',
+            'cross_sheet_violations': '시트 간 불일치', 'last_updated': '최근 저장'
+        }),
+        use_container_width=True,
+        hide_index=True,
+        column_config={'작성률': st.column_config.ProgressColumn('작성률', min_value=0, max_value=100, format="%.0f%%")}
+    )
 
 def history_tab():
     """Display version history"""
     st.header("📜 버전 관리")
     
-    with SessionLocal() as session:
-        # Get all proposal data for user
-        all_data = session.query(ProposalData).filter_by(
-            user_id=st.session_state.user_id
-        ).order_by(ProposalData.updated_at.desc()).all()
-        
-        if all_data:
-            # Group by version
-            versions = {}
-            for record in all_data:
-                if record.version not in versions:
-                    versions[record.version] = []
-                versions[record.version].append(record)
+    user_id = st.session_state.user_id
+    summaries = get_version_summaries(user_id)
+    
+    if not summaries:
+        st.info("아직 저장된 데이터가 없습니다.")
+        return
+    
+    version_names = [summary['version'] for summary in summaries]
+    
+    # Copy a whole version
+    with st.expander("📋 버전 복사", expanded=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            source_version = st.selectbox("원본 버전", options=version_names, key="copy_source_version")
+        with col2:
+            target_version = st.text_input("새 버전 이름", key="copy_target_version")
+        
+        if st.button("복사", key="copy_version_btn"):
+            if not target_version or target_version == source_version:
+                st.error("원본과 다른 새 버전 이름을 입력해주세요")
+            else:
+                show_bulk_results(copy_version(user_id, source_version, target_version))
+    
+    # Revision history of one sheet
+    with st.expander("🕘 수정 이력 / 복원", expanded=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            history_version = st.selectbox("버전", options=version_names, key="history_version")
+        with col2:
+            history_sheets = load_stored_data(user_id, versions=[history_version], keys=[])
+            history_sheet = st.selectbox("시트", options=sorted(history_sheets), key="history_sheet")
+        
+        # Keyset paging over revision numbers; the stack holds the 'before' cursor of each page
+        position = (history_version, history_sheet)
+        if st.session_state.get('history_revision_position') != position:
+            st.session_state.history_revision_position = position
+            st.session_state.history_revision_pages = [None]
+        pages = st.session_state.history_revision_pages
+        
+        revisions = list_revisions(user_id, history_sheet, history_version, before=pages[-1], limit=HISTORY_PAGE_SIZE)
+        if revisions:
+            st.dataframe(pd.DataFrame([
+                {'리비전': r['revision'], '종류': '전체' if r['kind'] == 'snapshot' else '변경분',
+                 '저장 시각': r['created_at'], '크기(bytes)': r['size']}
+                for r in revisions
+            ]), use_container_width=True, hide_index=True)
             
-            # Display versions
-            for version_name, records in versions.items():
-                with st.expander(f"📌 {version_name}", expanded=(version_name == "base")):
-                    st.markdown(f"**시트 수**: {len(records)}")
-                    st.markdown(f"**최종 수정**: {max(r.updated_at for r in records).strftime('%Y-%m-%d %H:%M')}")
-                    
-                    # List sheets in this version
-                    for record in records[:5]:  # Show first 5
-                        col1, col2 = st.columns([3, 1])
-                        with col1:
-                            st.text(f"• {record.sheet_id}")
-                        with col2:
-                            st.caption(record.updated_at.strftime('%m/%d'))
-                    
-                    if len(records) > 5:
-                        st.caption(f"... 외 {len(records)-5}개 시트")
+            col1, col2 = st.columns(2)
+            with col1:
+                if len(pages) > 1 and st.button("◀ 최근 리비전", key="history_newer_btn"):
+                    pages.pop()
+                    st.rerun()
+            with col2:
+                if len(revisions) == HISTORY_PAGE_SIZE and st.button("이전 리비전 ▶", key="history_older_btn"):
+                    pages.append(revisions[-1]['revision'])
+                    st.rerun()
+            
+            selected_revision = st.selectbox(
+                "리비전 선택", options=[r['revision'] for r in revisions], key="history_revision"
+            )
+            st.json(get_revision_payload(user_id, history_sheet, history_version, selected_revision), expanded=False)
+            
+            if st.button("↩️ 이 리비전으로 복원", key="restore_revision_btn"):
+                restore_revision(user_id, history_sheet, history_version, selected_revision)
+                st.session_state.history_revision_pages = [None]
+                st.success(f"{history_sheet} ({history_version})을 리비전 {selected_revision}으로 복원했습니다")
+                st.rerun()
         else:
-            st.info("아직 저장된 데이터가 없습니다.")
+            st.info("수정 이력이 없습니다")
+    
+    # Version summaries, a page at a time
+    page_count = (len(summaries) - 1) // HISTORY_PAGE_SIZE + 1
+    page = 1
+    if page_count > 1:
+        page = st.number_input(f"버전 목록 페이지 (총 {len(summaries)}개)", min_value=1, max_value=page_count, value=1)
+    
+    for summary in summaries[(page - 1) * HISTORY_PAGE_SIZE:page * HISTORY_PAGE_SIZE]:
+        version_name = summary['version']
+        with st.expander(f"📌 {version_name}", expanded=(version_name == "base")):
+            st.markdown(f"**시트 수**: {summary['sheet_count']}")
+            st.markdown(f"**최종 수정**: {summary['updated_at'].strftime('%Y-%m-%d %H:%M')}")
+            
+            # Sheet list is only queried once asked for, one keyset page at a time
+            cursors_key = f"history_sheet_pages_{version_name}"
+            if not st.toggle("시트 목록 보기", value=(version_name == "base"), key=f"history_sheets_{version_name}"):
+                st.session_state.pop(cursors_key, None)
+                continue
+            
+            cursors = st.session_state.setdefault(cursors_key, [None])
+            records, next_cursor = list_version_sheets(user_id, version_name, after=cursors[-1])
+            
+            for record in records:
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    st.text(f"• {record['sheet_id']}")
+                with col2:
+                    st.caption(record['updated_at'].strftime('%m/%d'))
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                if len(cursors) > 1 and st.button("◀ 이전", key=f"history_prev_{version_name}"):
+                    cursors.pop()
+                    st.rerun()
+            with col2:
+                if next_cursor and st.button("다음 ▶", key=f"history_next_{version_name}"):
+                    cursors.append(next_cursor)
+                    st.rerun()
 
 def template_analysis_tab():
     """Display template analysis and structure"""
@@ -1367,9 +5074,15 @@ def main():
     </style>
     """, unsafe_allow_html=True)
     
+    init_database()
+    
     # Initialize session state
     init_session_state()
     
+    # Download endpoint behind ARTIFACT_BASE_URL (one per server process) and artifact cleanup
+    start_artifact_server()
+    start_artifact_purge()
+    
     # Show login if not authenticated
     if not st.session_state.authenticated:
         login_page()
@@ -1378,14 +5091,15 @@ def main():
         sidebar_menu()
         
         # Main content area with tabs
-        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
+        tabs = st.tabs([
             "📊 데이터 보관소",
             "✏️ 입력/수정", 
             "🔍 분석",
             "📄 생성",
             "📜 히스토리",
             "🔧 템플릿 분석"
-        ])
+        ] + (["🛡️ 관리자"] if is_admin(st.session_state.username) else []))
+        tab1, tab2, tab3, tab4, tab5, tab6 = tabs[:6]
         
         with tab1:
             data_vault_tab()
@@ -1404,6 +5118,10 @@ def main():
         
         with tab6:
             template_analysis_tab()
+        
+        if len(tabs) > 6:
+            with tabs[6]:
+                admin_tab()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
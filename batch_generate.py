@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Batch proposal generation for multiple funds and data versions
+
+Usage:
+    python batch_generate.py --username acme --jobs jobs.json --output proposals.zip
+
+jobs.json is a list of variants, e.g.
+    [
+        {"name": "AI반도체_2025", "template": "KIF_template.xlsx",
+         "version": "2025 KIF Version", "overrides": {"표지": {"B5": "AI 반도체"}}},
+        {"name": "AI-AX_base", "template": "KIF_template.xlsx", "version": "base"}
+    ]
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from app import SessionLocal, User, init_database, load_stored_data, generate_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate several KIF proposal variants into one zip")
+    parser.add_argument("--username", required=True, help="Vault owner whose stored data is used")
+    parser.add_argument("--jobs", required=True, help="JSON file with the list of variants")
+    parser.add_argument("--output", default="proposals.zip", help="Zip file to write")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    args = parser.parse_args()
+
+    init_database()
+
+    with open(args.jobs, encoding="utf-8") as f:
+        jobs = json.load(f)
+
+    with SessionLocal() as session:
+        user = session.query(User).filter_by(username=args.username).first()
+        if not user:
+            print(f"❌ Unknown user: {args.username}")
+            return 1
+        user_id = user.id
+
+    stored_data = load_stored_data(user_id)
+
+    started = time.perf_counter()
+    results = generate_batch(jobs, stored_data, args.output, max_workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    for result in results:
+        if result["ok"]:
+            print(f"✅ {result['name']} ({result['seconds']:.2f}s)")
+        else:
+            print(f"❌ {result['name']}: {result['error']}")
+
+    failed = len([r for r in results if not r["ok"]])
+    print(f"\n📦 {len(results) - failed}/{len(results)} variants written to {args.output} in {elapsed:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
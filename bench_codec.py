@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: payload codecs on realistic KIF sheets
+
+Compares encode/decode time and stored size of stdlib json, orjson (when
+installed) and the zlib-compressed format used above
+PAYLOAD_COMPRESS_THRESHOLD.
+
+Usage:
+    python bench_codec.py [--rows 3000] [--repeat 20]
+"""
+
+import argparse
+import json
+import random
+import time
+import zlib
+
+import app
+
+
+def make_payloads(rows):
+    """Investment records table, financial statements form and personnel form"""
+    random.seed(7)
+    sectors = ["AI/인공지능", "반도체", "바이오", "모빌리티", "5G/6G", "헬스케어"]
+    investments = {
+        'columns': ['기업명', '투자일자', '투자금액', '지분율', '회수금액', 'IRR', '업종', '비고'],
+        'rows': [
+            [f"(주)테크기업{i}", f"20{random.randint(15, 24)}.{random.randint(1, 12):02d}.{random.randint(1, 28):02d}",
+             random.randint(500, 30000), round(random.uniform(1, 30), 2), random.randint(0, 90000),
+             round(random.uniform(-20, 60), 2), random.choice(sectors), "후속투자 예정" if i % 3 else ""]
+            for i in range(rows)
+        ]
+    }
+    financials = {
+        f"{item}_{year}": round(random.uniform(100, 50000), 1)
+        for item in ["유동자산", "비유동자산", "유동부채", "비유동부채", "자본금", "매출액", "영업이익", "당기순이익"]
+        for year in ["2021년", "2022년", "2023년", "2024년(예상)"]
+    }
+    personnel = {}
+    for i in range(10):
+        personnel[f"성명_{i}"] = f"운용역{i}"
+        personnel[f"직위_{i}"] = random.choice(["대표", "전무", "상무", "이사", "수석심사역"])
+        personnel[f"경력년수_{i}"] = random.randint(3, 25)
+        personnel[f"주요경력_{i}"] = "벤처캐피탈 투자심사 및 사후관리, 펀드 결성 및 청산 업무 " * 3
+    
+    return {
+        f"3-2.개별 투자실적1 ({rows}행)": investments,
+        "1-2.재무실적": financials,
+        "1-4.핵심운용인력 관리현황": personnel,
+    }
+
+
+def make_codecs():
+    codecs = {
+        'json (stdlib)': (
+            lambda payload: json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+            lambda stored: json.loads(stored)
+        ),
+    }
+    if app.orjson is not None:
+        codecs['orjson'] = (
+            lambda payload: app.orjson.dumps(payload),
+            lambda stored: app.orjson.loads(stored)
+        )
+    codecs['zlib-json'] = (
+        lambda payload: zlib.compress(app.dumps_payload(payload).encode('utf-8'), app.PAYLOAD_COMPRESS_LEVEL),
+        lambda stored: app.loads_payload(zlib.decompress(stored).decode('utf-8'))
+    )
+    return codecs
+
+
+def best_of(repeat, func, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payload codec speed and size")
+    parser.add_argument("--rows", type=int, default=3000, help="Rows in the investment records table")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    
+    codecs = make_codecs()
+    if app.orjson is None:
+        print("ℹ️ orjson not installed; skipping it")
+    
+    for name, payload in make_payloads(args.rows).items():
+        print(f"\n📄 {name}")
+        print(f"{'codec':16} {'encode ms':>10} {'decode ms':>10} {'bytes':>10}")
+        print("-" * 50)
+        for codec_name, (encode, decode) in codecs.items():
+            stored = encode(payload)
+            assert decode(stored) == payload
+            encode_ms = best_of(args.repeat, encode, payload) * 1000
+            decode_ms = best_of(args.repeat, decode, stored) * 1000
+            print(f"{codec_name:16} {encode_ms:10.3f} {decode_ms:10.3f} {len(stored):10,}")
+    
+    print(f"\nPayloads of {app.PAYLOAD_COMPRESS_THRESHOLD:,}+ characters are stored as zlib-json")
+
+
+if __name__ == "__main__":
+    main()
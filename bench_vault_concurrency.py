@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Load test: vault read throughput while another session keeps saving
+
+Compares SQLite's default settings with DATABASE_PROFILE (WAL, pragmas,
+pooled connections). Each run uses a fresh temporary database.
+
+Usage:
+    python bench_vault_concurrency.py [--readers 8] [--seconds 5]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+import app
+
+DEFAULT_SQLITE_PROFILE = dict(app.DATABASE_PROFILE, journal_mode='DELETE', synchronous='FULL',
+                              busy_timeout_ms=0, cache_size_kb=2000, mmap_size=0)
+
+
+def run_load(profile, readers, seconds):
+    """Readers load a vault while one writer saves sheets; returns throughput counters"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        profile = dict(profile, url=f"sqlite:///{os.path.join(temp_dir, 'load.db')}")
+        test_engine = app.create_database_engine(profile)
+        original_engine = app.engine
+        app.engine = test_engine
+        app.SessionLocal.configure(bind=test_engine)
+        
+        try:
+            app.Base.metadata.create_all(test_engine)
+            with app.SessionLocal() as session:
+                user = app.User(username="load", password_hash="x", firm_name="부하 테스트")
+                session.add(user)
+                session.commit()
+                user_id = user.id
+            
+            payload = {f"필드_{i}": f"값 {i}" * 5 for i in range(300)}
+            app.bulk_update_data(user_id, [(sheet, "base", payload) for sheet in app.SHEET_CONFIG])
+            
+            counters = {'reads': 0, 'writes': 0, 'locked': 0}
+            lock = threading.Lock()
+            stop = time.perf_counter() + seconds
+            
+            def reader():
+                while time.perf_counter() < stop:
+                    try:
+                        # Bypass the revision cache so every read hits SQLite
+                        app._read_stored_data(user_id)
+                        with lock:
+                            counters['reads'] += 1
+                    except OperationalError:
+                        with lock:
+                            counters['locked'] += 1
+            
+            def writer():
+                sheets = list(app.SHEET_CONFIG)
+                index = 0
+                while time.perf_counter() < stop:
+                    sheet = sheets[index % len(sheets)]
+                    result = app.bulk_update_data(user_id, [(sheet, "base", dict(payload, 회차=index))])[0]
+                    with lock:
+                        if result['status'] == 'saved':
+                            counters['writes'] += 1
+                        else:
+                            counters['locked'] += 1
+                    index += 1
+            
+            threads = [threading.Thread(target=reader) for _ in range(readers)]
+            threads.append(threading.Thread(target=writer))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            
+            return counters
+        finally:
+            test_engine.dispose()
+            app.engine = original_engine
+            app.SessionLocal.configure(bind=original_engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vault read throughput under concurrent writes")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    
+    print(f"🧪 {args.readers} readers + 1 writer, {args.seconds:.0f}s per profile")
+    print("=" * 50)
+    for name, profile in [("SQLite defaults", DEFAULT_SQLITE_PROFILE), ("DATABASE_PROFILE", app.DATABASE_PROFILE)]:
+        counters = run_load(profile, args.readers, args.seconds)
+        print(f"{name:18} reads/s: {counters['reads'] / args.seconds:8.1f}  "
+              f"writes/s: {counters['writes'] / args.seconds:6.1f}  locked errors: {counters['locked']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Compact the proposal revision log
+
+Deltas older than the cutoff are merged per snapshot run, so old history
+keeps its snapshots and end states but not every intermediate save.
+
+Usage:
+    python compact_history.py [--days 90] [--username acme]
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from app import SessionLocal, User, REVISION_COMPACT_AFTER_DAYS, compact_revisions, init_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge old deltas in the revision log")
+    parser.add_argument("--days", type=int, default=REVISION_COMPACT_AFTER_DAYS,
+                        help="Only compact revisions older than this many days")
+    parser.add_argument("--username", default=None, help="Limit to one vault owner (default: all users)")
+    args = parser.parse_args()
+    
+    init_database()
+    
+    user_id = None
+    if args.username:
+        with SessionLocal() as session:
+            user = session.query(User).filter_by(username=args.username).first()
+            if not user:
+                print(f"❌ Unknown user: {args.username}")
+                return 1
+            user_id = user.id
+    
+    removed = compact_revisions(datetime.now() - timedelta(days=args.days), user_id)
+    print(f"🗜️ Merged away {removed} revisions older than {args.days} days")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Rebuild the portfolio summary shown in the admin tab
+
+Reads proposal_data in chunks, computes completeness and validation
+metrics per user and version, and replaces the portfolio_summary table.
+Meant to run on a schedule (e.g. nightly cron) so the admin view stays a
+single query.
+
+Usage:
+    python portfolio_analytics.py [--chunk-size 5000]
+"""
+
+import argparse
+import sys
+import time
+
+from app import PORTFOLIO_CHUNK_SIZE, compute_portfolio_summary, get_portfolio_summary, init_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild portfolio completeness and validation metrics")
+    parser.add_argument("--chunk-size", type=int, default=PORTFOLIO_CHUNK_SIZE,
+                        help="proposal_data records read per chunk")
+    args = parser.parse_args()
+    
+    init_database()
+    
+    started = time.perf_counter()
+    count = compute_portfolio_summary(chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - started
+    
+    summary = get_portfolio_summary()
+    if not summary.empty:
+        print(f"👥 {summary['username'].nunique()} users, {summary['sheets'].sum():,} sheets")
+        print(f"📈 Average completion {summary['completion'].mean():.0%}, "
+              f"{summary['records_with_errors'].sum():,} sheets with errors, "
+              f"{summary['cross_sheet_violations'].sum():,} cross-sheet violations")
+    print(f"✅ {count} user versions summarized in {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
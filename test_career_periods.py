@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test script for 3-1 career period merging and the RFP core personnel requirements
+"""
+
+import os
+import tempfile
+
+import pandas as pd
+
+import app
+from test_vault_storage import _create_user, _use_database
+
+RFP_INFO = {
+    'announcement_date': '2025-07-01',
+    'core_personnel_requirements': {
+        'minimum_count': '3인 이상', 'lead_manager_experience': '5년 이상', 'other_experience': '3년 이상'
+    },
+}
+
+
+def test_overlapping_and_adjacent_periods_merge():
+    periods = pd.DataFrame({
+        'person': ["김", "김", "김", "이", "이"],
+        'start': pd.to_datetime(["2015-01-01", "2016-01-01", "2017-01-01", "2018-01-01", "2026-01-01"]),
+        'end': pd.to_datetime(["2016-06-30", "2016-12-31", None, "2018-12-31", None]),
+    })
+    as_of = pd.Timestamp("2019-12-31")
+    merged = app.merge_career_periods(periods, as_of)
+    
+    assert merged.values.tolist() == [
+        ["김", pd.Timestamp("2015-01-01"), as_of],
+        ["이", pd.Timestamp("2018-01-01"), pd.Timestamp("2018-12-31")],
+    ]
+    years = app.career_experience(periods, as_of)
+    assert round(years["김"], 2) == 5.0 and round(years["이"], 2) == 1.0
+
+
+def test_career_rows_read_tables_and_forms():
+    table = {'columns': ['성명', '구분', '근무기간(시작)', '근무기간(종료)'],
+             'rows': [["김대표", "대표펀드매니저", "2012.03", "2016.02"], ["", "", "2019.01", ""]]}
+    rows = app._career_rows(table)
+    assert rows[['name', 'role', 'start', 'end']].values.tolist() == [["김대표", "대표펀드매니저", "2012.03", "2016.02"]]
+    
+    form = app._career_rows({"성명_0": "박", "근무기간_0": "2019.01 ~ 2020.12", "성명_1": "최", "시작일_1": "2020.1.1"})
+    assert form['name'].tolist() == ["박", "최"]
+    assert form.loc[0, 'period'] == "2019.01 ~ 2020.12" and form.loc[1, 'start'] == "2020.1.1"
+    
+    ends = app._career_dates(pd.Series(["2016.02", "2016년 3월 15일", "현재"]), True)
+    assert ends.tolist()[:2] == [pd.Timestamp("2016-02-29"), pd.Timestamp("2016-03-15")] and pd.isna(ends[2])
+
+
+def test_period_text_accepts_dash_separators_and_flags_bad_ends():
+    texts = ["2019.01 - 2020.12", "2019.01 – 2020.12", "2019-01-01 ~ 2020-12-31",
+             "2016년 3월 15일 ~ 재직중", "2019.01 ~ 20.12", "2019.01", "2021.01 ~ 2020.12"]
+    frame = pd.DataFrame({'name': "김", 'start': None, 'end': None, 'period': texts})
+    periods = app._career_periods(frame)
+    
+    assert periods['start'].tolist()[:3] == [pd.Timestamp("2019-01-01")] * 3
+    assert periods['end'].tolist()[:3] == [pd.Timestamp("2020-12-31")] * 3
+    assert periods.loc[3, 'start'] == pd.Timestamp("2016-03-15") and pd.isna(periods.loc[3, 'end'])
+    assert periods['invalid'].tolist() == [False, False, False, False, True, True, True]
+    
+    # Separate columns: only a blank or 현재 end means still employed
+    columns = pd.DataFrame({'name': "이", 'period': None,
+                            'start': ["2019.01", "2019.01", "2019.01"], 'end': ["20.12", "", "현재"]})
+    assert app._career_periods(columns)['invalid'].tolist() == [True, False, False]
+
+
+def test_vault_people_checked_against_announcement_date():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_engine, restore = _use_database(os.path.join(temp_dir, "vault.db"))
+        try:
+            app.Base.metadata.create_all(test_engine)
+            user_id = _create_user()
+            careers = {'columns': ['성명', '근무기간', '투자경력 인정'], 'rows': [
+                ["김대표", "2018.07.01 ~ 2021.06.30", ""],
+                ["김대표", "2020.07.01 ~ 현재", ""],
+                ["이심사", "2021.01.01 ~ 2023.12.31", ""],
+                ["이심사", "2024.01.01 ~ 현재", ""],
+                ["박심사", "2010.01 ~ 2019.12", "N"],
+                ["박심사", "2023.07.01 ~ 현재", ""],
+                ["박심사", "2019.01 - 20.12", ""],
+            ]}
+            app.bulk_update_data(user_id, [
+                (app.CAREER_SHEET, "base", careers),
+                (app.PERSONNEL_SHEET, "base", {"성명_0": "김대표", "직위_0": "대표이사", "성명_1": "이심사"}),
+                (app.CAREER_SHEET, "Copy", {"성명_0": "이심사", "근무기간_0": "2015.01 ~ 2025.06"}),
+            ])
+            
+            result = app.check_career_requirements(user_id, RFP_INFO)
+            assert result['as_of'] == "2025-07-01"
+            people = {(p['version'], p['name']): p for p in result['people']}
+            lead = people[("base", "김대표")]
+            assert lead['lead'] and lead['required'] == 5 and lead['status'] == 'ok' and 6.9 < lead['years'] < 7.1
+            assert people[("base", "이심사")]['status'] == 'ok'
+            # Periods marked as not counted are left out
+            assert people[("base", "박심사")]['status'] == 'gap' and people[("base", "박심사")]['years'] < 2.1
+            assert result['versions']["base"] == {'people': 3, 'qualified': 2, 'minimum_count': 3, 'status': 'gap'}
+            # An unreadable end is reported instead of counting up to the announcement date
+            assert result['invalid'] == [{'version': "base", 'name': "박심사", 'period': "2019.01 - 20.12"}]
+            # Without a marked lead the most experienced person is held to the lead requirement
+            assert people[("Copy", "이심사")]['lead'] and people[("Copy", "이심사")]['status'] == 'ok'
+            
+            only_base = app.check_career_requirements(user_id, {}, versions=["base"])
+            assert set(only_base['versions']) == {"base"}
+            assert all(p['required'] is None and p['status'] == 'ok' for p in only_base['people'])
+        finally:
+            restore()
+
+
+if __name__ == "__main__":
+    test_overlapping_and_adjacent_periods_merge()
+    test_career_rows_read_tables_and_forms()
+    test_period_text_accepts_dash_separators_and_flags_bad_ends()
+    test_vault_people_checked_against_announcement_date()
+    print("All career period tests passed! ✅")
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Test script for Excel proposal generation (field mapping and table write strategies)
+"""
+
+import os
+import tempfile
+import zipfile
+from io import BytesIO
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+
+import app
+
+TABLE_SHEET = "2-4.본계정 투자내역"
+
+
+def _make_template(path):
+    """Template with a title, a styled header row and a formatted first data row"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = TABLE_SHEET
+    ws['A1'] = "본계정 투자내역"
+    ws.merge_cells('A1:D1')
+    for col, header in enumerate(['기업명', '투자일자', '투자금액', '비고'], start=1):
+        ws.cell(row=3, column=col, value=header).font = Font(bold=True)
+    ws.cell(row=4, column=3).number_format = '#,##0'
+    wb.create_sheet("표지")
+    wb.save(path)
+
+
+def _generate(row_count):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        template_path = os.path.join(temp_dir, "template.xlsx")
+        _make_template(template_path)
+
+        rows = [[f"기업{i} & Co", f"2024-01-{i % 28 + 1:02d}", i * 1.5, None] for i in range(row_count)]
+        stored_data = {
+            TABLE_SHEET: {'base': {'columns': ['기업명', '투자일자', '투자금액', '비고'], 'rows': rows}},
+            "표지": {'base': {'B2': "테스트 운용사"}}
+        }
+
+        output_path = app.generate_filled_excel(template_path, stored_data)
+        assert output_path and os.path.exists(output_path)
+        wb = load_workbook(output_path)
+        os.remove(output_path)
+        return wb
+
+
+def test_field_map_resolves_form_keys():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        template_path = os.path.join(temp_dir, "template.xlsx")
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "1-2.재무실적"
+        ws['A5'], ws['B5'], ws['C5'] = "구분", "2021년", "2022년"
+        ws['A6'], ws['A7'] = "유동자산", "비유동자산"
+        ws['D6'] = "=B6+C6"
+        ws['B200'] = "=SUM(B6:B7)"  # below the rows parse_excel_template scans
+        ws['F5'] = "성명"
+        ws['H2'], ws['I2'] = "대표자", None
+        wb.save(template_path)
+
+        structure = app.parse_excel_template(template_path)
+        field_map = structure["1-2.재무실적"]['field_map']
+        assert field_map['targets']["유동자산_2021년"] == (6, 2)
+        assert field_map['targets']["비유동자산_2022년"] == (7, 3)
+        assert field_map['targets']["성명_0"] == (6, 6)
+        assert field_map['targets']["대표자"] == (2, 9)
+
+        stored_data = {"1-2.재무실적": {'base': {
+            "유동자산_2021년": 100.0,
+            "비유동자산_2022년": 50.0,
+            "성명_1": "김대표",
+            "대표자": "홍길동",
+            "D6": 999,
+            "B200": 0,
+            "E9": "직접 입력"
+        }}}
+        field_maps = {sheet: info['field_map'] for sheet, info in structure.items()}
+        output_path = app.generate_filled_excel(template_path, stored_data, field_maps=field_maps)
+        ws = load_workbook(output_path)["1-2.재무실적"]
+        os.remove(output_path)
+
+        assert ws['B6'].value == 100.0
+        assert ws['C7'].value == 50.0
+        assert ws['F7'].value == "김대표"
+        assert ws['I2'].value == "홍길동"
+        assert ws['D6'].value == "=B6+C6"
+        assert ws['B200'].value == "=SUM(B6:B7)"
+        assert ws['E9'].value == "직접 입력"
+
+
+def test_merged_labels_are_stepped_over():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        template_path = os.path.join(temp_dir, "template.xlsx")
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "2-4.투자전략 및 계획"
+        ws['A1'] = "투자전략"
+        ws.merge_cells('A1:B1')
+        ws['A3'] = "주요투자분야"
+        ws.merge_cells('A3:A4')
+        wb.save(template_path)
+        
+        structure = app.parse_excel_template(template_path)
+        field_map = structure["2-4.투자전략 및 계획"]['field_map']
+        assert field_map['targets']["투자전략"] == (1, 3)
+        assert field_map['targets']["주요투자분야"] == (3, 2)
+        
+        stored_data = {"2-4.투자전략 및 계획": {'base': {"투자전략": "AI 반도체 집중", "B1": "병합 셀"}}}
+        field_maps = {sheet: info['field_map'] for sheet, info in structure.items()}
+        output_path = app.generate_filled_excel(template_path, stored_data, field_maps=field_maps)
+        assert output_path is not None
+        ws = load_workbook(output_path)["2-4.투자전략 및 계획"]
+        os.remove(output_path)
+        assert ws['C1'].value == "AI 반도체 집중" and ws['A1'].value == "투자전략"
+
+
+def test_strategy_selection():
+    assert app.select_sheet_writer(TABLE_SHEET, app.STREAMING_ROW_THRESHOLD) == 'stream'
+    assert app.select_sheet_writer(TABLE_SHEET, app.STREAMING_ROW_THRESHOLD - 1) == 'cell'
+    assert app.select_sheet_writer("표지", 10 ** 6) == 'cell'
+
+
+def test_streamed_table_keeps_header_and_styles():
+    row_count = app.STREAMING_ROW_THRESHOLD + 10
+    wb = _generate(row_count)
+    ws = wb[TABLE_SHEET]
+
+    assert ws['A1'].value == "본계정 투자내역"
+    assert ws['A3'].value == '기업명' and ws['A3'].font.b
+    assert ws['A4'].value == "기업0 & Co"
+    assert ws['C5'].value == 1.5
+    assert ws['C5'].number_format == '#,##0'
+    assert ws.max_row == 3 + row_count
+    assert wb["표지"]['B2'].value == "테스트 운용사"
+
+
+def test_template_rows_below_header_are_not_streamed_away():
+    wb = Workbook()
+    ws = wb.active
+    ws.title = TABLE_SHEET
+    ws['A1'] = "본계정 투자내역"
+    for col, header in enumerate(['기업명', '투자일자', '투자금액', '비고'], start=1):
+        ws.cell(row=3, column=col, value=header)
+    ws['A4'], ws['C4'] = "합 계", "=SUM(C5:C600)"
+    ws['A30'] = "※ 단위: 백만원"
+    assert app._detect_header_rows(ws) == 3 and app._has_rows_below(ws, 3)
+    
+    rows = [[f"기업{i}", None, i, None] for i in range(app.STREAMING_ROW_THRESHOLD)]
+    stored_data = {TABLE_SHEET: {'base': {'columns': ['기업명', '투자일자', '투자금액', '비고'], 'rows': rows}}}
+    assert app.fill_workbook(wb, stored_data) == []
+    assert ws['C4'].value == "=SUM(C5:C600)" and ws['A5'].value == "기업1"
+
+
+def test_small_table_uses_cell_writer():
+    wb = _generate(5)
+    ws = wb[TABLE_SHEET]
+
+    assert ws['A4'].value == "기업0 & Co"
+    assert ws['B8'].value == "2024-01-05"
+    assert ws.max_row == 8
+
+
+
+def test_batch_variants_get_only_their_sheets():
+    stored_data = {
+        TABLE_SHEET: {'base': {'columns': ['기업명'], 'rows': [["기업0"]]}, "Copy": {'rows': [["복사본"]]},
+                      "2025 KIF Version": {'rows': [["최신"]]}},
+        "표지": {'base': {'B2': "운용사"}},
+        "없는 시트": {'base': {'A1': "x"}},
+    }
+    assert app._variant_data(stored_data, [TABLE_SHEET, "표지"], "Copy") == {
+        TABLE_SHEET: {'base': stored_data[TABLE_SHEET]['base'], "Copy": {'rows': [["복사본"]]}},
+        "표지": {'base': {'B2': "운용사"}},
+    }
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        template_path = os.path.join(temp_dir, "template.xlsx")
+        _make_template(template_path)
+        zip_path = os.path.join(temp_dir, "proposals.zip")
+        jobs = [{'template': template_path, 'version': "Copy", 'name': "copy"},
+                {'template': template_path, 'overrides': {"표지": {'B2': "변경"}}, 'name': "latest"}]
+        results = app.generate_batch(jobs, stored_data, zip_path, max_workers=2)
+        assert [(r['name'], r['ok']) for r in results] == [("copy", True), ("latest", True)]
+        
+        with zipfile.ZipFile(zip_path) as zf:
+            copy = load_workbook(BytesIO(zf.read("copy.xlsx")))
+            latest = load_workbook(BytesIO(zf.read("latest.xlsx")))
+        assert copy[TABLE_SHEET]['A4'].value == "복사본" and copy["표지"]['B2'].value == "운용사"
+        assert latest[TABLE_SHEET]['A4'].value == "최신" and latest["표지"]['B2'].value == "변경"
+
+
+if __name__ == "__main__":
+    test_field_map_resolves_form_keys()
+    test_merged_labels_are_stepped_over()
+    test_strategy_selection()
+    test_streamed_table_keeps_header_and_styles()
+    test_template_rows_below_header_are_not_streamed_away()
+    test_small_table_uses_cell_writer()
+    test_batch_variants_get_only_their_sheets()
+    print("All Excel generation tests passed! ✅")
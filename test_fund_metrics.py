@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script for the fund performance engine (IRR, TVPI, DPI of 2-x sheets)
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import app
+from test_vault_storage import _create_user, _use_database
+
+
+def _quarterly_flows(funds, quarters=60):
+    rows = []
+    for fund in range(funds):
+        for quarter, day in enumerate(pd.date_range("2010-03-31", periods=quarters, freq="QE")):
+            rows.append((f"펀드{fund}", day.strftime("%Y-%m-%d"),
+                         100.0 if quarter < 12 else 0.0,
+                         (fund % 7 + 20.0) if quarter >= 12 else 0.0,
+                         500.0 if quarter == quarters - 1 else 0.0))
+    return pd.DataFrame(rows, columns=app.FUND_FLOW_COLUMNS)
+
+
+def test_irr_solves_every_row_at_once():
+    cash_flows = np.array([
+        [-100.0, 0.0, 121.0],
+        [-100.0, 50.0, 60.0],
+        [-100.0, -5.0, 0.0],  # no sign change
+        [-100.0, 300.0, 0.0],
+    ])
+    years = np.array([[0.0, 1.0, 2.0]] * 4)
+    rates = app.solve_irr(cash_flows, years)
+    
+    assert abs(rates[0] - 0.10) < 1e-9
+    assert abs(-100 + 50 / (1 + rates[1]) + 60 / (1 + rates[1]) ** 2) < 1e-8
+    assert np.isnan(rates[2])
+    assert abs(rates[3] - 2.0) < 1e-9
+
+
+def test_metrics_per_fund_and_pooled():
+    flows = pd.DataFrame([
+        ("A", "2020-01-01", "1,000", 0, 0),
+        ("A", "2022-01-01", 0, 600, 0),
+        ("A", "2022-01-01", 0, 0, 900),
+        ("B", "2021-01-01", 500, 0, 0),
+        ("B", "2023-01-01", 0, 0, 400),
+    ], columns=app.FUND_FLOW_COLUMNS)
+    metrics = app.compute_fund_metrics(flows).set_index('펀드명')
+    
+    assert list(metrics.index) == ["A", "B", app.FUND_TOTAL_LABEL]
+    assert (metrics.loc["A", 'TVPI'], metrics.loc["A", 'DPI']) == (1.5, 0.6)
+    assert metrics.loc["A", 'IRR'] == round((1.5 ** (365 / 731) - 1) * 100, 1)
+    assert metrics.loc["B", 'IRR'] < 0 and metrics.loc["B", 'DPI'] == 0
+    assert metrics.loc[app.FUND_TOTAL_LABEL, '납입금액'] == 1500
+    assert metrics.loc[app.FUND_TOTAL_LABEL, 'TVPI'] == round(1900 / 1500, 2)
+    
+    # A total row in the upload is not pooled again
+    with_total = pd.concat([flows, pd.DataFrame([(" 합 계", "2023-01-01", 1500, 600, 1300)],
+                                                columns=app.FUND_FLOW_COLUMNS)], ignore_index=True)
+    assert app.compute_fund_metrics(with_total).set_index('펀드명').equals(metrics)
+    
+    try:
+        app.compute_fund_metrics(flows.assign(일자=["2020-01-01", "언젠가", None, "2021-01-01", "2023-01-01"]))
+        assert False, "invalid dates must be rejected"
+    except ValueError as e:
+        assert "2, 3" in str(e)
+
+
+def test_two_hundred_funds_under_a_second():
+    flows = _quarterly_flows(200)
+    started = time.perf_counter()
+    metrics = app.compute_fund_metrics(flows)
+    elapsed = time.perf_counter() - started
+    
+    assert len(metrics) == 201 and metrics['IRR'].notna().all()
+    assert elapsed < 1.0, f"{elapsed:.2f}s"
+
+
+def test_metrics_are_saved_to_the_sheet():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_engine, restore = _use_database(os.path.join(temp_dir, "vault.db"))
+        try:
+            app.Base.metadata.create_all(test_engine)
+            user_id = _create_user()
+            sheet = "2-3.KIF 펀드 운용실적"
+            app.update_data(user_id, sheet, {"수익률": 12.5})
+            
+            app.save_fund_metrics(user_id, sheet, app.compute_fund_metrics(_quarterly_flows(3, quarters=20)))
+            stored = app.load_stored_data(user_id, sheets=[sheet])[sheet]['base']
+            assert stored["수익률"] == 12.5 and stored["펀드명_2"] == "펀드2"
+            assert isinstance(stored["IRR"], float) and stored["TVPI"] >= stored["DPI"]
+            assert not any(app.validate_sheet(stored, sheet)['sheet_errors'].values())
+            
+            # Funds no longer in the upload lose their keys
+            app.save_fund_metrics(user_id, sheet, app.compute_fund_metrics(_quarterly_flows(1, quarters=20)))
+            stored = app.load_stored_data(user_id, sheets=[sheet])[sheet]['base']
+            assert "펀드명_0" in stored and "펀드명_1" not in stored and "IRR_2" not in stored
+            
+            # Hundreds of changed keys go through one patch
+            app.save_fund_metrics(user_id, sheet, app.compute_fund_metrics(_quarterly_flows(200, quarters=20)))
+            stored = app.load_stored_data(user_id, sheets=[sheet])[sheet]['base']
+            assert stored["펀드명_199"] == "펀드199" and stored["수익률"] == 12.5
+            app.save_fund_metrics(user_id, sheet, app.compute_fund_metrics(_quarterly_flows(2, quarters=20)))
+            stored = app.load_stored_data(user_id, sheets=[sheet])[sheet]['base']
+            assert "펀드명_1" in stored and not any(key.endswith("_2") or key.endswith("_199") for key in stored)
+            
+            try:
+                app.save_fund_metrics(user_id, "표지", pd.DataFrame())
+                assert False, "only 2-x sheets take fund metrics"
+            except ValueError:
+                pass
+        finally:
+            restore()
+
+
+if __name__ == "__main__":
+    test_irr_solves_every_row_at_once()
+    test_metrics_per_fund_and_pooled()
+    test_two_hundred_funds_under_a_second()
+    test_metrics_are_saved_to_the_sheet()
+    print("All fund metrics tests passed! ✅")
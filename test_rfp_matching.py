@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script for matching RFP requirements against template and vault fields
+"""
+
+import time
+
+import app
+
+RFP_INFO = {
+    'investment_areas': ['AI 반도체', 'AI·AX 혁신'],
+    'mandatory_investment': '60%',
+    'fund_duration': '8년 이내',
+    'gp_contribution': '약정총액의 1% 이상',
+    'core_personnel_requirements': {
+        'minimum_count': '3인 이상', 'lead_manager_experience': '5년 이상', 'other_experience': '3년 이상'
+    },
+}
+
+TEMPLATE = {
+    "1-1.펀드체계 제안": {'fields': {"A3": {'label': "존속기간"}, "A4": {'label': "운용사 출자비율"}}},
+    "1-4.핵심운용인력 관리현황": {'fields': {"A2": {'label': "성명"}, "B2": {'label': "경력(년)"}}},
+}
+
+STORED = {
+    "1-4.핵심운용인력 관리현황": {"성명_0": "김대표", "성명_1": "이심사", "성명_2": "",
+                             "경력년수_0": 12, "경력년수_1": 2},
+    "2-4.투자전략 및 계획": {"주요투자분야": ["AI/인공지능", "반도체"], "목표수익률": 8.0},
+    "3-2.개별 투자실적1": {'columns': ['기업명', '업종'], 'rows': [["(주)가나", "AI 반도체"]]},
+}
+
+
+def test_tokens_match_compound_korean_keys():
+    assert app._match_tokens("경력") <= app._match_tokens("경력년수_0")
+    assert app._match_tokens("AI·AX 혁신") == {"ai", "ax", "혁신"}
+    assert app._match_tokens("2021년") == frozenset()
+
+
+def test_requirements_resolve_to_sheet_findings():
+    index = app.build_field_index(TEMPLATE, STORED)
+    findings = {(f['requirement'], f['status']) for f in app.match_rfp_requirements(index, RFP_INFO)}
+    
+    assert findings == {
+        ('investment_areas', 'ok'),        # AI 반도체 in 2-4 and in the 3-2 업종 column
+        ('investment_areas', 'gap'),       # nothing mentions AX/혁신
+        ('minimum_count', 'gap'),          # two names filled, three required
+        ('lead_manager_experience', 'ok'),
+        ('other_experience', 'gap'),       # one person below three years
+        ('mandatory_investment', 'missing'),
+        ('gp_contribution', 'gap'),        # template asks for it, vault has no value
+        ('fund_duration', 'gap'),
+    }
+    
+    comparison = app.compare_data({}, RFP_INFO, index)
+    assert "GP 출자비율: '1-1.펀드체계 제안 › 운용사 출자비율' 입력 필요" in comparison['suggestions']
+    assert any("'AI·AX 혁신' 분야" in s for s in comparison['suggestions'])
+
+
+def test_experience_comes_from_years_or_career_periods():
+    stored = dict(STORED, **{"3-1.핵심운용인력 경력": {"성명_0": "김대표", "경력기간_0": "2023.01 ~ 2024.06"}})
+    stored["1-4.핵심운용인력 관리현황"] = {"성명_0": "김대표", "경력년수_0": "2년"}
+    index = app.build_field_index(TEMPLATE, stored)
+    findings = {f['requirement']: f for f in app.match_rfp_requirements(index, RFP_INFO)}
+    # Period text is not a year count
+    assert findings['lead_manager_experience']['status'] == 'gap'
+    assert "최장 경력 2년" in findings['lead_manager_experience']['message']
+    
+    careers = {'as_of': "2025-07-01", 'people': [
+        {'version': "base", 'name': "김대표", 'lead': True, 'years': 7.0},
+        {'version': "base", 'name': "이심사", 'lead': False, 'years': 1.5},
+    ]}
+    findings = {f['requirement']: f for f in app.compare_data({}, RFP_INFO, index, careers)['findings']}
+    assert findings['lead_manager_experience']['status'] == 'ok'
+    assert findings['lead_manager_experience']['sheet_id'] == app.CAREER_SHEET
+    assert findings['other_experience']['status'] == 'gap' and "이심사" in findings['other_experience']['message']
+
+
+def test_one_index_serves_many_rfps():
+    stored = dict(STORED, **{f"시트{i}": {f"필드{j}_{i}": j for j in range(200)} for i in range(50)})
+    index = app.build_field_index(TEMPLATE, stored)
+    
+    started = time.perf_counter()
+    for _ in range(50):
+        app.match_rfp_requirements(index, RFP_INFO)
+    assert time.perf_counter() - started < 0.5
+
+
+if __name__ == "__main__":
+    test_tokens_match_compound_korean_keys()
+    test_requirements_resolve_to_sheet_findings()
+    test_experience_comes_from_years_or_career_periods()
+    test_one_index_serves_many_rfps()
+    print("All RFP matching tests passed! ✅")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test script for KIF input validation (field and sheet rules)
+"""
+
+import time
+
+import app
+
+
+def test_field_rules_follow_key_keywords():
+    errors = app.validate_input({
+        "설립일자": "2024.01.01",
+        "IRR": "12.34",
+        "투자금액": "1,000",
+        "매출액": "많음",
+        "회사명": "A",
+        "비고": "",
+        "기준년도": "2024-12-31",
+    }, "표지")
+    
+    assert errors == [
+        "설립일자: KIF 날짜 형식은 YYYY-MM-DD",
+        "IRR: 퍼센트는 소수점 첫째 자리까지만 입력",
+        "매출액: 유효한 금액이 아님",
+        "회사명: 정식 명칭 입력 필요",
+        "비고: 빈 셀 불허 (0 또는 해당 데이터 입력 필수)",
+    ]
+    assert app._field_rules("투자금액") == (app._check_not_empty, app._check_amount)
+
+
+def test_sheet_rules_are_dispatched_by_sheet():
+    assert app.validate_input({"자산총계": 1, "매출액": 2}, "1-2.재무실적") == [
+        "재무실적: 부채 데이터 필수", "재무실적: 자본 데이터 필수"
+    ]
+    assert app.validate_input({"성명_0": "김대표", "경력년수_0": 60}, "1-4.핵심운용인력 관리현황") == [
+        "경력년수_0: 경력년수는 0-50년 범위"
+    ]
+    assert app.validate_input({"비고": "없음"}, "1-3.준법성") == ["준법성: 리스크 관리 체계 정보 필수"]
+    assert app.validate_input({"비고": "없음"}, "표지") == []
+
+
+def test_large_sheet_validates_quickly():
+    data = {f"투자금액_{i}": i * 10 for i in range(5000)}
+    data.update({f"회수일자_{i}": "2024-01-01" for i in range(5000)})
+    
+    started = time.perf_counter()
+    errors = app.validate_input(data, "3-2.개별 투자실적1")
+    elapsed = time.perf_counter() - started
+    
+    assert errors == ["주의: 데이터가 A4 인쇄 크기를 초과할 수 있음"]
+    assert elapsed < 0.5
+    assert app._remaining_print_budget({"a": "b"}, app.A4_CHAR_BUDGET) > 0
+
+
+def test_incremental_validation_reruns_only_changed_fields():
+    sheet = "1-2.재무실적"
+    data = {"자산총계": 100, "매출액": "많음", "부채총계": 50, "자본총계": 50, "비고": "메모"}
+    result = app.validate_sheet(data, sheet)
+    assert result['field_errors'] == {"매출액": ["매출액: 유효한 금액이 아님"]}
+    assert result['sheet_errors'] == {'financials_required': [], 'print_size': []}
+    
+    # Stale results planted for unchanged fields and rules are reused as-is
+    planted = {
+        'field_errors': {"자산총계": ["자산총계: 재사용"]},
+        'sheet_errors': {'financials_required': ["재사용"], 'print_size': []}
+    }
+    changed = dict(data, 비고="수정")
+    assert app.validate_sheet(changed, sheet, data, planted)['errors'] == ["자산총계: 재사용", "재사용"]
+    
+    # Removing a field the rule depends on re-runs it
+    removed = {key: value for key, value in data.items() if key != "부채총계"}
+    rerun = app.validate_sheet(removed, sheet, data, planted)
+    assert rerun['sheet_errors']['financials_required'] == ["재무실적: 부채 데이터 필수"]
+    assert rerun['errors'] == ["자산총계: 재사용", "재무실적: 부채 데이터 필수"]
+    
+    app._cached_field_errors.cache_clear()
+    app.validate_sheet(data, sheet)
+    app.validate_sheet(dict(data, 비고="다시"), sheet)
+    info = app._cached_field_errors.cache_info()
+    assert (info.hits, info.misses) == (4, 6)
+
+
+def test_table_sheets_are_validated_by_column():
+    columns = ['기업명', '회수일자', '투자금액', 'IRR', '비고']
+    rows = [["(주)가나", "2024-01-01", "1,000", 12.5, "메모"],
+            ["(주)다라", "2024.01.01", "많음", 12.34, None]]
+    rows += [[f"기업{i}", "2024-03-01", i * 10 + 1, 5.0, "-"] for i in range(10000)]
+    
+    started = time.perf_counter()
+    result = app.validate_table({'columns': columns, 'rows': rows}, "3-2.개별 투자실적1")
+    elapsed = time.perf_counter() - started
+    
+    assert result['row_errors'] == {1: [
+        "2행 회수일자: KIF 날짜 형식은 YYYY-MM-DD",
+        "2행 투자금액: 유효한 금액이 아님",
+        "2행 IRR: 퍼센트는 소수점 첫째 자리까지만 입력",
+        "2행 비고: 빈 셀 불허 (0 또는 해당 데이터 입력 필수)",
+    ]}
+    assert result['mask'].loc[1].tolist() == [False, True, True, True, True]
+    assert int(result['mask'].to_numpy().sum()) == 4
+    assert elapsed < 1.0
+    
+    errors = app.validate_sheet({'columns': columns, 'rows': rows[:2], '대표': ""}, "3-2.개별 투자실적1")
+    assert list(errors['field_errors']) == ['대표', 'rows[1]']
+
+
+def test_incremental_table_validation_checks_edited_rows():
+    sheet = "3-2.개별 투자실적1"
+    columns = ['기업명', '투자금액']
+    rows = [[f"기업{i}", i * 10] for i in range(2000)] + [["가", "많음"]]
+    data = {'columns': columns, 'rows': rows}
+    result = app.validate_sheet(data, sheet)
+    assert list(result['field_errors']) == ['rows[2000]']
+    
+    edited = [list(row) for row in rows[:-1]]
+    edited[5][1] = "모름"
+    edited.append(["(주)나다", 1])
+    changed = {'columns': columns, 'rows': edited + [["(주)라마", 2]]}
+    
+    checked = []
+    validate_table = app.validate_table
+    
+    def spy(payload, sheet_id, rows=None):
+        checked.append(rows)
+        return validate_table(payload, sheet_id, rows)
+    
+    app.validate_table = spy
+    try:
+        incremental = app.validate_sheet(changed, sheet, data, result)
+    finally:
+        app.validate_table = validate_table
+    assert checked == [[5, 2000, 2001]]
+    assert incremental == app.validate_sheet(changed, sheet)
+    assert list(incremental['field_errors']) == ['rows[5]']
+
+
+def test_table_and_field_checks_agree_on_numbers():
+    values = ["1,000", "12.5%", " 3 ", "1e3", "nan", "inf", "1_000", "１２", float('nan'), 7.25]
+    table = app.validate_table({'columns': ['투자금액', 'IRR'], 'rows': [[v, v] for v in values]}, "3-2.개별 투자실적1")
+    for row, value in enumerate(values):
+        fields = app.validate_sheet({'투자금액': value, 'IRR': value}, "3-2.개별 투자실적1")['field_errors']
+        cells = table['row_errors'].get(row, [])
+        assert sorted(message for messages in fields.values() for message in messages) == \
+            sorted(message.split(' ', 1)[1] for message in cells), value
+
+
+def test_rules_fingerprint_covers_cross_sheet_rules_and_helpers():
+    fingerprint = app.validation_rules_fingerprint()
+    assert app.validation_rules_fingerprint() == fingerprint
+    
+    originals = app.CROSS_SHEET_TOLERANCE, app._missing_keys
+    try:
+        app.CROSS_SHEET_TOLERANCE = 5.0
+        assert app.validation_rules_fingerprint() != fingerprint
+        app.CROSS_SHEET_TOLERANCE = originals[0]
+        # An edited helper changes the fingerprint of the checks calling it
+        app._missing_keys = app._remaining_print_budget
+        assert app.validation_rules_fingerprint() != fingerprint
+    finally:
+        app.CROSS_SHEET_TOLERANCE, app._missing_keys = originals
+    assert app.validation_rules_fingerprint() == fingerprint
+
+
+if __name__ == "__main__":
+    test_field_rules_follow_key_keywords()
+    test_sheet_rules_are_dispatched_by_sheet()
+    test_large_sheet_validates_quickly()
+    test_incremental_validation_reruns_only_changed_fields()
+    test_table_sheets_are_validated_by_column()
+    test_incremental_table_validation_checks_edited_rows()
+    test_table_and_field_checks_agree_on_numbers()
+    test_rules_fingerprint_covers_cross_sheet_rules_and_helpers()
+    print("All validation tests passed! ✅")
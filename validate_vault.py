@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Validate every stored vault before a submission deadline
+
+Runs the field, table and sheet rules on each stored sheet across a
+process pool, re-checks cross-sheet rules, and writes a JSON report with
+per-record errors and timings. Results are cached by (sheet, payload) in
+the state file, so later runs only validate records that changed (or all
+of them after a rule change).
+
+Usage:
+    python validate_vault.py [--username acme] [--output validation_report.json] [--full]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from app import SessionLocal, User, VALIDATION_BATCH_SIZE, init_database, validate_vaults
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate stored vaults and write a JSON report")
+    parser.add_argument("--username", action="append", help="Vault owner to check (repeatable; default: all users)")
+    parser.add_argument("--output", default="validation_report.json", help="Report file to write")
+    parser.add_argument("--state", default=".validation_cache.json", help="Cache of earlier results")
+    parser.add_argument("--full", action="store_true", help="Ignore the cache and validate every record")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=VALIDATION_BATCH_SIZE, help="Payloads per worker task")
+    args = parser.parse_args()
+    
+    init_database()
+    
+    user_ids = None
+    if args.username:
+        with SessionLocal() as session:
+            users = dict(session.query(User.username, User.id).filter(User.username.in_(args.username)).all())
+        unknown = [name for name in args.username if name not in users]
+        if unknown:
+            print(f"❌ Unknown user: {', '.join(unknown)}")
+            return 1
+        user_ids = list(users.values())
+    
+    cache = None
+    if not args.full and os.path.exists(args.state):
+        with open(args.state, encoding="utf-8") as f:
+            cache = json.load(f)
+    
+    report = validate_vaults(user_ids, cache=cache, max_workers=args.workers, batch_size=args.batch_size)
+    
+    # Keep cached results of users outside this run
+    state = report.pop('cache')
+    if cache and cache.get('rules') == state['rules']:
+        state['results'] = dict(cache['results'], **state['results'])
+    with open(args.state, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    
+    summary = report['summary']
+    for user in report['users']:
+        failed = [r for r in user['records'] if r['errors']]
+        marker = "❌" if failed or user['cross_sheet'] else "✅"
+        print(f"{marker} {user['username']}: {len(user['records']) - len(failed)}/{len(user['records'])} sheets valid, "
+              f"{len(user['cross_sheet'])} cross-sheet violations")
+    print(f"\n📋 {summary['validated']} validated, {summary['skipped']} unchanged in {report['seconds']:.2f}s "
+          f"→ {args.output}")
+    return 1 if summary['records_with_errors'] or summary['cross_sheet_violations'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())